@@ -20,21 +20,19 @@ Standard:
     numpy
     matplotlib.pyplot
     os
-    sys
-    matplotlib.animation.FuncAnimation
     mpl_toolkits.mplot3d.Axes3D
 
 Non-standard:
-    main
+    nbody
 """
 import numpy as np
 import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
 from mpl_toolkits.mplot3d import Axes3D
-import sys
 import os
 
-from main import calculateTrajectories
+from nbody.scenario import loadScenarios, initialConditions, simulate
+from nbody.renderer import TrajectoryAnimator
+from nbody.movie import renderMovie
 
 # Question 11.
 # uniformCube.txt
@@ -43,44 +41,24 @@ from main import calculateTrajectories
 # load data
 simDir = os.path.dirname(os.path.abspath(__file__))
 outputDir = '/Output/Part 5'
-dataDir = '/Data'
 
-initPos, initVel = np.zeros((3,27)), np.zeros((3,27))
-masses, initPos[0,:],initPos[1,:],initPos[2,:], initVel[0,:], initVel[1,:], initVel[2,:] = np.loadtxt(simDir+dataDir+'/uniformCube.txt', delimiter=' ',unpack=True)
+# Data/uniformCube.txt, run for 1000 days with a timestep of .5 days
+scenario, = loadScenarios(simDir+'/Scenarios/uniformCube.json')
+masses, initPos, initVel = initialConditions(scenario)
 
 # set constants
 secInDay = 3600*24  #seconds in day
 
-# set up simulation parameters
-timeEvol = 1000 #days 
-timeStep = .5  #days
-
-timeEvol *= secInDay #convert to seconds
-timeStep *= secInDay
-
-# format initial data
-initPos = initPos.T
-initVel = initVel.T
-
-# run sim
-times, positionArray, velocityArray = calculateTrajectories(masses,initPos,initVel,timeEvol,timeStep)
+# run sim (the run length and timestep are in the scenario)
+# (re-runs, e.g. to change a plot, read the result back from Cache/)
+times, positionArray, velocityArray = simulate(scenario, cache=simDir+'/Cache')
 
 # Question 12.
 # visualize
 #------------------------------------------------------------------#
 
-# set 3d axes
-fig = plt.figure()
-ax3d = fig.add_subplot(111, projection = '3d')
-
-ax3d.set_title('Uniform Cube of Particles: {} Days'.format(times[0]/secInDay))
-
-ax3d.set_axis_off()
-
-ax3d.grid(False) #turn grid off
-
 # number of frames
-frameNum = int((timeEvol/timeStep) + 1)
+frameNum = len(times)
 
 # axis framing (initial and final elevation and azimuth)
 initElev = 50
@@ -91,60 +69,50 @@ finAzm   = 360
 elevArray = np.linspace(initElev, finElev, frameNum)
 azmArray = np.linspace(initAzm, finAzm, frameNum)
 
-# plot initial frame
+# frames are rendered by several processes, each of which builds its own
+# figure with setup()
+def setup():
+    # set 3d axes
+    fig = plt.figure()
+    ax3d = fig.add_subplot(111, projection = '3d')
 
-#markers for particles 
-ax3d.scatter3D(positionArray[:,0,0], positionArray[:,1,0], positionArray[:,2,0])
+    ax3d.set_axis_off()
+
+    ax3d.grid(False) #turn grid off
 
-#trajectories
-for i in np.arange(len(masses)):  
-    ax3d.plot3D(positionArray[:,0,0].T,positionArray[:,1,0].T, positionArray[:,2,0].T, color='blue', lw=1)
-    
-#velocity vectors
-ax3d.quiver3D(positionArray[:,0,0],positionArray[:,1,0], positionArray[:,2,0], velocityArray[:,0,0],velocityArray[:,1,0],velocityArray[:,2,0])
+    # rotate axes every other frame; the view only depends on the frame
+    # number, so any frame can be drawn first
+    def rotate(fnum):
+        even = fnum - (fnum % 2)
+        ax3d.view_init(elevArray[even], azmArray[even])
 
-# get axes limits
-xAxisLim1,xAxisLim2 = ax3d.get_xlim()
-yAxisLim1,yAxisLim2 = ax3d.get_ylim()
-zAxisLim1,zAxisLim2 = ax3d.get_zlim()
+    # markers, trajectories and velocity vectors are created once and then
+    # updated in place on every frame
+    animator = TrajectoryAnimator(ax3d, positionArray, velocityArray, coordinates=(0,1,2),
+                                  colors='blue', label='Uniform Cube of Particles: {} Days',
+                                  labelValues=times/secInDay, onFrame=rotate)
 
-zoom = 1.5 #factor by which to zoom in/out
+    # plot initial frame
+    animator.init()
 
-xAxisLim1 *= zoom
-xAxisLim2 *= zoom
-yAxisLim1 *= zoom
-yAxisLim2 *= zoom
-zAxisLim1 *= zoom
-zAxisLim2 *= zoom
+    # get axes limits
+    xAxisLim1,xAxisLim2 = ax3d.get_xlim()
+    yAxisLim1,yAxisLim2 = ax3d.get_ylim()
+    zAxisLim1,zAxisLim2 = ax3d.get_zlim()
 
-# animate function
-def animate(fnum):
-    # progress bar
-    sys.stdout.write('\rdrawing frame {}/{}'.format(fnum,frameNum-1))
-    sys.stdout.flush()
+    zoom = 1.5 #factor by which to zoom in/out
 
-    # delete previous trajectory, markers, and velocity arrow
-    ax3d.cla()
+    xAxisLim1 *= zoom
+    xAxisLim2 *= zoom
+    yAxisLim1 *= zoom
+    yAxisLim2 *= zoom
+    zAxisLim1 *= zoom
+    zAxisLim2 *= zoom
 
-    # update title and axis 
-    ax3d.set_title('Uniform Cube of Particles: {} Days'.format(times[fnum]/secInDay))
+    # the artists are never cleared, so the limits only need setting once
     ax3d.set(xlim3d=(xAxisLim1,xAxisLim2), ylim3d=(yAxisLim1, yAxisLim2), zlim3d=(zAxisLim1,zAxisLim2))
-    
-    ax3d.set_axis_off()
-    ax3d.grid(False) #turn grid off
 
-    # rotate axes every other frame
-    if (fnum % 2 == 0):
-        ax3d.view_init(elevArray[fnum], azmArray[fnum])
-    
-    # update trajectories, markers, and velocity vectors
-    ax3d.scatter3D(positionArray[:,0,fnum],positionArray[:,1,fnum], positionArray[:,2,fnum])
-    
-    for i in np.arange(len(masses)):
-        ax3d.plot3D(positionArray[i,0,0:fnum].T, positionArray[i,1,0:fnum].T, positionArray[i,2,0:fnum].T, color='blue',lw=1)
-        
-    ax3d.quiver3D(positionArray[:,0,fnum],positionArray[:,1,fnum], positionArray[:,2,fnum], velocityArray[:,0,fnum], velocityArray[:,1,fnum], velocityArray[:,2,fnum])
-
-# animate
-anim = FuncAnimation(fig, animate, interval=25, frames = frameNum)
-anim.save(simDir+outputDir+'/uniformCube.mp4')
+    return fig, animator
+
+# animate (40 frames per second)
+renderMovie(simDir+outputDir+'/uniformCube.mp4', setup, frameNum, fps=40)
@@ -31,12 +31,13 @@ Standard:
 
 
 Non-standard:
-    main
+    nbody
 """
 import numpy as np
 import matplotlib.pyplot as plt
 import os
-from main import calculateTrajectories
+from nbody.scenario import loadScenarios, initialConditions, simulate
+from nbody.plotting import plotTrajectory
 
 # Question 6.
 # decreased init velocity
@@ -46,24 +47,16 @@ from main import calculateTrajectories
 mInAu    = 1.496e11 # meters in AU
 secInDay = 3600*24  #seconds in day
 
-# set simulation parameters
-timeEvol = 1000 #days
-timeStep = .1   #days
-
-# set intial data
-masses = np.array([1.989e30, 5.972e24])                   #kg
-initPos = np.array([[-3e-6, 0.0, 0.0],[.999997,0.0,0.0]]) #AU
-initVel = np.array([[0.0,-8.94e-2,0.0],[0.0,2.98e4,0.0]]) #m/s
-initVel /= 2.0 #halve the initial velocities
-
-# unit conversion
-initPos *= mInAu     #meters
-timeEvol *= secInDay #seconds
-timeStep *= secInDay #seconds
+# the system (table above, converted to SI units) and the run length and
+# timestep are described in Scenarios/earthInCircularOrbit2.json
+simDir = os.path.dirname(os.path.abspath(__file__))
+scenario, = loadScenarios(simDir + '/Scenarios/earthInCircularOrbit2.json')
+masses, initPos, initVel = initialConditions(scenario)
 
 # run simulation
 #-------------------------------------------------------------
-times, positionArray, velocityArray = calculateTrajectories(masses,initPos,initVel,timeEvol,timeStep)
+# (re-runs, e.g. to change a plot, read the result back from Cache/)
+times, positionArray, velocityArray = simulate(scenario, cache=simDir+'/Cache')
 
 # convert back to AU and days
 positionArray /= mInAu
@@ -72,13 +65,12 @@ times /= secInDay
 # plotting
 #------------------------------------------------------------
 
-simDir =  os.path.dirname(os.path.abspath(__file__)) #get current dir
 outputDir = '/Output/Part 3/Question 6'
 
 # plot time vs x 
 fig, ax = plt.subplots()
-ax.plot(times, positionArray[0,0,:], label='Sun',color = 'green')      #sun
-ax.plot(times, positionArray[1,0,:], label='Earth', color='blue')      #earth
+plotTrajectory(ax, times, positionArray[0,0,:], label='Sun',color = 'green')      #sun
+plotTrajectory(ax, times, positionArray[1,0,:], label='Earth', color='blue')      #earth
 
 ax.set_xlabel('Time [days]')
 ax.set_ylabel('Position [AU]')
@@ -89,8 +81,8 @@ fig.savefig(simDir + outputDir + '/timeVSxposition2.png')
 
 #plot x-y plane
 fig, ax = plt.subplots()
-ax.plot(positionArray[0,0,:], positionArray[0,1,:], label='Sun', c='green')  #sun
-ax.plot(positionArray[1,0,:], positionArray[1,1,:], label='Earth', c='blue') #earth
+plotTrajectory(ax, positionArray[0,0,:], positionArray[0,1,:], label='Sun', c='green')  #sun
+plotTrajectory(ax, positionArray[1,0,:], positionArray[1,1,:], label='Earth', c='blue') #earth
 
 initPos /= mInAu
 ax.scatter(initPos[0,0],initPos[0,1], s=100, c='green', marker = '*') #dot for sun and earth
@@ -107,7 +99,7 @@ fig.savefig(simDir + outputDir + '/xyPlane2.png')
 
 # x-velocities of sun
 fig, ax = plt.subplots()
-ax.plot(times, velocityArray[0,0,:])
+plotTrajectory(ax, times, velocityArray[0,0,:])
 
 ax.set_xlabel('Time [AU]')
 ax.set_ylabel('Radial Velocity [m/s]')
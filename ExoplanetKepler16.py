@@ -20,19 +20,17 @@ Standard:
     numpy
     matplotlib.pyplot
     os
-    sys
-    matplotlib.animation.FuncAnimation
 
 Non-standard:
-    main
+    nbody
 """
 import numpy as np
 import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
-import sys
 import os
 
-from main import calculateTrajectories
+from nbody.scenario import loadScenarios, initialConditions, simulate
+from nbody.renderer import TrajectoryAnimator
+from nbody.movie import renderMovie
 
 # Question 7.
 # load data
@@ -41,10 +39,10 @@ from main import calculateTrajectories
 # load data
 simDir = os.path.dirname(os.path.abspath(__file__))
 outputDir = '/Output/Part 4'
-dataDir = '/Data'
 
-initPos, initVel = np.zeros((3,3)), np.zeros((3,3))
-masses, initPos[0,:],initPos[1,:],initPos[2,:], initVel[0,:], initVel[1,:], initVel[2,:] = np.loadtxt(simDir+dataDir+'/kepler16.txt', delimiter=' ',unpack=True)
+# Data/kepler16.txt, run for 500 days with a timestep of .5 days
+scenario, = loadScenarios(simDir+'/Scenarios/kepler16.json')
+masses, initPos, initVel = initialConditions(scenario)
 
 # Question 8.
 # plot initial positions
@@ -56,8 +54,8 @@ gain = 50
 colorArray = ['red','green','blue']
 
 fig, ax = plt.subplots()
-ax.scatter(initPos[0,:],initPos[2,:],marker='o',s=gain*masses/maxMass, c=colorArray) #initial positions
-ax.quiver(initPos[0,:],initPos[2,:],initVel[0,:],initVel[2,:], color=colorArray)    #initial velocities
+ax.scatter(initPos[:,0],initPos[:,2],marker='o',s=gain*masses/maxMass, c=colorArray) #initial positions
+ax.quiver(initPos[:,0],initPos[:,2],initVel[:,0],initVel[:,2], color=colorArray)    #initial velocities
 
 ax.set_xlabel('Position [m]')
 ax.set_ylabel('Position [m]')
@@ -74,65 +72,30 @@ fig.savefig(simDir+outputDir+'/kepler16InitialConditions.png')
 # set constants
 secInDay = 3600*24  #seconds in day
 
-# set up simulation parameters
-timeEvol = 500 #days 
-timeStep = .5  #days
-
-timeEvol *= secInDay #convert to seconds
-timeStep *= secInDay
-
-# format initial data
-initPos = initPos.T
-initVel = initVel.T
-
-# run sim
-times, positionArray, velocityArray = calculateTrajectories(masses,initPos,initVel,timeEvol,timeStep)
+# run sim (the run length and timestep are in the scenario)
+# (re-runs, e.g. to change a plot, read the result back from Cache/)
+times, positionArray, velocityArray = simulate(scenario, cache=simDir+'/Cache')
 
 # Question 10.
 # animate
 #----------------------------------------------------------------------------
 
-# set up figure
-fig,ax = plt.subplots()
-ax.set(xlim=(-1.3e11,1.3e11), ylim=(-1.4e11,1.0e11))
-ax.set_xlabel('Position [m]')
-ax.set_ylabel('Position [m]')
-
-# initial frame
-
-#markers for planets
-ax.scatter(positionArray[:,0,0],positionArray[:,2,0], marker='o', s=gain*masses/maxMass, c=colorArray)       
-
-#trajectories
-for i in np.arange(len(masses)):  
-    ax.plot(positionArray[:,0,0].T,positionArray[:,2,0].T, c=colorArray[i]) 
-    
-#velocities
-ax.quiver(positionArray[:,0,0],positionArray[:,2,0], velocityArray[:,0,0],velocityArray[:,2,0], color = colorArray)
-
-# animation function
-def animate(fnum):
-    # progress bar
-    sys.stdout.write('\rdrawing frame {}/{}'.format(fnum,int((timeEvol/timeStep))))
-    sys.stdout.flush()
-
-    # delete previous trajectory, markers, and velocity arrow
-    ax.clear()
-
-    # update title and axis 
-    ax.set_title('X-Z Plane of Kepler-16ABb System: {} Days'.format(times[fnum]/secInDay))
+# frames are rendered by several processes, each of which builds its own
+# figure with setup()
+def setup():
+    # set up figure
+    fig,ax = plt.subplots()
     ax.set(xlim=(-1.3e11,1.3e11), ylim=(-1.4e11,1.0e11))
     ax.set_xlabel('Position [m]')
     ax.set_ylabel('Position [m]')
 
-    # update trajectories, markers, and velocity vectors
-    ax.scatter(positionArray[:,0,fnum],positionArray[:,2,fnum], marker='o', s=gain*masses/maxMass, c=colorArray)
-    
-    for i in np.arange(len(masses)):
-        ax.plot(positionArray[i,0,0:fnum].T,positionArray[i,2,0:fnum].T, c=colorArray[i])
-        
-    ax.quiver(positionArray[:,0,fnum],positionArray[:,2,fnum], velocityArray[:,0,fnum],velocityArray[:,2,fnum], color = colorArray)
+    # markers, trajectories and velocities are drawn once and then updated in
+    # place on every frame
+    animator = TrajectoryAnimator(ax, positionArray, velocityArray, coordinates=(0,2),
+                                  colors=colorArray, sizes=gain*masses/maxMass,
+                                  label='X-Z Plane of Kepler-16ABb System: {} Days',
+                                  labelValues=times/secInDay)
+    return fig, animator
 
-# animate
-anim = FuncAnimation(fig, animate, interval=50, frames = int((timeEvol/timeStep) + 1))
-anim.save(simDir+outputDir+'/kepler16Animation.mp4')
+# animate (20 frames per second)
+renderMovie(simDir+outputDir+'/kepler16Animation.mp4', setup, len(times), fps=20)
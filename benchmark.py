@@ -0,0 +1,455 @@
+'''Scaling benchmarks for the force engines, integrators and runs.
+
+Sweeps the number of particles (and the number of steps for whole runs) over
+
+    forces      forces.calculateForceVectors and every force engine in
+                forces.forceEngines, one call each
+    update      leapfrog.updateParticles, one step each
+    run         main.calculateTrajectories, a whole run each
+    import      import nbody, in a fresh interpreter each
+    timesteps   leap-frog against block time steps (blocksteps) on a
+                hierarchical system, a whole run each: force evaluations
+                and energy error (not in the default groups)
+
+starting from the Data/kepler16.txt (N = 3) and Data/uniformCube.txt (N = 27)
+scenarios. Larger N are uniform cubes of the same size, total mass and
+velocity spread, drawn with a fixed seed so every run times the same system.
+
+For every case it records calls or steps per second, pair interactions per
+second (N(N-1)/2 per force evaluation, counted by wrapping the engine, so
+approximate engines are credited with the pairs they stand in for) and the
+peak memory numpy allocated, and writes them to a JSON file. Given a
+baseline file from an earlier run it compares the two and exits with status
+1 if any case got slower than the allowed tolerance. It also exits with
+status 1 if importing nbody pulls in any of HEAVY_MODULES, which the core
+must leave to the scripts that plot or ask for the optional engines.
+
+Usage
+=====
+    python benchmark.py                       # full sweep -> benchmark.json
+    python benchmark.py --quick               # small N only
+    python benchmark.py --output new.json --baseline benchmark.json
+    python benchmark.py --engines direct barneshut --sizes 1000 10000
+    python benchmark.py --groups import
+    python benchmark.py --groups timesteps
+
+A baseline file may carry a "thresholds" dict of per-case tolerances
+(fractions, keyed by case name) overriding --tolerance.
+'''
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+from nbody import calculateForceVectors, calculateTrajectories, getForceEngine, \
+    getIntegrator, loadInitialConditions, updateParticles
+from nbody.forces import G, forceEngines
+from nbody.diagnostics import conservedQuantities
+
+dataDir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Data')
+
+SIZES = (3, 27, 1000, 10000)
+QUICK_SIZES = (3, 27, 1000)
+RUN_STEPS = (100, 1000)
+SEED = 2600
+
+# O(N^2) engines are only run up to here
+MAX_N = {'direct': 10000, 'numba': 10000, 'processes': 10000}
+
+# runs are skipped when N**2 * steps is above this
+MAX_RUN_WORK = 1e8
+
+# hierarchical system for the timesteps group: a hot Jupiter (4-day period)
+# and HIERARCHICAL_OUTER Earth-mass planets at 5-30 AU, for a month
+HIERARCHICAL_OUTER = 300
+HIERARCHICAL_DAYS = 30
+LEAPFROG_STEPS = (0.02, 0.01, 0.005) # days
+BLOCK_ETAS = (0.02, 0.01, 0.005)
+BLOCK_DT = 10 # days
+BLOCK_MAX_LEVEL = 14
+
+# modules `import nbody` must not load
+HEAVY_MODULES = ('matplotlib', 'numba', 'scipy')
+IMPORT_REPEATS = 5
+
+# run by a fresh interpreter: import time, peak memory and heavy modules loaded
+_IMPORT_SCRIPT = '''
+import json, sys, time, tracemalloc
+import numpy
+tracemalloc.start()
+start = time.perf_counter()
+import nbody
+seconds = time.perf_counter() - start
+_, peak = tracemalloc.get_traced_memory()
+heavy = sorted(name for name in sys.modules if name.split('.')[0] in {heavy!r})
+print(json.dumps({{'seconds': seconds, 'peakMemory': peak, 'heavy': heavy}}))
+'''
+
+def scenario(N):
+    """
+    Initial conditions with N particles.
+
+    Returns
+    -------
+    masses, positions, velocities, dt
+        Arrays for calculateTrajectories and a time step (s) that suits
+        the system.
+    """
+    secInDay = 3600*24
+    if N == 3:
+        masses, positions, velocities = loadInitialConditions(os.path.join(dataDir, 'kepler16.txt'))
+        return masses, positions, velocities, .5*secInDay
+
+    masses, positions, velocities = loadInitialConditions(os.path.join(dataDir, 'uniformCube.txt'))
+    if N == len(masses):
+        return masses, positions, velocities, .5*secInDay
+
+    # a bigger (or smaller) cube like the one in the file
+    rng = np.random.default_rng(SEED)
+    low, high = positions.min(axis=0), positions.max(axis=0)
+    newPositions = rng.uniform(low, high, size=(N, 3))
+    newVelocities = rng.normal(velocities.mean(axis=0), velocities.std(axis=0), size=(N, 3))
+    newMasses = np.full(N, masses.sum() / N)
+    return newMasses, newPositions, newVelocities, .5*secInDay
+
+def hierarchical():
+    """
+    A system with widely different orbital periods: a Sun, a hot Jupiter at
+    0.05 AU and HIERARCHICAL_OUTER light planets on circular orbits between
+    5 and 30 AU, in the centre-of-mass frame.
+
+    Returns
+    -------
+    masses, positions, velocities
+    """
+    msun, au = 1.989e30, 1.496e11
+    rng = np.random.default_rng(SEED)
+    radii = np.concatenate([[0.05], rng.uniform(5, 30, HIERARCHICAL_OUTER)]) * au
+    angles = rng.uniform(0, 2*np.pi, len(radii))
+    speeds = np.sqrt(G * msun / radii)
+
+    masses = np.concatenate([[msun, 1.9e27], np.full(HIERARCHICAL_OUTER, 5.97e24)])
+    positions = np.zeros((len(masses), 3))
+    velocities = np.zeros((len(masses), 3))
+    positions[1:, 0], positions[1:, 1] = radii * np.cos(angles), radii * np.sin(angles)
+    velocities[1:, 0], velocities[1:, 1] = -speeds * np.sin(angles), speeds * np.cos(angles)
+    velocities -= np.sum(masses[:, np.newaxis] * velocities, axis=0) / masses.sum()
+    return masses, positions, velocities
+
+class _CountingEngine:
+    """Force engine wrapper that counts the pair interactions it stands for."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.pairs = 0
+
+    def __call__(self, masses, positions):
+        N = positions.shape[-2]
+        self.pairs += int(np.prod(positions.shape[:-2], dtype=int)) * N * (N - 1) // 2
+        return self.engine(masses, positions)
+
+def _time(function, minTime, repeats):
+    """
+    Best time of one call of function, over repeats rounds of at least
+    minTime seconds each.
+    """
+    function()  # warm up (imports, JIT compilation, worker start-up)
+
+    best = np.inf
+    for _ in range(repeats):
+        calls = 0
+        start = time.perf_counter()
+        while True:
+            function()
+            calls += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= minTime:
+                break
+        best = min(best, elapsed / calls)
+    return best
+
+def _peakMemory(function):
+    """Peak memory (bytes) numpy and Python allocate during one call."""
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+def measure(name, function, counter=None, steps=1, minTime=0.2, repeats=3, **info):
+    """
+    Benchmark one case.
+
+    Parameters
+    ----------
+    name : str
+        Unique case name; baselines are matched by it.
+    function : callable
+        Runs the case once.
+    counter : _CountingEngine, optional
+        Engine used by function, to count pair interactions.
+    steps : int
+        Integration steps one call makes (1 for a force evaluation).
+    **info
+        Extra entries for the result (group, N, engine, ...).
+
+    Returns
+    -------
+    result : dict
+        seconds per call, rate (steps or calls per second),
+        pairsPerSecond and peakMemory (bytes), plus info.
+    """
+    # the progress lines of calculateTrajectories would only add noise
+    with contextlib.redirect_stdout(io.StringIO()):
+        seconds = _time(function, minTime, repeats)
+        if counter is not None:
+            counter.pairs = 0
+        peak = _peakMemory(function)
+
+    result = dict(info, name=name, seconds=seconds, steps=steps, rate=steps / seconds,
+                  peakMemory=peak)
+    if counter is not None:
+        result['pairsPerSecond'] = counter.pairs / seconds
+    return result
+
+def benchmarkForces(sizes, engines, **timing):
+    results = []
+    for N in sizes:
+        masses, positions, _, _ = scenario(N)
+
+        results.append(measure('forces/calculateForceVectors/N={}'.format(N),
+                               lambda: calculateForceVectors(masses, positions),
+                               group='forces', N=N, engine='calculateForceVectors', **timing))
+        # calculateForceVectors is a plain function; count its pairs directly
+        results[-1]['pairsPerSecond'] = N * (N - 1) / 2 / results[-1]['seconds']
+
+        for name in engines:
+            if N > MAX_N.get(name, np.inf):
+                continue
+            engine = getForceEngine(name)
+            counter = _CountingEngine(engine)
+            try:
+                results.append(measure('forces/{}/N={}'.format(name, N),
+                                       lambda: counter(masses, positions), counter,
+                                       group='forces', N=N, engine=name, **timing))
+            finally:
+                if hasattr(engine, 'close'):
+                    engine.close()
+    return results
+
+def benchmarkUpdate(sizes, **timing):
+    results = []
+    for N in sizes:
+        if N > MAX_N['direct']:
+            continue
+        masses, positions, velocities, dt = scenario(N)
+        counter = _CountingEngine(getForceEngine('direct'))
+        results.append(measure('update/N={}'.format(N),
+                               lambda: updateParticles(masses, positions, velocities, dt, counter),
+                               counter, group='update', N=N, engine='direct', **timing))
+    return results
+
+def benchmarkRuns(sizes, stepCounts, **timing):
+    results = []
+    for N in sizes:
+        for numSteps in stepCounts:
+            # keep whole runs to a few seconds
+            if N * N * numSteps > MAX_RUN_WORK:
+                continue
+            masses, positions, velocities, dt = scenario(N)
+            counter = _CountingEngine(getForceEngine('direct'))
+            results.append(measure('run/N={}/steps={}'.format(N, numSteps),
+                                   lambda: calculateTrajectories(masses, positions, velocities,
+                                                                 numSteps*dt, dt, counter),
+                                   counter, steps=numSteps, group='run', N=N,
+                                   engine='direct', **dict(timing, repeats=1)))
+    return results
+
+def benchmarkImport(repeats=IMPORT_REPEATS):
+    """
+    Time `import nbody` in fresh interpreters.
+
+    numpy is imported before the clock starts; every script needs it anyway,
+    so only what the package itself adds is timed. The best of repeats
+    interpreters is kept.
+
+    Returns
+    -------
+    results : list of dict
+        One result like those of measure, with the heavy modules the import
+        loaded under 'heavyModules'.
+    """
+    script = _IMPORT_SCRIPT.format(heavy=set(HEAVY_MODULES))
+    root = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get('PYTHONPATH')])))
+
+    best = None
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, '-c', script], env=env, cwd=root,
+                                check=True, capture_output=True, text=True).stdout
+        child = json.loads(output.splitlines()[-1])
+        if best is None or child['seconds'] < best['seconds']:
+            best = child
+
+    return [{'group': 'import', 'name': 'import/nbody', 'seconds': best['seconds'], 'steps': 1,
+             'rate': 1 / best['seconds'], 'peakMemory': best['peakMemory'],
+             'heavyModules': best['heavy']}]
+
+def benchmarkTimesteps():
+    """
+    Force evaluations and energy error of leap-frog and of block time steps
+    on the hierarchical system, one whole run per case (timed once: these
+    are long).
+
+    Returns
+    -------
+    results : list of dict
+        Results like those of measure, plus forceEvaluations (in units of a
+        full N-particle evaluation) and energyError (relative, at the end).
+    """
+    secInDay = 3600*24
+    masses, positions, velocities = hierarchical()
+    timeEvol = HIERARCHICAL_DAYS * secInDay
+    energy = conservedQuantities(masses, positions, velocities)['energy']
+
+    cases = [('leapfrog', dt * secInDay, {}, 'timesteps/leapfrog/dt={}d'.format(dt))
+             for dt in LEAPFROG_STEPS]
+    cases += [('block', BLOCK_DT * secInDay, {'eta': eta, 'maxLevel': BLOCK_MAX_LEVEL},
+               'timesteps/block/eta={}'.format(eta)) for eta in BLOCK_ETAS]
+
+    results = []
+    for integrator, dt, options, name in cases:
+        numSteps = int(round(timeEvol / dt))
+        start = time.perf_counter()
+        stepper = getIntegrator(integrator)(masses, positions, velocities, **options)
+        for _ in range(numSteps):
+            newPositions, newVelocities = stepper.step(dt)
+        seconds = time.perf_counter() - start
+
+        error = abs(conservedQuantities(masses, newPositions, newVelocities)['energy'] / energy - 1)
+        results.append({'group': 'timesteps', 'name': name, 'integrator': integrator,
+                        'N': len(masses), 'seconds': seconds, 'steps': numSteps,
+                        'rate': 1 / seconds, 'peakMemory': 0,
+                        'forceEvaluations': float(stepper.forceEvaluations),
+                        'energyError': float(error)})
+    return results
+
+def compare(results, baseline, tolerance):
+    """
+    Cases slower than the baseline by more than the tolerance.
+
+    Returns
+    -------
+    regressions : list of str
+        One line per case whose rate fell below (1 - tolerance) times the
+        baseline rate.
+    """
+    thresholds = baseline.get('thresholds', {})
+    previous = {result['name']: result for result in baseline['results']}
+
+    regressions = []
+    for result in results:
+        if result['name'] not in previous:
+            continue
+        allowed = thresholds.get(result['name'], tolerance)
+        ratio = result['rate'] / previous[result['name']]['rate']
+        if ratio < 1 - allowed:
+            regressions.append('{}: {:.3g}/s, was {:.3g}/s ({:.0%} slower, {:.0%} allowed)'.format(
+                result['name'], result['rate'], previous[result['name']]['rate'],
+                1 - ratio, allowed))
+    return regressions
+
+def environment():
+    """What the numbers were measured on."""
+    return {'python': platform.python_version(), 'numpy': np.__version__,
+            'platform': platform.platform(), 'processor': platform.processor(),
+            'cpuCount': os.cpu_count(), 'date': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark force engines, integrators and runs.')
+    parser.add_argument('--sizes', type=int, nargs='+', help='particle numbers to sweep')
+    parser.add_argument('--quick', action='store_true', help='small particle numbers only')
+    parser.add_argument('--steps', type=int, nargs='+', default=RUN_STEPS,
+                        help='run lengths for calculateTrajectories')
+    parser.add_argument('--engines', nargs='+', default=sorted(forceEngines),
+                        help='force engines to benchmark')
+    parser.add_argument('--groups', nargs='+', default=['import', 'forces', 'update', 'run'],
+                        help='which benchmarks to run')
+    parser.add_argument('--min-time', type=float, default=0.2,
+                        help='seconds each timing round lasts at least')
+    parser.add_argument('--output', default='benchmark.json', help='JSON file for the results')
+    parser.add_argument('--baseline', help='earlier results to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed slowdown against the baseline, as a fraction')
+    args = parser.parse_args(argv)
+
+    sizes = args.sizes or (QUICK_SIZES if args.quick else SIZES)
+    timing = {'minTime': args.min_time}
+
+    # read the baseline first, so it can also be the output file
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = []
+    if 'import' in args.groups:
+        results += benchmarkImport()
+    if 'forces' in args.groups:
+        results += benchmarkForces(sizes, args.engines, **timing)
+    if 'update' in args.groups:
+        results += benchmarkUpdate(sizes, **timing)
+    if 'run' in args.groups:
+        results += benchmarkRuns(sizes, args.steps, **timing)
+    if 'timesteps' in args.groups:
+        results += benchmarkTimesteps()
+
+    print('{:<40} {:>12} {:>14} {:>12}'.format('case', 'rate (/s)', 'pairs (/s)', 'peak (MB)'))
+    print('-'*81)
+    for result in results:
+        print('{:<40} {:>12.4g} {:>14.4g} {:>12.2f}'.format(
+            result['name'], result['rate'], result.get('pairsPerSecond', np.nan),
+            result['peakMemory'] / 2**20))
+
+    timesteps = [result for result in results if result['group'] == 'timesteps']
+    if timesteps:
+        print('\n{:<40} {:>12} {:>14} {:>12}'.format('case', 'seconds', 'force evals', 'dE/E'))
+        print('-'*81)
+        for result in timesteps:
+            print('{:<40} {:>12.4g} {:>14.0f} {:>12.2e}'.format(
+                result['name'], result['seconds'], result['forceEvaluations'],
+                result['energyError']))
+
+    report = {'environment': environment(), 'results': results}
+    if baseline is not None and 'thresholds' in baseline:
+        report['thresholds'] = baseline['thresholds']
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=1)
+
+    status = 0
+    heavy = sorted({name for result in results for name in result.get('heavyModules', [])})
+    if heavy:
+        print('\nimport nbody loaded {}'.format(', '.join(heavy)))
+        status = 1
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print('\nSlower than {}:'.format(args.baseline))
+            for line in regressions:
+                print('  ' + line)
+            return 1
+        print('\nNo regressions against {}'.format(args.baseline))
+    return status
+
+if __name__ == '__main__':
+    sys.exit(main())
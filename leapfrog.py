@@ -1,60 +0,0 @@
-import numpy as np
-from forces import calculateForceVectors
-
-def updateParticles(masses, positions, velocities, dt):
-    """
-    Evolve particles in time via leap-frog integrator scheme. This function
-    takes masses, positions, velocities, and a time step dt as
-
-    Parameters
-    ----------
-    masses : np.ndarray
-        1-D array containing masses for all particles, in kg
-        It has length N, where N is the number of particles.
-    positions : np.ndarray
-        2-D array containing (x, y, z) positions for all particles.
-        Shape is (N, 3) where N is the number of particles.
-    velocities : np.ndarray
-        2-D array containing (x, y, z) velocities for all particles.
-        Shape is (N, 3) where N is the number of particles.
-    dt : float
-        Evolve system for time dt (in seconds).
-
-    Returns
-    -------
-    Updated particle positions and particle velocities, each being a 2-D
-    array with shape (N, 3), where N is the number of particles.
-
-    """
-
-    startingPositions = np.array(positions)
-    startingVelocities = np.array(velocities)
-
-    # how many particles are there?
-    nParticles, nDimensions = startingPositions.shape
-
-    # make sure the three input arrays have consistent shapes
-    assert(startingVelocities.shape == startingPositions.shape)
-    assert(len(masses) == nParticles)
-
-    # calculate net force vectors on all particles, at the starting position
-    startingForces = np.array(calculateForceVectors(masses, startingPositions))
-
-    # calculate the acceleration due to gravity, at the starting position
-    startingAccelerations = startingForces/np.array(masses).reshape(nParticles, 1)
-
-    # calculate the ending position
-    nudge = startingVelocities*dt + 0.5*startingAccelerations*dt**2
-    endingPositions = startingPositions + nudge
-
-    # calculate net force vectors on all particles, at the ending position
-    endingForces = np.array(calculateForceVectors(masses, endingPositions))
-
-    # calculate the acceleration due to gravity, at the ending position
-    endingAccelerations = endingForces/np.array(masses).reshape(nParticles, 1)
-
-    # calculate the ending velocity
-    endingVelocities = (startingVelocities +
-                        0.5*(endingAccelerations + startingAccelerations)*dt)
-
-    return endingPositions, endingVelocities
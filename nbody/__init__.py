@@ -0,0 +1,57 @@
+'''N-body gravity simulation.
+
+The simulation core only needs NumPy:
+
+    forces          force kernels and the force engine registry
+    leapfrog        updateParticles and the leap-frog stepper
+    integrators     integrator registry (leap-frog, Forest-Ruth, Yoshida,
+                    block time steps, Wisdom-Holman)
+    wisdomholman    Wisdom-Holman integrator and Kepler solver
+    main            calculateTrajectories, resumeTrajectories,
+                    iterateTrajectories
+    trajectory      in-memory and on-disk trajectories
+    checkpoint      checkpoints for resuming runs
+    snapshot        initial-condition and snapshot files
+    telemetry       run hooks, timers and summaries
+    diagnostics     energy and momentum bookkeeping
+    encounters      close-encounter detection
+    cache           on-disk cache of results, reused by longer runs
+    scenario        runs described by JSON scenario files
+    batch           runs many scenarios in parallel
+                    (python -m nbody.batch Scenarios/*.json)
+
+Optional force engines are only imported when they are asked for by name
+(barneshut, particlemesh, jitforces, which needs numba, and parallelforces).
+Plotting and animation need matplotlib and are never imported by the core.
+Their modules are imported the first time one of their names is looked up
+(nbody.TrajectoryAnimator), or can be imported explicitly:
+
+    renderer        TrajectoryAnimator
+    movie           renderMovie (parallel rendering into ffmpeg)
+    plotting        plotTrajectory (screen-resolution decimation)
+
+Example
+-------
+    from nbody import calculateTrajectories, loadInitialConditions
+
+    masses, initPos, initVel = loadInitialConditions('Data/kepler16.txt')
+    times, positionArray, velocityArray = calculateTrajectories(
+        masses, initPos, initVel, timeEvol, dt)
+'''
+from .forces import G, calculateAccelerations, calculateForceVectors, getForceEngine
+from .leapfrog import updateParticles, LeapfrogStepper
+from .integrators import getIntegrator, registerIntegrator
+from .main import calculateTrajectories, resumeTrajectories, iterateTrajectories
+from .trajectory import Trajectory, TrajectoryWriter, loadTrajectory, readTrajectory
+from .snapshot import loadInitialConditions, readSnapshot, writeSnapshot
+from .telemetry import RunMonitor
+from .diagnostics import Diagnostics
+
+# names of the matplotlib modules, imported on first use
+_lazy = {'TrajectoryAnimator': 'renderer', 'renderMovie': 'movie', 'plotTrajectory': 'plotting'}
+
+def __getattr__(name):
+    if name in _lazy:
+        import importlib
+        return getattr(importlib.import_module('.' + _lazy[name], __name__), name)
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
@@ -0,0 +1,338 @@
+'''Barnes-Hut octree force engine.
+
+The tree is stored as flat arrays (one entry per node) rather than as linked
+node objects: particles are sorted along a Morton (Z-order) curve, so every
+node is a contiguous range of the sorted particles and every node's children
+are a contiguous range of the next tree level. Both building the tree and
+walking it are done a whole level (or a whole chunk of target particles) at
+a time with NumPy.
+'''
+import numpy as np
+from .forces import G
+
+# bits per dimension of the integer grid particles are snapped onto; 3 * 21
+# bits still fits in one 64-bit Morton key
+MAX_DEPTH = 21
+
+def _spreadBits(x):
+    """
+    Spread the low 21 bits of each integer in x so there are two zero bits
+    between each of them (the building block of a 3D Morton key).
+    """
+    x = x.astype(np.uint64) & np.uint64(0x1fffff)
+    x = (x | x << np.uint64(32)) & np.uint64(0x1f00000000ffff)
+    x = (x | x << np.uint64(16)) & np.uint64(0x1f0000ff0000ff)
+    x = (x | x << np.uint64(8)) & np.uint64(0x100f00f00f00f00f)
+    x = (x | x << np.uint64(4)) & np.uint64(0x10c30c30c30c30c3)
+    x = (x | x << np.uint64(2)) & np.uint64(0x1249249249249249)
+    return x
+
+def mortonKeys(cells):
+    """
+    Interleave the bits of (N, 3) integer cell coordinates into N Morton keys.
+    """
+    return (_spreadBits(cells[:, 0]) << np.uint64(2) |
+            _spreadBits(cells[:, 1]) << np.uint64(1) |
+            _spreadBits(cells[:, 2]))
+
+class Octree:
+    """
+    Array-based octree over a set of particles.
+
+    Parameters
+    ----------
+    masses : 1D numpy array
+        Particle masses, in kg.
+    positions : (N, 3) numpy array
+        Particle positions, in m.
+    leafSize : int
+        Nodes holding at most this many particles are not subdivided.
+    maxDepth : int
+        Maximum number of levels below the root (at most 21).
+
+    Attributes
+    ----------
+    order : (N,) int array
+        Sorting permutation; sorted quantities are ``quantity[order]``.
+    start, count : (nNodes,) int arrays
+        Range of sorted particles held by each node.
+    level : (nNodes,) int array
+        Depth of each node (the root is level 0).
+    childStart, childCount : (nNodes,) int arrays
+        Range of node indices holding each node's children (childCount is 0
+        for leaves).
+    mass, com : (nNodes,) and (nNodes, 3) float arrays
+        Total mass and center of mass of each node.
+    quadrupole : (nNodes, 3, 3) float array
+        Traceless quadrupole moment of each node about its center of mass.
+    size : (nNodes,) float array
+        Side length of each node's cube.
+    """
+
+    def __init__(self, masses, positions, leafSize=8, maxDepth=16):
+        masses = np.asarray(masses, dtype=float)
+        positions = np.asarray(positions, dtype=float)
+        assert positions.ndim == 2 and positions.shape[1] == 3, 'Octree needs (N, 3) positions'
+        assert 0 < maxDepth <= MAX_DEPTH, 'maxDepth must be between 1 and {}'.format(MAX_DEPTH)
+
+        self.leafSize = leafSize
+        self.maxDepth = maxDepth
+
+        # bounding cube, padded slightly so no particle sits on the top face
+        self.corner = positions.min(axis=0)
+        extent = np.max(positions.max(axis=0) - self.corner)
+        self.rootSize = extent * (1 + 1e-9) if extent > 0 else 1.0
+
+        # snap particles onto a 2**maxDepth integer grid and sort along the
+        # Morton curve
+        nCells = 2**maxDepth
+        cells = np.floor((positions - self.corner) / self.rootSize * nCells).astype(np.int64)
+        cells = np.clip(cells, 0, nCells - 1)
+        keys = mortonKeys(cells)
+        self.order = np.argsort(keys, kind='stable')
+
+        self.keys = keys[self.order]
+        self.cells = cells[self.order]
+        self.masses = masses[self.order]
+        self.positions = positions[self.order]
+
+        self._build()
+
+    def _build(self):
+        N = len(self.masses)
+        levels = []
+
+        # groups of the previous level that get subdivided, as (start, stop)
+        # ranges of sorted particles
+        openStart = np.array([0])
+        openStop = np.array([N])
+
+        for level in range(self.maxDepth + 1):
+            # every distinct key prefix at this level is a candidate node
+            shift = np.uint64(3 * (self.maxDepth - level))
+            prefix = self.keys >> shift
+            groupStart = np.concatenate(([0], np.flatnonzero(prefix[1:] != prefix[:-1]) + 1))
+            groupStop = np.append(groupStart[1:], N)
+
+            # ... but only the ones inside an open node of the previous level
+            parent = np.searchsorted(openStart, groupStart, side='right') - 1
+            keep = (parent >= 0) & (groupStart < openStop[np.maximum(parent, 0)])
+
+            mass, com, quadrupole = self._moments(level, groupStart)
+
+            nodes = {
+                'start': groupStart[keep],
+                'count': (groupStop - groupStart)[keep],
+                'parent': parent[keep],
+                'mass': mass[keep],
+                'com': com[keep],
+                'quadrupole': quadrupole[keep],
+                'level': np.full(np.count_nonzero(keep), level),
+            }
+            levels.append(nodes)
+
+            # nodes with too many particles are subdivided on the next level
+            isOpen = nodes['count'] > self.leafSize
+            if level == self.maxDepth or not np.any(isOpen):
+                break
+            openStart = nodes['start'][isOpen]
+            openStop = openStart + nodes['count'][isOpen]
+
+        # stitch the levels into flat node arrays, root first
+        offsets = np.cumsum([0] + [len(nodes['start']) for nodes in levels])
+        for name in ('start', 'count', 'level', 'mass', 'com', 'quadrupole'):
+            setattr(self, name, np.concatenate([nodes[name] for nodes in levels]))
+
+        self.childStart = np.zeros(offsets[-1], dtype=np.int64)
+        self.childCount = np.zeros(offsets[-1], dtype=np.int64)
+        for level in range(1, len(levels)):
+            # map each node to its parent's global index (the parent index
+            # above counts only open nodes of the previous level)
+            previous = levels[level - 1]
+            openNodes = offsets[level - 1] + np.flatnonzero(previous['count'] > self.leafSize)
+            parents = openNodes[levels[level]['parent']]
+            children = offsets[level] + np.arange(len(parents))
+
+            uniqueParents, first, counts = np.unique(parents, return_index=True, return_counts=True)
+            self.childStart[uniqueParents] = children[first]
+            self.childCount[uniqueParents] = counts
+
+        self.size = self.rootSize / 2.0**self.level
+        self.cellIndex = self.cells[self.start] >> (self.maxDepth - self.level)[:, np.newaxis]
+
+    def _moments(self, level, groupStart):
+        """
+        Mass, center of mass and traceless quadrupole of every group of
+        particles sharing a key prefix at this level.
+
+        Positions are taken relative to the lower corner of each particle's
+        cell at this level, so the second moments do not lose precision to
+        cancellation when the cell is far from the origin.
+        """
+        cellSize = self.rootSize / 2.0**level
+        cellCorner = self.corner + (self.cells >> (self.maxDepth - level)) * cellSize
+        relative = self.positions - cellCorner
+
+        mass = np.add.reduceat(self.masses, groupStart)
+        firstMoment = np.add.reduceat(self.masses[:, np.newaxis] * relative, groupStart)
+        secondMoment = np.add.reduceat(
+            self.masses[:, np.newaxis, np.newaxis] * relative[:, :, np.newaxis] * relative[:, np.newaxis, :],
+            groupStart)
+
+        # guard against massless nodes (e.g. all test particles)
+        safeMass = np.where(mass > 0, mass, 1.0)
+        comRelative = firstMoment / safeMass[:, np.newaxis]
+        com = cellCorner[groupStart] + comRelative
+
+        # second moment about the center of mass, then its traceless part
+        about = secondMoment - mass[:, np.newaxis, np.newaxis] * comRelative[:, :, np.newaxis] * comRelative[:, np.newaxis, :]
+        trace = np.trace(about, axis1=1, axis2=2)
+        quadrupole = 3 * about - trace[:, np.newaxis, np.newaxis] * np.eye(3)
+
+        return mass, com, quadrupole
+
+    def accelerations(self, theta=0.5, quadrupole=False, chunkSize=4096):
+        """
+        Walk the tree and compute the acceleration of every particle.
+
+        A node is used as a single pseudo-particle when size / distance is
+        below theta and the target does not lie inside it; otherwise it is
+        opened, or summed particle by particle if it is a leaf.
+
+        Returns
+        -------
+        accelerations : (N, 3) numpy array
+            Accelerations in m/s2, in the original particle order.
+        """
+        N = len(self.masses)
+        sortedAccelerations = np.zeros((N, 3))
+
+        # walk the tree for a chunk of targets at a time so the interaction
+        # lists stay bounded in memory
+        for chunkStart in range(0, N, chunkSize):
+            targets = np.arange(chunkStart, min(chunkStart + chunkSize, N))
+            sortedAccelerations[targets] = self._walk(targets, theta, quadrupole)
+
+        accelerations = np.empty_like(sortedAccelerations)
+        accelerations[self.order] = sortedAccelerations
+        return accelerations
+
+    def _walk(self, targets, theta, quadrupole):
+        chunkOffset = targets[0]
+        accelerations = np.zeros((len(targets), 3))
+
+        # (target, node) pairs still to be decided, starting at the root
+        pairTarget = targets.copy()
+        pairNode = np.zeros(len(targets), dtype=np.int64)
+
+        while len(pairTarget) > 0:
+            # vector from each target to its node's center of mass
+            separation = self.com[pairNode] - self.positions[pairTarget]
+            sep2 = np.sum(separation**2, axis=1)
+
+            # a target inside a node's cube can never use it as a whole
+            level = self.level[pairNode]
+            targetCell = self.cells[pairTarget] >> (self.maxDepth - level)[:, np.newaxis]
+            inside = np.all(targetCell == self.cellIndex[pairNode], axis=1)
+
+            accept = ~inside & (self.size[pairNode]**2 < theta**2 * sep2)
+            isLeaf = self.childCount[pairNode] == 0
+
+            # far enough away: monopole (and quadrupole) of the whole node
+            if np.any(accept):
+                accelerations += self._multipole(
+                    pairTarget[accept] - chunkOffset, pairNode[accept],
+                    separation[accept], sep2[accept], quadrupole, len(targets))
+
+            # close leaves: sum over their particles directly
+            direct = ~accept & isLeaf
+            if np.any(direct):
+                accelerations += self._direct(
+                    pairTarget[direct], pairNode[direct], chunkOffset, len(targets))
+
+            # close internal nodes: replace the node with its children
+            expand = ~accept & ~isLeaf
+            parentNode = pairNode[expand]
+            nChildren = self.childCount[parentNode]
+            pairTarget = np.repeat(pairTarget[expand], nChildren)
+            pairNode = np.repeat(self.childStart[parentNode], nChildren) + _rangesWithin(nChildren)
+
+        return accelerations
+
+    def _multipole(self, localTarget, node, separation, sep2, quadrupole, nTargets):
+        sep = np.sqrt(sep2)
+        pull = (G * self.mass[node] / (sep2 * sep))[:, np.newaxis] * separation
+
+        if quadrupole:
+            # r points from the node's center of mass to the target
+            r = -separation
+            Qr = np.einsum('nij,nj->ni', self.quadrupole[node], r)
+            rQr = np.sum(r * Qr, axis=1)
+            sep5 = sep2 * sep2 * sep
+            pull += G * (Qr / sep5[:, np.newaxis] -
+                         (2.5 * rQr / (sep5 * sep2))[:, np.newaxis] * r)
+
+        return _sumByTarget(localTarget, pull, nTargets)
+
+    def _direct(self, target, node, chunkOffset, nTargets):
+        nParticles = self.count[node]
+        pairTarget = np.repeat(target, nParticles)
+        source = np.repeat(self.start[node], nParticles) + _rangesWithin(nParticles)
+
+        # a particle does not pull on itself
+        notSelf = source != pairTarget
+        pairTarget, source = pairTarget[notSelf], source[notSelf]
+
+        separation = self.positions[source] - self.positions[pairTarget]
+        sep2 = np.sum(separation**2, axis=1)
+        pull = (G * self.masses[source] / (sep2 * np.sqrt(sep2)))[:, np.newaxis] * separation
+
+        return _sumByTarget(pairTarget - chunkOffset, pull, nTargets)
+
+def _rangesWithin(counts):
+    """
+    For counts [2, 3] return [0, 1, 0, 1, 2]: the position of each element
+    within its own run when runs of the given lengths are laid end to end.
+    """
+    runStarts = np.repeat(np.cumsum(counts) - counts, counts)
+    return np.arange(np.sum(counts)) - runStarts
+
+def _sumByTarget(localTarget, values, nTargets):
+    """Add up (n, 3) values that belong to the same target."""
+    return np.stack([np.bincount(localTarget, weights=values[:, k], minlength=nTargets)
+                     for k in range(3)], axis=1)
+
+class BarnesHut:
+    """
+    Barnes-Hut force engine, usable anywhere calculateAccelerations is.
+
+    Parameters
+    ----------
+    theta : float
+        Opening angle. Smaller is more accurate and slower; theta = 0 opens
+        every node and reproduces direct summation.
+    quadrupole : bool
+        Add each node's quadrupole moment to its monopole.
+    leafSize : int
+        Nodes holding at most this many particles are summed directly.
+    maxDepth : int
+        Maximum tree depth.
+    chunkSize : int
+        Number of target particles walked through the tree together.
+
+    Example
+    -------
+        engine = BarnesHut(theta=0.5, quadrupole=True)
+        accelerations = engine(masses, positions)
+    """
+
+    def __init__(self, theta=0.5, quadrupole=False, leafSize=8, maxDepth=16, chunkSize=4096):
+        self.theta = theta
+        self.quadrupole = quadrupole
+        self.leafSize = leafSize
+        self.maxDepth = maxDepth
+        self.chunkSize = chunkSize
+
+    def __call__(self, masses, positions):
+        tree = Octree(masses, positions, leafSize=self.leafSize, maxDepth=self.maxDepth)
+        return tree.accelerations(self.theta, self.quadrupole, self.chunkSize)
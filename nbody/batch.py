@@ -0,0 +1,253 @@
+'''Run many scenarios at once, one process per job.
+
+    python -m nbody.batch Scenarios/*.json --output Results --workers 8 \
+        --memory 2000 --cpu-time 3600 --wall-time 7200
+
+Every scenario (see scenario) in the given files becomes a job. Up to
+nWorkers jobs run at the same time, each in its own forked process, so a
+sweep of hundreds of scenarios keeps every core busy, and a job that crashes
+or runs out of memory takes only itself down.
+
+Each job runs under its own limits, given in the scenario's "limits" or, for
+those it leaves out, on the command line:
+
+    memory      address space in MB (allocations past it fail)
+    cpuTime     CPU seconds (the job is killed with SIGXCPU)
+    wallTime    seconds from its start (the job is terminated)
+
+Each job writes its outputs into outputDir/name/ along with report.json:
+its status (ok, failed, memory, cpuTime, wallTime or killed), wall and CPU
+time, peak resident memory, the error if any and the run's RunMonitor
+summary (steps per second, time per phase, ...). outputDir/batch.json
+collects all the reports with the total wall time and how busy the workers
+were.
+'''
+import argparse
+import errno
+import json
+import multiprocessing as mp
+import multiprocessing.connection
+import os
+import resource
+import signal
+import sys
+import time
+import traceback
+
+from .scenario import loadScenarios, runScenario, LIMITS
+
+REPORT = 'report.json'
+BATCH_REPORT = 'batch.json'
+
+def _applyLimits(limits):
+    """Set the resource limits of the current process (a job)."""
+    if limits.get('memory'):
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        resource.setrlimit(resource.RLIMIT_AS, (int(limits['memory'] * 2**20), hard))
+    if limits.get('cpuTime'):
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        resource.setrlimit(resource.RLIMIT_CPU, (int(limits['cpuTime']), hard))
+
+def _usage():
+    """CPU seconds and peak resident memory (MB) of the current process."""
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime, usage.ru_maxrss / 2**10
+
+def _runJob(scenario, directory, limits, connection):
+    """Job process: run one scenario under its limits and send back a report."""
+    # the parent's Ctrl-C handling is the parent's business
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _applyLimits(limits)
+
+    report = {}
+    try:
+        report['summary'] = runScenario(scenario, directory)
+        report['status'] = 'ok'
+    except Exception as error:
+        # past the memory limit numpy raises MemoryError, mmap and file
+        # writes OSError(ENOMEM)
+        outOfMemory = isinstance(error, MemoryError) or getattr(error, 'errno', None) == errno.ENOMEM
+        report['status'] = 'memory' if outOfMemory else 'failed'
+        report['error'] = ''.join(traceback.format_exception_only(type(error), error)).strip()
+        report['traceback'] = traceback.format_exc()
+
+    report['cpuTime'], report['maxMemory'] = _usage()
+    connection.send(report)
+    connection.close()
+
+class _Job:
+    """A running job, as seen from the parent."""
+
+    def __init__(self, index, scenario, directory, limits, context):
+        self.index = index
+        self.scenario = scenario
+        self.directory = directory
+        self.limits = limits
+
+        receiver, sender = context.Pipe(duplex=False)
+        self.connection = receiver
+        self.received = None
+        self.process = context.Process(target=_runJob, args=(scenario, directory, limits, sender),
+                                       name='nbody-' + scenario['name'])
+        self.start = time.perf_counter()
+        self.process.start()
+        sender.close()
+
+    @property
+    def deadline(self):
+        wallTime = self.limits.get('wallTime')
+        return self.start + wallTime if wallTime else float('inf')
+
+    def receive(self):
+        """Read the report the job sends before it exits."""
+        try:
+            self.received = self.connection.recv()
+        except EOFError:
+            pass
+
+    def finish(self, timedOut=False):
+        """Reap the process and build the job's report."""
+        if timedOut:
+            self.process.terminate()
+        elif self.received is None and self.connection.poll():
+            self.receive()
+        self.process.join()
+
+        report = {'name': self.scenario['name'], 'directory': self.directory,
+                  'wallTime': time.perf_counter() - self.start, 'limits': self.limits,
+                  'exitCode': self.process.exitcode}
+
+        if timedOut:
+            report['status'] = 'wallTime'
+            report['error'] = 'Terminated after {} s'.format(self.limits['wallTime'])
+        elif self.received is not None:
+            report.update(self.received)
+        elif self.process.exitcode == -signal.SIGXCPU:
+            report['status'] = 'cpuTime'
+            report['error'] = 'Killed after {} CPU seconds'.format(self.limits['cpuTime'])
+        else:
+            # killed before it could report (e.g. by the OOM killer)
+            report['status'] = 'killed'
+            report['error'] = 'Exited with code {}'.format(self.process.exitcode)
+        self.connection.close()
+
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, REPORT), 'w') as f:
+            json.dump(dict(report, scenario=self.scenario), f, indent=1)
+        return report
+
+def runBatch(scenarios, outputDir, nWorkers=None, limits=None, progress=True):
+    """
+    Run scenarios in parallel, one process per job.
+
+    Parameters
+    ----------
+    scenarios : list of dict
+        Complete scenarios, e.g. from scenario.loadScenarios.
+    outputDir : str
+        Each job writes into outputDir/name/.
+    nWorkers : int, optional
+        Jobs running at the same time; os.cpu_count() by default.
+    limits : dict, optional
+        Default per-job limits (memory in MB, cpuTime and wallTime in s);
+        a scenario's own limits take precedence.
+    progress : bool
+        Print a line for every finished job.
+
+    Returns
+    -------
+    reports : list of dict
+        One report per scenario, in the order given (see the module
+        docstring).
+    """
+    nWorkers = nWorkers or os.cpu_count()
+    context = mp.get_context('fork')
+    batchStart = time.perf_counter()
+
+    pending = list(enumerate(scenarios))[::-1]
+    running = {}
+    reading = {}
+    reports = [None] * len(scenarios)
+
+    def collect(job, timedOut=False):
+        del running[job.process.sentinel]
+        reading.pop(job.connection, None)
+        report = job.finish(timedOut)
+        reports[job.index] = report
+        if progress:
+            done = sum(report is not None for report in reports)
+            print('[{:>{width}}/{}] {:<40} {:<8} {:8.2f} s'.format(
+                done, len(scenarios), report['name'], report['status'], report['wallTime'],
+                width=len(str(len(scenarios)))))
+            sys.stdout.flush()
+
+    try:
+        while pending or running:
+            while pending and len(running) < nWorkers:
+                index, scenario = pending.pop()
+                jobLimits = {limit: value for limit, value in dict(limits or {}, **scenario['limits']).items()
+                             if value is not None}
+                job = _Job(index, scenario, os.path.join(outputDir, scenario['name']), jobLimits,
+                           context)
+                running[job.process.sentinel] = job
+                reading[job.connection] = job
+
+            # wake up when a job reports or ends, or the first wall-time
+            # limit runs out; reports are read as soon as they arrive, so a
+            # job never blocks on a full pipe
+            deadline = min(job.deadline for job in running.values())
+            timeout = max(deadline - time.perf_counter(), 0) if deadline < float('inf') else None
+            for ready in mp.connection.wait(list(reading) + list(running), timeout):
+                if ready in reading:
+                    reading.pop(ready).receive()
+                elif ready in running:
+                    collect(running[ready])
+
+            now = time.perf_counter()
+            for job in [job for job in running.values() if job.deadline <= now]:
+                collect(job, timedOut=True)
+    finally:
+        # interrupted: leave no jobs behind
+        for job in list(running.values()):
+            job.process.terminate()
+            job.process.join()
+
+    wallTime = time.perf_counter() - batchStart
+    cpuTime = sum(report.get('cpuTime', 0.0) for report in reports)
+    batch = {'wallTime': wallTime, 'nWorkers': nWorkers, 'cpuTime': cpuTime,
+             'utilization': cpuTime / (wallTime * min(nWorkers, os.cpu_count() or 1)),
+             'jobs': reports}
+    os.makedirs(outputDir, exist_ok=True)
+    with open(os.path.join(outputDir, BATCH_REPORT), 'w') as f:
+        json.dump(batch, f, indent=1)
+    return reports
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run scenario files in parallel.')
+    parser.add_argument('files', nargs='+', help='scenario files (JSON)')
+    parser.add_argument('--output', default='Results', help='directory for the results')
+    parser.add_argument('--workers', type=int, help='jobs at the same time (default: all CPUs)')
+    parser.add_argument('--only', nargs='+', help='run only the scenarios with these names')
+    parser.add_argument('--memory', type=float, help='memory limit per job, in MB')
+    parser.add_argument('--cpu-time', type=float, help='CPU time limit per job, in seconds')
+    parser.add_argument('--wall-time', type=float, help='wall time limit per job, in seconds')
+    args = parser.parse_args(argv)
+
+    scenarios = [scenario for path in args.files for scenario in loadScenarios(path)]
+    if args.only:
+        scenarios = [scenario for scenario in scenarios if scenario['name'] in args.only]
+    names = [scenario['name'] for scenario in scenarios]
+    assert len(set(names)) == len(names), 'Scenario names must be unique across files'
+
+    limits = dict(zip(LIMITS, (args.memory, args.cpu_time, args.wall_time)))
+    reports = runBatch(scenarios, args.output, args.workers, limits)
+
+    failed = [report for report in reports if report['status'] != 'ok']
+    print('{} of {} jobs ok; reports in {}'.format(len(reports) - len(failed), len(reports),
+                                                   os.path.join(args.output, BATCH_REPORT)))
+    for report in failed:
+        print('  {}: {} ({})'.format(report['name'], report['status'], report.get('error')))
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,218 @@
+'''Adaptive integrator with hierarchical (power-of-two) block time steps.
+
+Every particle gets its own time step dt / 2**level, picked from an
+Aarseth-style criterion eta * |a| / |da/dt|, so particles on tight orbits
+(e.g. the Kepler-16 AB binary) take small steps while slow ones (the
+circumbinary planet) take large ones. Because the steps are powers of two,
+particles sharing a level stay synchronized and can be advanced as a block.
+
+Each particle follows its own kick-drift-kick leap-frog. Between events all
+positions are drifted (cheap, O(N)), but accelerations are only recomputed
+for the "active" particles whose step ends at that moment, at a cost of
+O(n_active * N) instead of O(N**2). With massless test particles
+(calculateTrajectories(..., nActive=...)) only the massive particles pull,
+so that drops to O(n_active * N_massive).
+
+The saving is only large when few particles need the short steps. In
+Kepler-16 two of the three bodies are in the binary, and the block steps do
+little better than leap-frog with a small dt. For a hot Jupiter among 300
+distant planets (benchmark.py --groups timesteps) they reach the same energy
+error with about 1/100 of the force evaluations.
+'''
+import numpy as np
+from .forces import G, TILE_SIZE, calculateAccelerations, TestParticleEngine
+from .leapfrog import LeapfrogStepper
+
+def accelerationsAndJerks(targets, masses, positions, velocities, tileSize=TILE_SIZE,
+                          sources=None):
+    """
+    Compute accelerations and their time derivatives (jerks) for a subset
+    of particles, due to all particles (or a subset of them).
+
+    Parameters
+    ----------
+    targets : 1D int array
+        Indices of the particles to compute.
+    masses : 1D numpy array
+        Masses of all particles, in kg.
+    positions, velocities : (N, 3) numpy arrays
+        Positions (m) and velocities (m/s) of all particles.
+    tileSize : int
+        Number of targets handled together.
+    sources : 1D int array, optional
+        Indices of the particles that pull; all of them by default.
+
+    Returns
+    -------
+    accelerations, jerks : (len(targets), 3) numpy arrays
+        In m/s2 and m/s3.
+    """
+    accelerations = np.zeros((len(targets), 3))
+    jerks = np.zeros((len(targets), 3))
+    if sources is None:
+        sources = np.arange(len(masses))
+
+    for start in range(0, len(targets), tileSize):
+        i = targets[start:start + tileSize]
+
+        separation = positions[np.newaxis, sources] - positions[i, np.newaxis]
+        relativeVelocity = velocities[np.newaxis, sources] - velocities[i, np.newaxis]
+        sep2 = np.sum(separation**2, axis=-1)
+
+        # a particle does not pull on itself
+        sep2[i[:, np.newaxis] == sources[np.newaxis, :]] = np.inf
+
+        invCube = G * masses[np.newaxis, sources] / (sep2 * np.sqrt(sep2))
+        rv = np.sum(separation * relativeVelocity, axis=-1) / sep2
+
+        accelerations[start:start + tileSize] = np.einsum('ij,ijk->ik', invCube, separation)
+        jerks[start:start + tileSize] = np.einsum(
+            'ij,ijk->ik', invCube, relativeVelocity - 3 * rv[..., np.newaxis] * separation)
+
+    return accelerations, jerks
+
+class BlockStepper:
+    """
+    Leap-frog integrator with individual, power-of-two block time steps.
+
+    step(dt) advances the whole system by dt, after which every particle is
+    synchronized again. Inside that step particle i takes steps of
+    dt / 2**level[i], with 0 <= level <= maxLevel.
+
+    Parameters
+    ----------
+    masses : 1D numpy array
+        Particle masses, in kg.
+    positions, velocities : (N, 3) numpy arrays
+        Starting positions (m) and velocities (m/s).
+    forceEngine : str or callable
+        Only 'direct' summation is supported: the stepper needs accelerations (and
+        jerks) for arbitrary subsets of particles. A forces.TestParticleEngine
+        around it is honoured: its test particles pull on nothing.
+    eta : float
+        Accuracy parameter of the time-step criterion eta * |a| / |da/dt|.
+    maxLevel : int
+        Deepest allowed level; the smallest step is dt / 2**maxLevel.
+
+    Attributes
+    ----------
+    level : (N,) int array
+        Current time-step level of each particle.
+    forceEvaluations : float
+        Number of force evaluations so far, counted in units of a full
+        N-particle evaluation so it compares directly with LeapfrogStepper.
+
+    Example
+    -------
+        stepper = BlockStepper(masses, initPos, initVel, eta=0.01)
+        for n in range(numSteps):
+            pos, vel = stepper.step(dt)
+    """
+
+    stateAttributes = ('positions', 'velocities', 'accelerations', 'jerks', 'level',
+                       'forceEvaluations')
+
+    # same checkpointing as the leap-frog stepper
+    getState = LeapfrogStepper.getState
+    setState = LeapfrogStepper.setState
+
+    def __init__(self, masses, positions, velocities, forceEngine='direct', eta=0.02, maxLevel=10):
+        # wrapped engines (telemetry.TimedEngine, diagnostics.PotentialEngine)
+        # keep the one they wrap as .engine. The test-particle split is kept:
+        # the last nTest particles are only ever targets, never sources
+        nTest = 0
+        while hasattr(forceEngine, 'engine'):
+            if isinstance(forceEngine, TestParticleEngine):
+                nTest = forceEngine.nTest
+            forceEngine = forceEngine.engine
+        assert forceEngine in ('direct', calculateAccelerations), \
+            'BlockStepper computes its own (direct) forces on subsets of particles'
+
+        self.masses = np.array(masses, dtype=float)
+        self.positions = np.array(positions, dtype=float)
+        self.velocities = np.array(velocities, dtype=float)
+        self.eta = eta
+        self.maxLevel = maxLevel
+
+        # make sure the three input arrays have consistent shapes
+        assert self.positions.ndim == 2 and self.positions.shape[1] == 3, 'BlockStepper needs (N, 3) positions'
+        assert self.velocities.shape == self.positions.shape
+        assert len(self.masses) == len(self.positions)
+
+        N = len(self.masses)
+        self.sources = np.arange(N - nTest)
+        self.accelerations, self.jerks = accelerationsAndJerks(
+            np.arange(N), self.masses, self.positions, self.velocities, sources=self.sources)
+        self.forceEvaluations = 1.0
+
+        # levels are picked on the first step, once dt is known
+        self.level = None
+
+    def _levels(self, dt, accelerations, jerks):
+        """Level at which each particle's step satisfies the criterion."""
+        jerk = np.linalg.norm(jerks, axis=1)
+        acceleration = np.linalg.norm(accelerations, axis=1)
+
+        # a particle feeling no change in its acceleration can take any step
+        wanted = np.full(len(jerk), np.inf)
+        changing = jerk > 0
+        wanted[changing] = self.eta * acceleration[changing] / jerk[changing]
+
+        with np.errstate(divide='ignore'):
+            level = np.ceil(np.log2(dt / wanted))
+        return np.clip(level, 0, self.maxLevel).astype(int)
+
+    def step(self, dt):
+        """
+        Advance the particles by dt seconds and return the new positions and
+        velocities (the stepper keeps its own copies).
+        """
+        if self.level is None:
+            self.level = self._levels(dt, self.accelerations, self.jerks)
+
+        # time is counted in integer ticks of the smallest allowed step, so
+        # block boundaries are exact
+        endTick = 2**self.maxLevel
+        tick = 0
+        tickSize = dt / endTick
+        stepTicks = 2**(self.maxLevel - self.level)
+        nextTick = stepTicks.copy()
+
+        # everyone starts synchronized: opening half kick
+        self.velocities += 0.5 * self.accelerations * (stepTicks * tickSize)[:, np.newaxis]
+
+        while tick < endTick:
+            # drift everyone to the next block boundary
+            newTick = nextTick.min()
+            self.positions += self.velocities * ((newTick - tick) * tickSize)
+            tick = newTick
+
+            # update accelerations only for the particles whose step ends now
+            active = np.flatnonzero(nextTick == tick)
+            accelerations, jerks = accelerationsAndJerks(
+                active, self.masses, self.positions, self.velocities, sources=self.sources)
+            self.accelerations[active] = accelerations
+            self.jerks[active] = jerks
+            self.forceEvaluations += len(active) / len(self.masses)
+
+            # closing half kick
+            self.velocities[active] += 0.5 * accelerations * (stepTicks[active] * tickSize)[:, np.newaxis]
+
+            # pick the next level. A particle may always move to a smaller
+            # step, but only to a larger one at a time that is a boundary of
+            # the larger step too.
+            level = self._levels(dt, accelerations, jerks)
+            while True:
+                misaligned = tick % 2**(self.maxLevel - level) != 0
+                if not np.any(misaligned):
+                    break
+                level[misaligned] += 1
+            self.level[active] = level
+            stepTicks[active] = 2**(self.maxLevel - level)
+
+            # the end of dt is a boundary for everyone: stop synchronized
+            if tick < endTick:
+                self.velocities[active] += 0.5 * accelerations * (stepTicks[active] * tickSize)[:, np.newaxis]
+                nextTick[active] = tick + stepTicks[active]
+
+        return self.positions, self.velocities
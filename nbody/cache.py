@@ -0,0 +1,259 @@
+'''Content-addressed cache of calculateTrajectories results.
+
+A run is identified by a hash of everything that determines its snapshots:
+the masses, initial positions and velocities, dt, the integrator and force
+engine with their options, saveEvery and the storage dtype. timeEvol is
+left out on purpose: runs that only differ in how long they go on share an
+entry, which holds the longest run made so far.
+
+    shorter or equal    served from the entry: the snapshots are
+                        memory-mapped from its trajectory files, so a hit
+                        costs milliseconds however long the run was
+    longer              the entry's final checkpoint is resumed (see
+                        main.resumeTrajectories), so only the remainder is
+                        integrated, and the entry is replaced by the longer
+                        run
+
+A shorter run can only be served if its last step is one of the entry's
+saved steps (a multiple of saveEvery, or the entry's own last step);
+otherwise it is simply computed, and not stored.
+
+Each entry is a directory named by the hash, holding the trajectory
+(trajectory.TrajectoryWriter layout), the final checkpoint and entry.json.
+index.json keeps the size and last use of every entry. Whenever the cache
+grows past its budget, the least recently used entries are deleted. Entries
+are built in a temporary directory and renamed into place, and the index is
+only changed under a lock, so several processes (e.g. batch jobs) can share
+one cache. Deleting an entry never breaks results already handed out: their
+memory maps keep the deleted files alive.
+
+Example
+=======
+    cache = ResultCache('Cache', budget=2**30)
+    times, positionArray, velocityArray = cache.calculateTrajectories(
+        masses, initPos, initVel, timeEvol, dt)
+
+or simply calculateTrajectories(..., cache='Cache').
+'''
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import numpy as np
+
+from .forces import getForceEngine
+from .main import calculateTrajectories, resumeTrajectories, timeArray, savedSteps
+from .trajectory import Trajectory, readTrajectory
+
+# bump when the entry layout or what goes into a key changes
+CACHE_VERSION = 1
+
+DEFAULT_BUDGET = 4 * 2**30 # bytes
+
+INDEX = 'index.json'
+LOCK = 'lock'
+ENTRY = 'entry.json'
+TRAJECTORY = 'trajectory'
+CHECKPOINT = 'checkpoint.npz'
+
+def cacheKey(masses, initPos, initVel, dt, integrator='leapfrog', integratorOptions=None,
+             forceEngine='direct', forceOptions=None, saveEvery=1, dtype=np.float64,
+             nActive=None):
+    """
+    Hash of everything that determines the snapshots of a run, except its
+    length.
+
+    Returns
+    -------
+    key : str
+        Hexadecimal SHA-256 digest.
+    """
+    digest = hashlib.sha256()
+    for array in (masses, initPos, initVel, dt):
+        array = np.ascontiguousarray(array, dtype=np.float64)
+        digest.update(repr(array.shape).encode())
+        digest.update(array.tobytes())
+
+    settings = {'version': CACHE_VERSION, 'integrator': integrator,
+                'integratorOptions': integratorOptions or {}, 'forceEngine': forceEngine,
+                'forceOptions': forceOptions or {}, 'saveEvery': int(saveEvery),
+                'dtype': np.dtype(dtype).name, 'nActive': nActive}
+    digest.update(json.dumps(settings, sort_keys=True).encode())
+    return digest.hexdigest()
+
+def _directorySize(path):
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, names in os.walk(path) for name in names)
+
+class ResultCache:
+    """
+    On-disk cache of runs, with least-recently-used eviction.
+
+    Parameters
+    ----------
+    directory : str
+        Where the entries are kept (created if needed).
+    budget : int
+        Disk space the entries may take, in bytes. The entry just made or
+        used is kept even if it alone is over budget.
+
+    Attributes
+    ----------
+    stats : dict
+        How many calls were hits, extensions of a cached run, and misses.
+    """
+
+    def __init__(self, directory, budget=DEFAULT_BUDGET):
+        self.directory = directory
+        self.budget = budget
+        self.stats = {'hit': 0, 'extended': 0, 'miss': 0}
+        os.makedirs(directory, exist_ok=True)
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """Hold the cache's lock, and its index as a dict to read or change."""
+        with open(os.path.join(self.directory, LOCK), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                path = os.path.join(self.directory, INDEX)
+                index = {}
+                if os.path.exists(path):
+                    with open(path) as f:
+                        index = json.load(f)
+                # entries deleted by hand are forgotten
+                index = {key: entry for key, entry in index.items()
+                         if os.path.isdir(os.path.join(self.directory, key))}
+                before = json.dumps(index, sort_keys=True)
+
+                yield index
+
+                if json.dumps(index, sort_keys=True) != before:
+                    temporary = path + '.tmp'
+                    with open(temporary, 'w') as f:
+                        json.dump(index, f, indent=1)
+                    os.replace(temporary, path)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _evict(self, index, keep):
+        """Delete least recently used entries (but not keep) until within budget."""
+        total = sum(entry['size'] for entry in index.values())
+        for key in sorted(index, key=lambda key: index[key]['lastUsed']):
+            if total <= self.budget:
+                break
+            if key == keep:
+                continue
+            total -= index.pop(key)['size']
+            shutil.rmtree(os.path.join(self.directory, key), ignore_errors=True)
+
+    def _publish(self, key, temporary, numSteps, settings, saveEvery, returnTrajectory):
+        """
+        Move a finished entry into place, replacing any older one, and read
+        it back before anyone else can evict it.
+        """
+        with open(os.path.join(temporary, ENTRY), 'w') as f:
+            json.dump(dict(settings, key=key, numSteps=int(numSteps)), f, indent=1)
+        size = _directorySize(temporary)
+
+        with self._locked() as index:
+            path = os.path.join(self.directory, key)
+            if os.path.isdir(path):
+                # readers of the old entry keep its (unlinked) files
+                trash = tempfile.mkdtemp(dir=self.directory, prefix='.trash-')
+                os.rename(path, os.path.join(trash, key))
+                os.rename(temporary, path)
+                shutil.rmtree(trash, ignore_errors=True)
+            else:
+                os.rename(temporary, path)
+            index[key] = {'size': size, 'numSteps': int(numSteps), 'lastUsed': time.time()}
+            self._evict(index, key)
+            return self._read(key, numSteps, saveEvery, returnTrajectory)
+
+    def _read(self, key, numSteps, saveEvery, returnTrajectory):
+        """The first numSteps steps of an entry, memory-mapped."""
+        trajectory = readTrajectory(os.path.join(self.directory, key, TRAJECTORY))
+        count = len(savedSteps(numSteps, saveEvery))
+        trajectory = Trajectory(trajectory.times[:count], trajectory.positions[:count],
+                                trajectory.velocities[:count])
+        return trajectory if returnTrajectory else trajectory.result()
+
+    def calculateTrajectories(self, masses, initPos, initVel, timeEvol, dt, forceEngine='direct',
+                              forceOptions=None, integrator='leapfrog', integratorOptions=None,
+                              saveEvery=1, dtype=np.float64, returnTrajectory=False,
+                              monitor=None, nActive=None):
+        """
+        main.calculateTrajectories, served from the cache where possible.
+
+        Takes the same inputs, except that the force engine must be given by
+        name, with its options as forceOptions, so it can be part of the
+        key. Results are always memory-mapped from the cache.
+        """
+        assert isinstance(forceEngine, str), 'Cached runs need the force engine by name'
+        settings = {'integrator': integrator, 'integratorOptions': integratorOptions,
+                    'forceEngine': forceEngine, 'forceOptions': forceOptions or {},
+                    'saveEvery': saveEvery, 'dtype': np.dtype(dtype).name, 'nActive': nActive}
+        key = cacheKey(masses, initPos, initVel, dt, **settings)
+        numSteps = timeArray(timeEvol, dt).shape[-1]-1
+
+        with self._locked() as index:
+            entry = index.get(key)
+            if entry is not None and (numSteps == entry['numSteps'] or
+                                      (numSteps < entry['numSteps'] and numSteps % saveEvery == 0)):
+                entry['lastUsed'] = time.time()
+                self.stats['hit'] += 1
+                return self._read(key, numSteps, saveEvery, returnTrajectory)
+
+            # a longer run carries on from a copy of the entry, made under
+            # the lock so it cannot be evicted half way
+            temporary = tempfile.mkdtemp(dir=self.directory, prefix='.new-')
+            extend = entry is not None and numSteps > entry['numSteps']
+            if extend:
+                shutil.copytree(os.path.join(self.directory, key), temporary, dirs_exist_ok=True)
+
+        engine = getForceEngine(forceEngine, **(forceOptions or {}))
+        try:
+            if extend:
+                resumeTrajectories(os.path.join(temporary, CHECKPOINT), timeEvol, engine,
+                                   output=os.path.join(temporary, TRAJECTORY), monitor=monitor)
+            elif entry is not None:
+                # shorter, ending between the entry's saved steps
+                shutil.rmtree(temporary)
+                self.stats['miss'] += 1
+                return calculateTrajectories(masses, initPos, initVel, timeEvol, dt, engine,
+                                             integrator, integratorOptions, saveEvery,
+                                             dtype=dtype, returnTrajectory=returnTrajectory,
+                                             monitor=monitor, nActive=nActive)
+            else:
+                # only the final state is needed, to extend the run later
+                calculateTrajectories(masses, initPos, initVel, timeEvol, dt, engine,
+                                      integrator, integratorOptions, saveEvery,
+                                      output=os.path.join(temporary, TRAJECTORY), dtype=dtype,
+                                      checkpoint=os.path.join(temporary, CHECKPOINT),
+                                      checkpointEvery=sys.maxsize, monitor=monitor,
+                                      nActive=nActive)
+        except BaseException:
+            shutil.rmtree(temporary, ignore_errors=True)
+            raise
+        finally:
+            if hasattr(engine, 'close'):
+                engine.close()
+
+        self.stats['extended' if extend else 'miss'] += 1
+        return self._publish(key, temporary, numSteps, settings, saveEvery, returnTrajectory)
+
+    def clear(self):
+        """Delete every entry."""
+        with self._locked() as index:
+            for key in list(index):
+                index.pop(key)
+                shutil.rmtree(os.path.join(self.directory, key), ignore_errors=True)
+
+    def size(self):
+        """Disk space the entries take, in bytes."""
+        with self._locked() as index:
+            return sum(entry['size'] for entry in index.values())
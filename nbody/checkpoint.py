@@ -0,0 +1,64 @@
+'''Checkpoints of a run in progress.
+
+A checkpoint is a single .npz file holding the stepper's full state (see
+LeapfrogStepper.getState), the masses, the time step and a JSON description
+of the run (integrator, step number, how many snapshots had been saved, ...),
+which is everything main.resumeTrajectories needs to carry on exactly where
+the run stopped.
+
+Checkpoints are written to a temporary file and then renamed over the old
+one, so an interruption while writing never leaves a broken checkpoint.
+'''
+import json
+import os
+import numpy as np
+
+def saveCheckpoint(path, stepper, masses, dt, run):
+    """
+    Write a checkpoint.
+
+    Parameters
+    ----------
+    path : str
+        Checkpoint file name (.npz).
+    stepper : stepper object
+        Integrator whose getState() is saved.
+    masses : numpy array
+        Particle masses, in kg.
+    dt : float or numpy array
+        Time step(s), in seconds.
+    run : dict
+        JSON-serializable description of the run, e.g. the step number,
+        integrator name and options.
+    """
+    arrays = {'state_' + name: value for name, value in stepper.getState().items()}
+    arrays['masses'] = masses
+    arrays['dt'] = dt
+    arrays['run'] = np.array(json.dumps(run))
+
+    temporary = path + '.tmp.npz'
+    np.savez(temporary, **arrays)
+    os.replace(temporary, path)
+
+def loadCheckpoint(path):
+    """
+    Read a checkpoint written by saveCheckpoint.
+
+    Returns
+    -------
+    state : dict
+        Stepper state, for stepper.setState.
+    masses : numpy array
+    dt : float or numpy array
+    run : dict
+        The run description.
+    """
+    with np.load(path) as data:
+        state = {name[len('state_'):]: data[name] for name in data.files
+                 if name.startswith('state_')}
+        masses = data['masses']
+        dt = data['dt']
+        run = json.loads(str(data['run']))
+
+    dt = dt.item() if dt.ndim == 0 else dt
+    return state, masses, dt, run
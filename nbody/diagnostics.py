@@ -0,0 +1,232 @@
+'''Conserved quantities of a run, computed as it goes.
+
+Checking a run afterwards means another O(N^2) pass over every saved
+snapshot just for the potential energy. Diagnostics instead records, for
+every saved snapshot,
+
+    kinetic and potential energy, and their sum
+    total linear and angular momentum
+    virial ratio 2K/|W|, which is about 1 for a relaxed bound system
+
+and gets the potential energy from the force pass that has just been made:
+with the direct engine the potential is summed in the same loop over the
+pairs as the accelerations (forces.calculateAccelerations(potential=True)).
+It is only asked for on steps that are saved, and only from passes over the
+whole system (not e.g. the Wisdom-Holman interaction kicks). Other engines,
+and integrators that compute their own forces (the block integrator), fall
+back to a direct potential pass at saved snapshots only.
+
+With energyTolerance set, the run is stopped with an EnergyDriftError as soon
+as the relative energy error |E - E0| / |E0| exceeds it. For a system whose
+energy (nearly) cancels, e.g. a parabolic encounter with E0 = 0, |E0| is
+raised to MIN_ENERGY_SCALE times K0 + |W0| so the error stays finite.
+'''
+import functools
+import numpy as np
+from .forces import calculateAccelerations
+
+# energy errors are relative to at least this fraction of K0 + |W0|
+MIN_ENERGY_SCALE = 1e-6
+
+class EnergyDriftError(RuntimeError):
+    """The energy error of a run exceeded Diagnostics.energyTolerance."""
+
+class PotentialEngine:
+    """
+    Force engine wrapper that keeps the potential of the last evaluation.
+
+    The direct engine (with any options, e.g. softening) is asked for the
+    potential as well as the accelerations; any other engine is called as it
+    is, and then no potential is kept (but its softening options, if it has
+    any, are). The potential is only asked for while .wanted is set, and
+    for calls on all N particles when N is given.
+    """
+
+    def __init__(self, engine, N=None):
+        self.engine = engine
+        self.N = N
+        self.wanted = True
+        self.withPotential = engine is calculateAccelerations
+        # the direct engine with options, from forces.getForceEngine
+        self.options = dict(getattr(engine, 'options', None) or {})
+        if isinstance(engine, functools.partial) and engine.func is calculateAccelerations:
+            self.withPotential = True
+            self.options = dict(engine.keywords)
+        self.positions = None
+        self.potentials = None
+
+    def __call__(self, masses, positions):
+        if not (self.withPotential and self.wanted
+                and (self.N is None or np.shape(positions)[-2] == self.N)):
+            return self.engine(masses, positions)
+
+        accelerations, self.potentials = self.engine(masses, positions, potential=True)
+        self.positions = np.array(positions)
+        return accelerations
+
+    def potentialsAt(self, positions):
+        """The kept potentials if they belong to these positions, else None."""
+        if self.positions is not None and np.array_equal(self.positions, positions):
+            return self.potentials
+        return None
+
+def conservedQuantities(masses, positions, velocities, potentials=None, softening=0.0,
+                        kernel='plummer'):
+    """
+    Energy, momentum and virial ratio of a system (or a batch of them).
+
+    Parameters
+    ----------
+    masses : numpy array
+        Particle masses, in kg. Shape (N,), or (..., N) for a batch.
+    positions, velocities : numpy arrays
+        Shape (N, 3), or (..., N, 3) for a batch, in m and m/s.
+    potentials : numpy array, optional
+        Potential at each particle (see forces.calculateAccelerations); it
+        is computed here if not given.
+    softening, kernel : float, str
+        Softening of the potential computed here, which should match the
+        forces of the run (see forces.calculateAccelerations).
+
+    Returns
+    -------
+    quantities : dict
+        kinetic, potential and energy (J), momentum (kg m/s, 3 components),
+        angularMomentum (kg m2/s, about the origin) and virialRatio
+        (2K/|W|), each with any batch axes in front.
+    """
+    positions = np.asarray(positions, dtype=float)
+    velocities = np.asarray(velocities, dtype=float)
+    masses = np.broadcast_to(np.asarray(masses, dtype=float), positions.shape[:-1])
+    if potentials is None:
+        # massless (test) particles add nothing to the potential energy, so
+        # the pass only needs the particles that are massive in any system
+        massive = np.any(masses != 0, axis=tuple(range(masses.ndim - 1)))
+        if massive.all():
+            _, potentials = calculateAccelerations(masses, positions, potential=True,
+                                                   softening=softening, kernel=kernel)
+        else:
+            potentials = np.zeros(masses.shape)
+            _, potentials[..., massive] = calculateAccelerations(
+                masses[..., massive], positions[..., massive, :], potential=True,
+                softening=softening, kernel=kernel)
+
+    kinetic = 0.5 * np.sum(masses * np.sum(velocities**2, axis=-1), axis=-1)
+    # every pair is in the potentials twice, once for each member
+    potential = 0.5 * np.sum(masses * potentials, axis=-1)
+
+    momenta = masses[..., np.newaxis] * velocities
+    return {'kinetic': kinetic, 'potential': potential, 'energy': kinetic + potential,
+            'momentum': np.sum(momenta, axis=-2),
+            'angularMomentum': np.sum(np.cross(positions, momenta), axis=-2),
+            'virialRatio': 2 * kinetic / np.abs(potential)}
+
+class Diagnostics:
+    """
+    Record conserved quantities at every saved snapshot of a run.
+
+    Parameters
+    ----------
+    energyTolerance : float, optional
+        Stop the run (with EnergyDriftError) once the relative energy error
+        exceeds this.
+
+    Attributes
+    ----------
+    times : list
+        Times of the recorded snapshots.
+    quantities : dict of lists
+        One entry per snapshot for each quantity of conservedQuantities.
+
+    Example
+    -------
+        diagnostics = Diagnostics(energyTolerance=1e-6)
+        times, positionArray, velocityArray = calculateTrajectories(
+            masses, initPos, initVel, timeEvol, dt, diagnostics=diagnostics)
+        energyError = diagnostics.energyError()
+    """
+
+    def __init__(self, energyTolerance=None):
+        self.energyTolerance = energyTolerance
+        self.engine = None
+        self.masses = None
+        self.times = []
+        self.quantities = {}
+
+    def wrapEngine(self, engine):
+        """
+        Wrap a force engine so it also keeps the potential. Call start
+        first, so the wrapper knows the number of particles.
+        """
+        N = None if self.masses is None else self.masses.shape[-1]
+        self.engine = PotentialEngine(engine, N)
+        return self.engine
+
+    def expectRecord(self, wanted):
+        """
+        Say whether the coming step will be recorded, so the potential is
+        only computed in the force passes of recorded steps.
+        """
+        if self.engine is not None:
+            self.engine.wanted = wanted
+
+    def start(self, masses):
+        """Start recording a run of particles with these masses."""
+        self.masses = np.asarray(masses, dtype=float)
+        self.times = []
+        self.quantities = {}
+
+    def record(self, time, positions, velocities):
+        """
+        Record one snapshot. Raises EnergyDriftError if the energy error is
+        past the tolerance.
+        """
+        potentials = None
+        softening = {}
+        if self.engine is not None:
+            potentials = self.engine.potentialsAt(positions)
+            softening = {name: value for name, value in self.engine.options.items()
+                         if name in ('softening', 'kernel')}
+
+        quantities = conservedQuantities(self.masses, positions, velocities, potentials,
+                                         **softening)
+        self.times.append(time)
+        for name, value in quantities.items():
+            self.quantities.setdefault(name, []).append(value)
+
+        if self.energyTolerance is not None:
+            energy = self.quantities['energy']
+            error = np.max(np.abs(energy[-1] - energy[0]) / self._energyScale())
+            if error > self.energyTolerance:
+                raise EnergyDriftError('Relative energy error {:.3g} at t = {} exceeds {:.3g}'.format(
+                    error, time, self.energyTolerance))
+
+    def _energyScale(self):
+        """
+        |E0| of each system, but at least MIN_ENERGY_SCALE * (K0 + |W0|), so
+        systems with E0 = 0 get a finite error.
+        """
+        magnitude = self.quantities['kinetic'][0] + np.abs(self.quantities['potential'][0])
+        return np.maximum(np.abs(self.quantities['energy'][0]), MIN_ENERGY_SCALE * magnitude)
+
+    def energyError(self):
+        """
+        Relative energy error |E - E0| / |E0| at every recorded snapshot
+        (see MIN_ENERGY_SCALE for systems with E0 = 0).
+        """
+        energy = np.array(self.quantities['energy'])
+        return np.abs(energy - energy[0]) / self._energyScale()
+
+    def result(self):
+        """
+        Everything recorded, as arrays with the snapshot as the first axis.
+
+        Returns
+        -------
+        result : dict
+            times, energyError and every quantity of conservedQuantities.
+        """
+        result = {name: np.array(values) for name, values in self.quantities.items()}
+        result['times'] = np.array(self.times)
+        result['energyError'] = self.energyError()
+        return result
@@ -0,0 +1,152 @@
+'''Close-encounter detection with a spatial hash.
+
+Checking every pair for a close approach costs O(N^2), as much as the forces.
+findPairs instead sorts the particles into cubic cells one search radius
+wide, so every pair closer than the radius is in the same or a neighbouring
+cell, and only compares particles in neighbouring cells: O(N) work for
+spread-out systems.
+
+The cells are found through a hash table rather than a grid, so the memory
+used does not depend on how far apart the particles are. Cells that land in
+the same slot only add candidate pairs, which the exact distance check then
+throws out.
+
+EncounterDetector runs findPairs during a run (as a telemetry.RunMonitor
+step hook) and reports every step with close pairs as an event, so a run
+can react only where and when it is needed, e.g. by shrinking its step or
+merging the bodies.
+'''
+import itertools
+import numpy as np
+
+# large primes for hashing cell coordinates (Teschner et al. 2003)
+_HASH_PRIMES = np.array([73856093, 19349663, 83492791], dtype=np.int64)
+
+def _cellHash(cells, tableSize):
+    """Slot in a table of tableSize (a power of two) for each row of cells."""
+    mixed = cells[:, 0] * _HASH_PRIMES[0]
+    for d in range(1, cells.shape[1]):
+        mixed ^= cells[:, d] * _HASH_PRIMES[d % len(_HASH_PRIMES)]
+    return mixed & (tableSize - 1)
+
+def findPairs(positions, radius):
+    """
+    Find every pair of particles closer than radius.
+
+    Parameters
+    ----------
+    positions : numpy array
+        Particle positions, in m. Shape (N, m).
+    radius : float
+        Search radius, in m.
+
+    Returns
+    -------
+    pairs : (K, 2) int array
+        Particle indices i < j of each close pair, sorted.
+    distances : (K,) array
+        Separation of each pair, in m.
+
+    Example
+    -------
+        pairs, distances = findPairs(positions, radius=1e9)
+        for (i, j), r in zip(pairs, distances):
+            print(i, j, r)
+    """
+    positions = np.asarray(positions, dtype=float)
+    assert positions.ndim == 2, 'findPairs takes (N, m) positions'
+    assert radius > 0, 'The search radius must be positive'
+    N, M = positions.shape
+
+    # cell coordinates from the lower corner, capped so they fit in int64
+    # (capping merges far-away cells, which only adds candidates)
+    cells = np.floor(np.minimum((positions - positions.min(axis=0)) / radius, 2.0**62)).astype(np.int64)
+    tableSize = 1 << max(int(2 * N - 1).bit_length(), 1)
+
+    # particles sorted by hash slot; each slot is one run of the sorted list
+    slots = _cellHash(cells, tableSize)
+    order = np.argsort(slots, kind='stable')
+    sortedSlots = slots[order]
+
+    found = []
+    for offset in itertools.product((-1, 0, 1), repeat=M):
+        neighbourSlots = _cellHash(cells + np.array(offset, dtype=np.int64), tableSize)
+        first = np.searchsorted(sortedSlots, neighbourSlots, side='left')
+        counts = np.searchsorted(sortedSlots, neighbourSlots, side='right') - first
+
+        # every particle against every particle in its neighbour's slot
+        i = np.repeat(np.arange(N), counts)
+        runStarts = np.repeat(np.cumsum(counts) - counts, counts)
+        j = order[np.repeat(first, counts) + np.arange(len(i)) - runStarts]
+
+        keep = i < j
+        i, j = i[keep], j[keep]
+        keep = np.sum((positions[i] - positions[j])**2, axis=1) < radius**2
+        found.append(np.stack([i[keep], j[keep]], axis=1))
+
+    # a pair can turn up through more than one offset when cells share a slot
+    pairs = np.unique(np.concatenate(found), axis=0)
+    distances = np.sqrt(np.sum((positions[pairs[:, 0]] - positions[pairs[:, 1]])**2, axis=1))
+    return pairs, distances
+
+class EncounterDetector:
+    """
+    Report close encounters during a run.
+
+    Use it as a step hook of a telemetry.RunMonitor. Every checkEvery steps
+    it looks for pairs closer than radius, and for every step that has some
+    it records an event (a dict with step, time, pairs and distances) and
+    passes it to each of the onEncounter callbacks.
+
+    Parameters
+    ----------
+    radius : float
+        Encounter radius, in m.
+    checkEvery : int
+        Check every this many steps.
+    onEncounter : callable or list of callables, optional
+        Called as callback(event, stepper) for every event; it may change
+        the stepper (e.g. merge particles) or raise to stop the run.
+
+    Attributes
+    ----------
+    events : list of dict
+        Every event so far.
+
+    Example
+    -------
+        detector = EncounterDetector(radius=5e9)
+        monitor = RunMonitor(step=detector)
+        calculateTrajectories(masses, initPos, initVel, timeEvol, dt, monitor=monitor)
+        for event in detector.events:
+            print(event['time'], event['pairs'])
+    """
+
+    def __init__(self, radius, checkEvery=1, onEncounter=None):
+        self.radius = radius
+        self.checkEvery = checkEvery
+        if onEncounter is None:
+            onEncounter = []
+        self.callbacks = list(onEncounter) if isinstance(onEncounter, (list, tuple)) else [onEncounter]
+        self.events = []
+
+    def check(self, positions):
+        """Close pairs among positions (see findPairs)."""
+        return findPairs(positions, self.radius)
+
+    def __call__(self, n, t, stepper):
+        if n % self.checkEvery != 0:
+            return
+
+        pairs, distances = self.check(stepper.positions)
+        if len(pairs) == 0:
+            return
+
+        event = {'step': int(n), 'time': t, 'pairs': pairs, 'distances': distances}
+        self.events.append(event)
+        for callback in self.callbacks:
+            callback(event, stepper)
+
+    def closestApproach(self):
+        """Smallest separation seen in any event (inf if there were none)."""
+        return min((event['distances'].min() for event in self.events), default=np.inf)
@@ -0,0 +1,578 @@
+'''These force functions were written in Homework D + E'''
+import functools
+import numpy as np
+
+G = 6.67e-11 # m3 kg-1 s-2
+
+# number of particles per side of the (tile x tile) blocks the pair matrix is
+# split into, so temporaries stay at O(tile**2) instead of O(N**2)
+TILE_SIZE = 256
+
+# softening kernels. The spline kernel is exactly Newtonian beyond
+# SPLINE_RATIO times the softening length, which is given as the length of
+# the Plummer kernel with the same central potential.
+SOFTENING_KERNELS = ('plummer', 'spline')
+SPLINE_RATIO = 2.8
+
+def forceMagnitude(mi, mj, sep, softening=0.0):
+    """
+    Compute magnitude of gravitational force between two particles.
+
+    Parameters
+    ----------
+    mi, mj : float
+        Particle masses in kg.
+    sep : float
+        Particle separation (distance between particles) in m.
+    softening : float
+        Plummer softening length in m; the force is then
+        G mi mj sep / (sep**2 + softening**2)**1.5, which stays finite
+        as the particles pass through each other.
+
+    Returns
+    -------
+    force : float
+        Gravitational force between particles in N.
+
+    Example
+    -------
+        Input:
+            mEarth = 6.0e24     # kg
+            mPerson = 70.0      # kg
+            radiusEarth = 6.4e6 # m
+            print magnitudeOfForce(mEarth, mPerson, radiusEarth)
+        Output:
+            683.935546875
+    """
+    if softening:
+        return G * mi * mj * sep / (sep**2 + softening**2)**1.5 # N
+    return G * mi * mj / sep**2 # N
+
+def magnitude(vec):
+    """
+    Compute magnitude of any vector with an arbitrary number of elements.
+
+    Parameters
+    ----------
+    vec : numpy array
+        Any vector
+
+    Returns
+    -------
+    magnitude : float
+        The magnitude of that vector.
+
+    Example
+    -------
+        Input:
+            print magnitude(np.array([3.0, 4.0, 0.0]))
+        Output:
+            5.0
+    """
+    return np.sqrt(np.sum(vec**2))
+
+def unitDirectionVector(pos_a, pos_b):
+    """
+    Create unit direction vector from pos_a to pos_b
+
+    Parameters
+    ----------
+    pos_a, pos_b : two numpy arrays
+        Any two vectors
+
+    Returns
+    -------
+    unit direction vector : one numpy array (same size input vectors)
+        The unit direction vector from pos_a toward pos_b
+
+    Example
+    -------
+        Input:
+            someplace = np.array([3.0,2.0,5.0])
+            someplaceelse = np.array([1.0, -4.0, 8.0])
+            print unitDirectionVector(someplace, someplaceelse)
+        Output:
+            [-0.28571429, -0.85714286,  0.42857143]
+    """
+
+    # calculate the separation between the two vectors
+    separation = pos_b - pos_a
+
+    # divide vector components by vector magnitude to make unit vector
+    return separation/magnitude(separation)
+
+def forceVector(mi, mj, pos_i, pos_j):
+    """
+    Compute gravitational force vector exerted on particle i by particle j.
+
+    Parameters
+    ----------
+    mi, mj : floats
+        Particle masses, in kg.
+    pos_i, pos_j : numpy arrays
+        Particle positions in cartesian coordinates, in m.
+
+    Returns
+    -------
+    forceVec : numpy array
+        Components of gravitational force vector, in N.
+
+    Example
+    -------
+        Input:
+            mEarth = 6.0e24     # kg
+            mPerson = 70.0      # kg
+            radiusEarth = 6.4e6 # m
+            centerEarth = np.array([0,0,0])
+            surfaceEarth = np.array([0,0,1])*radiusEarth
+            print forceVector(mEarth, mPerson, centerEarth, surfaceEarth)
+
+        Output:
+            [   0.            0.          683.93554688]
+
+
+    """
+
+    # compute the magnitude of the distance between positions
+    distance = magnitude(pos_i - pos_j)
+    # this distance is in meters, because pos_i and pos_j were
+
+    # compute the magnitude of the force
+    force = forceMagnitude(mi, mj, distance)
+    # the magnitude of the force is in Newtons
+
+    # calculate the unit direction vector of the force
+    direction = unitDirectionVector(pos_i, pos_j)
+    # this vector is unitless, its magnitude should be 1.0
+
+    return force*direction # a numpy array, with units of Newtons
+
+
+def checkSoftening(softening, kernel):
+    """Check a softening length and kernel name before they are used."""
+    assert softening >= 0, 'The softening length must not be negative'
+    assert kernel in SOFTENING_KERNELS, 'Unknown softening kernel {!r}, choose from {}'.format(
+        kernel, SOFTENING_KERNELS)
+
+def _softenedKernel(sep2, softening, kernel):
+    """
+    Softened versions of G / r**3 and G / r for squared separations sep2:
+    the acceleration due to a mass m at separation vector d is
+    m * invCube * d, and its potential -m * invDistance.
+    """
+    checkSoftening(softening, kernel)
+
+    if kernel == 'plummer':
+        invDistance = 1.0 / np.sqrt(sep2 + softening**2)
+        return G * invDistance**3, G * invDistance
+
+    # cubic spline (Monaghan & Lattanzio 1985), in the form GADGET uses
+    h = SPLINE_RATIO * softening
+    r = np.sqrt(sep2)
+    u = r / h
+    with np.errstate(divide='ignore', invalid='ignore'):
+        inner = u < 0.5
+        outer = (u >= 0.5) & (u < 1.0)
+        invCube = np.where(inner, (32/3 + u*u*(32*u - 38.4)) / h**3,
+                           np.where(outer, (64/3 - 48*u + 38.4*u*u - 32/3*u**3 - 1/(15*u**3)) / h**3,
+                                    1.0 / (sep2 * r)))
+        invDistance = np.where(inner, (2.8 - u*u*(16/3 + u*u*(6.4*u - 9.6))) / h,
+                               np.where(outer, (3.2 - 1/(15*u) - u*u*(32/3 + u*(-16 + u*(9.6 - 32/15*u)))) / h,
+                                        1.0 / r))
+    return G * invCube, G * invDistance
+
+def calculateAccelerations(masses, positions, tileSize=TILE_SIZE, potential=False,
+                           softening=0.0, kernel='plummer'):
+    """
+    Compute net gravitational accelerations on all particles at once.
+
+    The (N, N) pair matrix is walked in square tiles of at most tileSize
+    particles per side. Only tiles on or above the diagonal are computed;
+    each pair's 1/r**3 factor is used twice, once for the pull of j on i
+    and once (with opposite sign) for the pull of i on j.
+
+    Any leading axes are treated as a batch of independent systems, which
+    are all computed together: positions of shape (B, N, m) give B separate
+    N-body systems, with masses of shape (B, N), or (N,) if every member of
+    the batch has the same masses.
+
+    Parameters
+    ----------
+    masses : numpy array
+        Particle masses, in kg. Shape (N,), or (..., N) for a batch.
+    positions : numpy array
+        Particle positions in cartesian coordinates, in m. Shape (N, m),
+        or (..., N, m) for a batch.
+    tileSize : int
+        Number of particles per side of a tile.
+    potential : bool
+        Also return the gravitational potential at each particle, summed in
+        the same pass over the pairs (it costs one division per pair).
+    softening : float
+        Softening length, in m. Close pairs then pull on each other with a
+        finite force, so close passes do not need tiny time steps. 0 is
+        plain Newtonian gravity.
+    kernel : str
+        Softening kernel: 'plummer' softens every pair a little, 'spline'
+        is exactly Newtonian beyond SPLINE_RATIO * softening.
+
+    Returns
+    -------
+    accelerations : numpy array
+        Net gravitational acceleration of each particle, in m/s2.
+        Same shape as positions.
+    potentials : numpy array
+        Only with potential=True: potential at each particle due to all the
+        others, -sum_j G m_j / r_ij, in J/kg. Shape positions.shape[:-1].
+        The total potential energy is 0.5 * sum(masses * potentials).
+
+    Example
+    -------
+        Input:
+            masses = np.array([1.0, 2.0])
+            positions = np.array([[0.0, 0.0, 0.0], [1.0, 0.0, 0.0]])
+            print(calculateAccelerations(masses, positions))
+        Output:
+            [[ 1.334e-10  0.000e+00  0.000e+00]
+             [-6.670e-11  0.000e+00  0.000e+00]]
+    """
+    positions = np.asarray(positions, dtype=float)
+    masses = np.broadcast_to(np.asarray(masses, dtype=float), positions.shape[:-1])
+
+    N = positions.shape[-2]
+    accelerations = np.zeros(positions.shape)
+    if potential:
+        potentials = np.zeros(positions.shape[:-1])
+
+    for iStart in range(0, N, tileSize):
+        iStop = min(iStart + tileSize, N)
+        pos_i = positions[..., iStart:iStop, :]
+
+        for jStart in range(iStart, N, tileSize):
+            jStop = min(jStart + tileSize, N)
+
+            # separation vectors from every i to every j in this tile
+            separation = positions[..., np.newaxis, jStart:jStop, :] - pos_i[..., :, np.newaxis, :]
+            sep2 = np.sum(separation**2, axis=-1)
+
+            # a particle does not pull on itself (only on diagonal tiles)
+            if iStart == jStart:
+                diagonal = np.arange(iStop - iStart)
+                sep2[..., diagonal, diagonal] = np.inf
+
+            # G / r**3 (and G / r), shared by both members of the pair
+            if softening:
+                invCube, invDistance = _softenedKernel(sep2, softening, kernel)
+            else:
+                distance = np.sqrt(sep2)
+                invCube = G / (sep2 * distance)
+                if potential:
+                    invDistance = G / distance
+
+            # j pulls i toward j ...
+            accelerations[..., iStart:iStop, :] += np.einsum(
+                '...ij,...ijk->...ik', invCube * masses[..., np.newaxis, jStart:jStop], separation)
+
+            # ... and i pulls j toward i (skip on diagonal tiles, already counted)
+            if iStart != jStart:
+                accelerations[..., jStart:jStop, :] -= np.einsum(
+                    '...ij,...ijk->...jk', invCube * masses[..., iStart:iStop, np.newaxis], separation)
+
+            if potential:
+                # G / r is zero on the diagonal
+                potentials[..., iStart:iStop] -= np.einsum(
+                    '...ij,...j->...i', invDistance, masses[..., jStart:jStop])
+                if iStart != jStart:
+                    potentials[..., jStart:jStop] -= np.einsum(
+                        '...ij,...i->...j', invDistance, masses[..., iStart:iStop])
+
+    if potential:
+        return accelerations, potentials
+    return accelerations
+
+def calculateAccelerationsOn(targetPositions, sourceMasses, sourcePositions, tileSize=TILE_SIZE,
+                             softening=0.0, kernel='plummer'):
+    """
+    Compute gravitational accelerations on a set of target positions due to
+    a set of source particles.
+
+    Unlike calculateAccelerations the targets and sources need not be the
+    same particles, so there is no pair symmetry to exploit. Pairs at zero
+    separation (a target that is also one of the sources) are skipped. The
+    cost is O(n * N), so it also gives the accelerations of n massless test
+    particles due to N massive ones.
+
+    Parameters
+    ----------
+    targetPositions : numpy array
+        Positions to evaluate the accelerations at, in m. Shape (n, m), or
+        (..., n, m) for a batch.
+    sourceMasses : numpy array
+        Masses of the source particles, in kg. Shape (N,), or (..., N) for
+        a batch.
+    sourcePositions : numpy array
+        Positions of the source particles, in m. Shape (N, m), or
+        (..., N, m) for a batch.
+    tileSize : int
+        Number of targets and sources per side of a tile.
+    softening, kernel : float, str
+        Softening length (m) and kernel, as for calculateAccelerations.
+
+    Returns
+    -------
+    accelerations : numpy array
+        Acceleration at each target position, in m/s2. Same shape as
+        targetPositions.
+    """
+    targetPositions = np.asarray(targetPositions, dtype=float)
+    sourceMasses = np.asarray(sourceMasses, dtype=float)
+    sourcePositions = np.asarray(sourcePositions, dtype=float)
+
+    accelerations = np.zeros(targetPositions.shape)
+
+    for iStart in range(0, targetPositions.shape[-2], tileSize):
+        pos_i = targetPositions[..., iStart:iStart + tileSize, :]
+
+        for jStart in range(0, sourcePositions.shape[-2], tileSize):
+            jStop = jStart + tileSize
+
+            separation = sourcePositions[..., np.newaxis, jStart:jStop, :] - pos_i[..., :, np.newaxis, :]
+            sep2 = np.sum(separation**2, axis=-1)
+            sep2[sep2 == 0] = np.inf
+
+            if softening:
+                invCube, _ = _softenedKernel(sep2, softening, kernel)
+            else:
+                invCube = G / (sep2 * np.sqrt(sep2))
+            pull = invCube * sourceMasses[..., np.newaxis, jStart:jStop]
+            accelerations[..., iStart:iStart + tileSize, :] += np.einsum(
+                '...ij,...ijk->...ik', pull, separation)
+
+    return accelerations
+
+class TestParticleEngine:
+    """
+    Force engine wrapper for massive particles plus massless test particles.
+
+    The last nTest particles are test particles: they feel the massive ones
+    but pull on nothing, so they never need each other's separations. The
+    wrapped engine only sees the massive particles, and the test particles'
+    accelerations come from calculateAccelerationsOn, so N_massive massive
+    particles and N_test test particles cost O(N_massive**2 + N_massive *
+    N_test) instead of O((N_massive + N_test)**2). The masses given for the
+    test particles are ignored.
+
+    Counting the test particles from the end keeps the split right when an
+    integrator hands the engine a subset with some massive particles left
+    out (the Wisdom-Holman stepper leaves out the central body).
+
+    Parameters
+    ----------
+    engine : callable
+        Force engine for the massive particles (see getForceEngine).
+    nTest : int
+        Number of test particles, at the end of the arrays.
+    softening, kernel : float, str, optional
+        Softening of the pull on the test particles. By default the wrapped
+        engine's own, if it has one (the direct engine with options, or an
+        engine with an options dict like ProcessPoolEngine).
+
+    The wrapped engine is kept as .engine, and the softening as .options.
+    """
+
+    def __init__(self, engine, nTest, softening=None, kernel=None):
+        self.engine = engine
+        self.nTest = nTest
+
+        options = getattr(engine, 'options', None) or {}
+        if isinstance(engine, functools.partial):
+            options = engine.keywords
+        self.options = {'softening': options.get('softening', 0.0) if softening is None else softening,
+                        'kernel': options.get('kernel', 'plummer') if kernel is None else kernel}
+
+    def __call__(self, masses, positions):
+        positions = np.asarray(positions, dtype=float)
+        masses = np.asarray(masses, dtype=float)
+        nMassive = positions.shape[-2] - self.nTest
+        assert nMassive >= 0, 'More test particles than particles'
+
+        accelerations = np.zeros(positions.shape)
+        if nMassive > 1:
+            accelerations[..., :nMassive, :] = self.engine(masses[..., :nMassive],
+                                                           positions[..., :nMassive, :])
+        if nMassive > 0:
+            accelerations[..., nMassive:, :] = calculateAccelerationsOn(
+                positions[..., nMassive:, :], masses[..., :nMassive], positions[..., :nMassive, :],
+                **self.options)
+        return accelerations
+
+# define a function to calculate force vectors for all particles
+def calculateForceVectors(masses, positions):
+    """
+    Compute net gravitational force vectors on particles,
+    given a list of masses and positions for all of them.
+
+    Parameters
+    ----------
+    masses : list (or 1D numpy array) of floats
+        Particle masses, in kg.
+    positions : list (or numpy array) of m-element numpy arrays
+        Particle positions in cartesian coordinates, in meters,
+        in the same order as the masses are listed. Each element
+        in the list (a single particle's position) should be a
+        m-element numpy array, referring to its coordinates.
+
+    Returns
+    -------
+    forceVectrs : (N, m) numpy array
+        The net force vectors for each particle. Each row is a m-element
+        array that represents the net 3D force acting on a particle, after
+        summing over the individual force vectors induced by every other
+        particle.
+
+    Example
+    -------
+        Input:
+            au = 1.496e+11
+            masses = [1.0e24, 40.0e24, 50.0e24, 30.0e24, 2.0e24]
+            positions = [np.array([ 0.5,  2.6,  0.05])*au,
+                         np.array([ 0.8,  9.1,  0.10])*au,
+                         np.array([-4.1, -2.4,  0.80])*au,
+                         np.array([10.7,  3.7,  0.00])*au,
+                         np.array([-2.0, -1.9, -0.40])*au]
+
+            # calculate and print the force vectors for all particles
+            forces = calculateForceVectors(masses, positions)
+
+            print '{:>10} | {:>10} | {:>10} | {:>10}'.format('particle', 'Fx', 'Fy', 'Fz')
+            print '{:>10} | {:>10} | {:>10} | {:>10}'.format('(#)', '(N)', '(N)', '(N)')
+            print '-'*49
+            for i in range(len(forces)):
+                Fx, Fy, Fz = forces[i]
+                print '{:10.0f} | {:10.1e} | {:10.1e} | {:10.1e}'.format(i, Fx, Fy, Fz)
+
+        Output:
+              particle |         Fx |         Fy |         Fz
+                   (#) |        (N) |        (N) |        (N)
+            -------------------------------------------------
+                     0 |   -1.3e+15 |    3.8e+14 |    3.5e+14
+                     1 |    9.2e+15 |   -5.3e+16 |    1.8e+15
+                     2 |    7.5e+16 |    5.4e+16 |   -2.7e+16
+                     3 |   -4.2e+16 |    6.4e+15 |    1.1e+15
+                     4 |   -4.0e+16 |   -7.5e+15 |    2.4e+16
+
+        """
+
+    masses = np.asarray(masses, dtype=float)
+    positions = np.asarray(positions, dtype=float)
+
+    # the kernel works in accelerations, so scale back up by each mass
+    return masses[..., np.newaxis] * calculateAccelerations(masses, positions)
+
+def _directEngine(**options):
+    if options:
+        return functools.partial(calculateAccelerations, **options)
+    return calculateAccelerations
+
+def _barnesHutEngine(**options):
+    from .barneshut import BarnesHut
+    return BarnesHut(**options)
+
+def _particleMeshEngine(**options):
+    from .particlemesh import ParticleMesh
+    return ParticleMesh(**options)
+
+def _numbaEngine(**options):
+    from .jitforces import jitAccelerations
+    assert not options, "The 'numba' engine takes no options"
+    return jitAccelerations
+
+def _processPoolEngine(**options):
+    from .parallelforces import ProcessPoolEngine
+    return ProcessPoolEngine(**options)
+
+# force engines by name. Each entry builds a callable
+# engine(masses, positions) -> (N, m) accelerations in m/s2, which is the
+# interface leapfrog and calculateTrajectories use.
+forceEngines = {
+    'direct': _directEngine,
+    'barneshut': _barnesHutEngine,
+    'pm': _particleMeshEngine,
+    'numba': _numbaEngine,
+    'processes': _processPoolEngine,
+}
+
+def getForceEngine(engine='direct', **options):
+    """
+    Look up a force engine by name.
+
+    Parameters
+    ----------
+    engine : str or callable
+        Name of an entry in forceEngines, or an engine that is already built
+        (any callable taking (masses, positions) and returning accelerations),
+        which is returned unchanged.
+    **options
+        Passed to the engine's constructor, e.g. theta for 'barneshut' or
+        gridSize for 'pm'.
+
+    Returns
+    -------
+    engine : callable
+        engine(masses, positions) -> (N, m) array of accelerations, in m/s2.
+
+    Example
+    -------
+        engine = getForceEngine('barneshut', theta=0.7, quadrupole=True)
+        accelerations = engine(masses, positions)
+    """
+    if callable(engine):
+        assert not options, 'Options can only be given with an engine name'
+        return engine
+
+    assert engine in forceEngines, 'Unknown force engine {!r}, choose from {}'.format(
+        engine, sorted(forceEngines))
+    return forceEngines[engine](**options)
+
+def test():
+    '''This function tests the force calculations.'''
+
+    print( "This test function should produce the following output:")
+
+    print ("""
+  particle |         Fx |         Fy |         Fz
+       (#) |        (N) |        (N) |        (N)
+-------------------------------------------------
+         0 |   -1.3e+15 |    3.8e+14 |    3.5e+14
+         1 |    9.2e+15 |   -5.3e+16 |    1.8e+15
+         2 |    7.5e+16 |    5.4e+16 |   -2.7e+16
+         3 |   -4.2e+16 |    6.4e+15 |    1.1e+15
+         4 |   -4.0e+16 |   -7.5e+15 |    2.4e+16
+    """)
+
+    print("Here is what it outputs after running calculateForceVectors:\n")
+
+    au = 1.496e+11
+    masses = [1.0e24, 40.0e24, 50.0e24, 30.0e24, 2.0e24]
+    positions = [np.array([ 0.5,  2.6,  0.05])*au,
+                 np.array([ 0.8,  9.1,  0.10])*au,
+                 np.array([-4.1, -2.4,  0.80])*au,
+                 np.array([10.7,  3.7,  0.00])*au,
+                 np.array([-2.0, -1.9, -0.40])*au]
+
+    # calculate and print the force vectors for all particles
+    forces = calculateForceVectors(masses, positions)
+
+    print('{:>10} | {:>10} | {:>10} | {:>10}'.format('particle', 'Fx', 'Fy', 'Fz'))
+    print('{:>10} | {:>10} | {:>10} | {:>10}'.format('(#)', '(N)', '(N)', '(N)'))
+    print('-'*49)
+    for i in range(len(forces)):
+        Fx, Fy, Fz = forces[i]
+        print('{:10.0f} | {:10.1e} | {:10.1e} | {:10.1e}'.format(i, Fx, Fy, Fz))
+
+
+    print("\nIf those two tables are the same, it works!")
+'''
+if __name__ == '__main__':
+    test()
+'''
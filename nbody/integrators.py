@@ -0,0 +1,83 @@
+'''Registry of the integrators calculateTrajectories can use.
+
+Every integrator is a stepper class, built as
+``Stepper(masses, positions, velocities, forceEngine, **options)``, whose
+``step(dt)`` advances the system by dt and returns the new positions and
+velocities.
+
+Besides the second-order velocity Verlet (leap-frog) this adds 4th- and
+6th-order symplectic integrators, built as Yoshida compositions of leap-frog
+substeps. Each substep reuses the accelerations of the one before, so a
+4th-order step costs 3 force evaluations and a 6th-order step costs 7, but
+both allow much larger steps for the same energy error.
+'''
+from .leapfrog import LeapfrogStepper
+from .blocksteps import BlockStepper
+from .wisdomholman import WisdomHolmanStepper
+
+class CompositionStepper(LeapfrogStepper):
+    """
+    Symplectic integrator made of leap-frog substeps of length w * dt, one
+    for each weight w in ``weights``. The weights add up to 1, and are
+    chosen so the leading error terms of the substeps cancel.
+    """
+
+    weights = (1.0,)
+
+    def step(self, dt):
+        for weight in self.weights:
+            positions, velocities = super().step(weight * dt)
+        return positions, velocities
+
+def _tripleJump(weights, order):
+    """
+    Yoshida's triple jump: raise a symmetric method of the given (even)
+    order by two, by composing it with steps of x1, x0, x1 times dt.
+    """
+    x1 = 1.0 / (2.0 - 2.0**(1.0 / (order + 1)))
+    x0 = 1.0 - 2.0 * x1
+    return ([x1 * w for w in weights] + [x0 * w for w in weights] +
+            [x1 * w for w in weights])
+
+class ForestRuthStepper(CompositionStepper):
+    """4th-order Forest-Ruth integrator (3 force evaluations per step)."""
+    weights = tuple(_tripleJump([1.0], 2))
+
+class Yoshida6Stepper(CompositionStepper):
+    """
+    6th-order Yoshida integrator, solution A (7 force evaluations per step).
+    """
+    _w1, _w2, _w3 = -1.17767998417887, 0.235573213359357, 0.784513610477560
+    _w0 = 1.0 - 2.0 * (_w1 + _w2 + _w3)
+    weights = (_w3, _w2, _w1, _w0, _w1, _w2, _w3)
+
+# integrators by name
+integrators = {
+    'leapfrog': LeapfrogStepper,     # 2nd order, 1 force evaluation per step
+    'verlet': LeapfrogStepper,       # same scheme, by its other name
+    'forestruth': ForestRuthStepper, # 4th order, 3 force evaluations per step
+    'yoshida6': Yoshida6Stepper,     # 6th order, 7 force evaluations per step
+    'block': BlockStepper,           # adaptive power-of-two steps per particle
+    'wh': WisdomHolmanStepper,       # Kepler orbits solved exactly, for a central mass
+    'wisdomholman': WisdomHolmanStepper,
+}
+
+def registerIntegrator(name, stepper):
+    """
+    Make a stepper class available to calculateTrajectories under a name.
+
+    Parameters
+    ----------
+    name : str
+        Name to select the integrator with.
+    stepper : class
+        Built as stepper(masses, positions, velocities, forceEngine,
+        **options), with a step(dt) method returning positions, velocities.
+    """
+    integrators[name] = stepper
+
+def getIntegrator(name):
+    """Look up a stepper class by name (see integrators)."""
+    assert name in integrators, 'Unknown integrator {!r}, choose from {}'.format(
+        name, sorted(integrators))
+    return integrators[name]
@@ -0,0 +1,85 @@
+'''Numba-compiled direct-summation force engine.
+
+The NumPy kernel in forces.calculateAccelerations builds (tile x tile)
+temporaries and runs on a single core. The kernel here loops over pairs
+directly, in compiled code, with the loop over target particles spread across
+all cores and no temporaries larger than one particle.
+
+Numba is optional. Without it jitAccelerations falls back to
+forces.calculateAccelerations, so code can always ask for the 'numba' engine.
+
+The compiled kernel is cached on disk (in __pycache__, or NUMBA_CACHE_DIR if
+set), so only the first run on a machine pays the compile time.
+'''
+import os
+import numpy as np
+from .forces import G, calculateAccelerations
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+HAVE_NUMBA = numba is not None
+
+# a process that forks (the 'processes' engine, movie.renderMovie) after
+# numba's TBB thread pool has started can hang at exit, so prefer the other
+# threading layers unless one was chosen through the environment
+if HAVE_NUMBA and not ({'NUMBA_THREADING_LAYER', 'NUMBA_THREADING_LAYER_PRIORITY'} & set(os.environ)):
+    numba.config.THREADING_LAYER_PRIORITY = ['omp', 'workqueue', 'tbb']
+
+if HAVE_NUMBA:
+    @numba.njit(parallel=True, cache=True)
+    def _accelerationKernel(masses, positions, gravity):
+        N = positions.shape[0]
+        accelerations = np.zeros((N, 3))
+
+        # each thread owns a set of target particles, so no two threads ever
+        # write to the same row
+        for i in numba.prange(N):
+            ax = 0.0
+            ay = 0.0
+            az = 0.0
+            for j in range(N):
+                if j != i:
+                    dx = positions[j, 0] - positions[i, 0]
+                    dy = positions[j, 1] - positions[i, 1]
+                    dz = positions[j, 2] - positions[i, 2]
+                    sep2 = dx*dx + dy*dy + dz*dz
+                    pull = gravity * masses[j] / (sep2 * np.sqrt(sep2))
+                    ax += pull * dx
+                    ay += pull * dy
+                    az += pull * dz
+            accelerations[i, 0] = ax
+            accelerations[i, 1] = ay
+            accelerations[i, 2] = az
+
+        return accelerations
+
+def jitAccelerations(masses, positions):
+    """
+    Compute net gravitational accelerations on all particles with the
+    compiled kernel.
+
+    Parameters
+    ----------
+    masses : 1D numpy array
+        Particle masses, in kg.
+    positions : (N, 3) numpy array
+        Particle positions, in m.
+
+    Returns
+    -------
+    accelerations : (N, 3) numpy array
+        Net gravitational acceleration of each particle, in m/s2.
+        Falls back to forces.calculateAccelerations when Numba is not
+        installed.
+    """
+    if not HAVE_NUMBA:
+        return calculateAccelerations(masses, positions)
+
+    masses = np.ascontiguousarray(masses, dtype=float)
+    positions = np.ascontiguousarray(positions, dtype=float)
+    assert positions.ndim == 2 and positions.shape[1] == 3, 'The numba kernel needs (N, 3) positions'
+
+    return _accelerationKernel(masses, positions, G)
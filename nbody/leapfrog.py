@@ -0,0 +1,164 @@
+import numpy as np
+from .forces import getForceEngine
+
+def updateParticles(masses, positions, velocities, dt, forceEngine='direct'):
+    """
+    Evolve particles in time via leap-frog integrator scheme. This function
+    takes masses, positions, velocities, and a time step dt as
+
+    Parameters
+    ----------
+    masses : np.ndarray
+        1-D array containing masses for all particles, in kg
+        It has length N, where N is the number of particles.
+    positions : np.ndarray
+        2-D array containing (x, y, z) positions for all particles.
+        Shape is (N, 3) where N is the number of particles.
+    velocities : np.ndarray
+        2-D array containing (x, y, z) velocities for all particles.
+        Shape is (N, 3) where N is the number of particles.
+    dt : float
+        Evolve system for time dt (in seconds).
+    forceEngine : str or callable
+        Force engine used for the accelerations, by name or as a callable
+        (see forces.getForceEngine). Defaults to direct summation.
+
+    Returns
+    -------
+    Updated particle positions and particle velocities, each being a 2-D
+    array with shape (N, 3), where N is the number of particles.
+
+    A batch of B independent systems can be evolved together by giving
+    positions and velocities of shape (B, N, 3), masses of shape (B, N) or
+    (N,), and dt as a float or a (B,) array of per-system time steps. The
+    returned arrays are then (B, N, 3) as well.
+
+    """
+
+    startingPositions = np.array(positions)
+    startingVelocities = np.array(velocities)
+
+    # how many particles are there?
+    nParticles, nDimensions = startingPositions.shape[-2:]
+
+    # make sure the three input arrays have consistent shapes
+    assert(startingVelocities.shape == startingPositions.shape)
+    assert(np.shape(masses)[-1] == nParticles)
+
+    forceEngine = getForceEngine(forceEngine)
+    dt = _batchTimeStep(dt)
+
+    # calculate the acceleration due to gravity, at the starting position
+    startingAccelerations = forceEngine(masses, startingPositions)
+
+    endingPositions, endingVelocities, endingAccelerations = _velocityVerlet(
+        forceEngine, masses, startingPositions, startingVelocities,
+        startingAccelerations, dt)
+
+    return endingPositions, endingVelocities
+
+def _velocityVerlet(forceEngine, masses, startingPositions, startingVelocities,
+                    startingAccelerations, dt):
+    """
+    One velocity-Verlet step, given the accelerations at the starting
+    position. Returns the ending positions, velocities and accelerations so
+    the accelerations can be reused as the start of the next step.
+    """
+
+    # calculate the ending position
+    nudge = startingVelocities*dt + 0.5*startingAccelerations*dt**2
+    endingPositions = startingPositions + nudge
+
+    # calculate the acceleration due to gravity, at the ending position
+    endingAccelerations = forceEngine(masses, endingPositions)
+
+    # calculate the ending velocity
+    endingVelocities = (startingVelocities +
+                        0.5*(endingAccelerations + startingAccelerations)*dt)
+
+    return endingPositions, endingVelocities, endingAccelerations
+
+def _batchTimeStep(dt):
+    """
+    Leave a scalar time step alone, but give a (B,) array of per-system time
+    steps two trailing axes so it broadcasts against (B, N, 3) arrays.
+    """
+    if np.ndim(dt) == 0:
+        return dt
+    return np.asarray(dt, dtype=float)[..., np.newaxis, np.newaxis]
+
+class LeapfrogStepper:
+    """
+    Stateful leap-frog (kick-drift-kick) integrator.
+
+    updateParticles has to compute the accelerations at both ends of every
+    step, and the next call computes the accelerations at its start all over
+    again. A stepper keeps the accelerations at the end of one step and
+    reuses them as the start of the next, so each step costs one force
+    evaluation instead of two. The positions and velocities it produces are
+    bit-for-bit the same as repeated calls to updateParticles.
+
+    Parameters
+    ----------
+    masses : np.ndarray
+        1-D array containing masses for all particles, in kg.
+    positions : np.ndarray
+        (N, 3) array of starting positions, in m.
+    velocities : np.ndarray
+        (N, 3) array of starting velocities, in m/s.
+    forceEngine : str or callable
+        Force engine used for the accelerations (see forces.getForceEngine).
+
+    Like updateParticles, the stepper also takes a batch of independent
+    systems: (B, N, 3) positions and velocities with (B, N) or (N,) masses.
+
+    Example
+    -------
+        stepper = LeapfrogStepper(masses, initPos, initVel)
+        for n in range(numSteps):
+            pos, vel = stepper.step(dt)
+    """
+
+    # everything needed to continue the run exactly (see getState)
+    stateAttributes = ('positions', 'velocities', 'accelerations', 'forceEvaluations')
+
+    def __init__(self, masses, positions, velocities, forceEngine='direct'):
+        self.masses = np.array(masses, dtype=float)
+        self.positions = np.array(positions, dtype=float)
+        self.velocities = np.array(velocities, dtype=float)
+
+        # make sure the three input arrays have consistent shapes
+        assert self.velocities.shape == self.positions.shape
+        assert self.masses.shape[-1] == self.positions.shape[-2]
+
+        self.forceEngine = getForceEngine(forceEngine)
+        self.accelerations = self.forceEngine(self.masses, self.positions)
+        self.forceEvaluations = 1
+
+    def step(self, dt):
+        """
+        Advance the particles by dt seconds and return the new positions and
+        velocities (the stepper keeps its own copies). For a batch, dt may be
+        a (B,) array of per-system time steps.
+        """
+        dt = _batchTimeStep(dt)
+        self.positions, self.velocities, self.accelerations = _velocityVerlet(
+            self.forceEngine, self.masses, self.positions, self.velocities, self.accelerations, dt)
+        self.forceEvaluations += 1
+
+        return self.positions, self.velocities
+
+    def getState(self):
+        """
+        Copy of the stepper's state, as a dict of arrays. Restoring it with
+        setState continues the run bit for bit, e.g. from a checkpoint.
+        """
+        return {name: np.copy(getattr(self, name)) for name in self.stateAttributes
+                if getattr(self, name) is not None}
+
+    def setState(self, state):
+        """Restore a state saved with getState."""
+        for name in self.stateAttributes:
+            if name in state:
+                value = np.array(state[name])
+                setattr(self, name, value.item() if value.ndim == 0 else value)
@@ -0,0 +1,438 @@
+"""
+Running a simulation.
+===========
+
+calculateTrajectories evolves N particles from their initial positions and
+velocities with a chosen force engine and integrator, and returns the
+trajectory: the times, positions and velocities of every saveEvery-th step.
+It can stream the snapshots to disk, write checkpoints, report progress,
+record conserved quantities and look runs up in a result cache.
+
+resumeTrajectories continues a checkpointed run, or extends a finished one,
+exactly as if it had never stopped.
+
+iterateTrajectories is the generator version of calculateTrajectories: it
+yields one snapshot at a time instead of storing them.
+
+See the function doc strings for their inputs and outputs.
+
+==================
+Dependencies
+===================
+
+Standard:
+    numpy
+
+Non-standard (part of the nbody package):
+    forces
+    integrators
+    trajectory
+    checkpoint
+    telemetry
+"""
+import time as timer
+import numpy as np
+from .integrators import getIntegrator
+from .trajectory import Trajectory, TrajectoryWriter, readTrajectory
+from .checkpoint import saveCheckpoint, loadCheckpoint
+from .forces import getForceEngine, TestParticleEngine
+from .telemetry import RunMonitor
+
+def calculateTrajectories(masses, initPos, initVel, timeEvol, dt, forceEngine='direct',
+                          integrator='leapfrog', integratorOptions=None,
+                          saveEvery=1, output=None, dtype=np.float64,
+                          returnTrajectory=False, checkpoint=None, checkpointEvery=100,
+                          monitor=None, diagnostics=None, cache=None, nActive=None):
+    """
+    Calculates position and velocity of N particles in M dimensions for timestep dt
+    Expects arrays as numpy arrays.
+
+    Inputs
+    =========
+    masses: N-element ordered array of masses, in kg
+    initPos: (N,M) ordered array of initial positions for each mass, in meters
+    initVel: (N,M) ordered array of initial velocities for each mass, in m/s
+    timeEvol: amount of time to evolve system, in seconds
+    dt: timestep, in seconds
+    forceEngine: name of a force engine ('direct', 'barneshut', ...) or an
+                 engine built with forces.getForceEngine, e.g.
+                 getForceEngine('barneshut', theta=0.7) for large clusters
+    integrator: name of the integrator in integrators.integrators:
+                'leapfrog' (velocity Verlet), 'forestruth' (4th order) or
+                'yoshida6' (6th order), which allow much larger dt for the
+                same energy error, or 'block', which gives every particle its
+                own power-of-two fraction of dt, for systems where a few
+                particles have much shorter orbits than the rest (it gains
+                little when most do, as in Kepler-16), or 'wh' (Wisdom-Holman), which
+                solves the orbits around a dominant central mass exactly
+                and allows steps of days to weeks for planetary systems
+    integratorOptions: dict of extra arguments for the integrator, e.g.
+                       {'eta': 0.01, 'maxLevel': 8} for 'block'
+    saveEvery: keep only every saveEvery-th step (plus the last one); the
+               system is still integrated at the full dt
+    output: where to keep the snapshots. None keeps them in memory. A
+            directory name streams them to disk as they are made (see
+            trajectory.TrajectoryWriter), so memory use stays O(N) however
+            long the run, and the returned arrays are memory-mapped from
+            there. Any other sink object (with append/close/result) is
+            used as given.
+    dtype: storage type of the saved positions and velocities; np.float32
+           halves the memory (the integration itself is always float64)
+    returnTrajectory: return a trajectory.Trajectory, which stores the
+                      snapshots time-major as positions[n] (N,M) blocks,
+                      instead of the three arrays below
+    checkpoint: file name to keep a checkpoint of the full integrator state
+                in, so the run can be continued with resumeTrajectories if
+                it is interrupted, or extended to a longer timeEvol later
+    checkpointEvery: update the checkpoint every this many saved snapshots
+                     (it is always written at the end of the run)
+    monitor: telemetry.RunMonitor with hooks called on every step, force
+             evaluation and saved snapshot, which also times the force,
+             integrate, output and checkpoint phases and leaves a summary
+             in monitor.summary at the end. Defaults to one that only
+             shows progress; RunMonitor(progress=False) runs silently
+    diagnostics: diagnostics.Diagnostics to record energy, momentum,
+                 angular momentum and virial ratio at every saved snapshot
+                 (with the direct engine the potential energy comes from
+                 the force pass itself), and optionally stop the run once
+                 the energy error exceeds a tolerance
+    cache: cache.ResultCache, or a directory to keep one in. A run made
+           before (same system, dt and settings, any timeEvol at least as
+           long) is then memory-mapped from the cache instead of being
+           integrated again, and a longer one only integrates the
+           remainder. The force engine must be given by name, and output,
+           checkpoint and diagnostics cannot be used
+    nActive: treat only the first nActive particles as massive; the rest
+             are massless test particles (their masses are taken as 0),
+             which feel the massive ones but not each other (see
+             forces.TestParticleEngine). Adding test particles then costs
+             time linear in their number instead of quadratic
+
+    Return
+    ==========
+    times: numTimeSteps-element array with times evaluated at
+    positionArray: (N,M,numTimeSteps)-array of positions for each N particles in M
+                  dimensions for each time
+    velocityArray:  (N,M,numTimeSteps)-array of velocities for each N particles in M
+                  dimensions for each time
+    (positionArray and velocityArray are views of time-major storage, so
+    positionArray[:,:,n] is a single contiguous block)
+
+    Batches
+    ==========
+    Many independent systems of N particles (e.g. a sweep over initial
+    velocities) can be run together in one vectorized pass by adding a
+    leading batch axis: initPos and initVel of shape (B,N,M), masses of
+    shape (B,N) or (N,). dt may then be a B-element array of per-system
+    timesteps (with timeEvol a float or a B-element array), as long as
+    every system takes the same number of steps. Returned arrays gain the
+    same leading axis, (B,N,M,numTimeSteps), and times becomes
+    (B,numTimeSteps) when dt is per-system.
+    """
+    if cache is not None:
+        assert output is None and checkpoint is None and diagnostics is None, \
+            'Cached runs cannot take output, checkpoint or diagnostics'
+        from .cache import ResultCache
+        if isinstance(cache, str):
+            cache = ResultCache(cache)
+        return cache.calculateTrajectories(masses, initPos, initVel, timeEvol, dt, forceEngine,
+                                           integrator=integrator,
+                                           integratorOptions=integratorOptions,
+                                           saveEvery=saveEvery, dtype=dtype,
+                                           returnTrajectory=returnTrajectory, monitor=monitor,
+                                           nActive=nActive)
+
+    initPos = np.array(initPos)
+    time = timeArray(timeEvol, dt)
+    numSaved = len(savedSteps(time.shape[-1]-1, saveEvery))
+
+    # what resumeTrajectories needs to know to carry on from a checkpoint
+    run = {'timeEvol': np.asarray(timeEvol).tolist(), 'saveEvery': saveEvery,
+           'integrator': integrator, 'integratorOptions': integratorOptions,
+           'forceEngine': forceEngine if isinstance(forceEngine, str) else None,
+           'output': output if isinstance(output, str) else None,
+           'dtype': np.dtype(dtype).name, 'checkpointEvery': checkpointEvery,
+           'nActive': nActive}
+
+    monitor = monitor or RunMonitor()
+    monitor.start(0, time.shape[-1]-1)
+    stepper, engine = _startRun(masses, initPos, initVel, forceEngine,
+                                integrator, integratorOptions, monitor, diagnostics, nActive)
+
+    # the sink is only opened once the run could be set up, and is closed
+    # along with the engine if the first snapshot cannot be stored
+    sink = None
+    try:
+        if output is None:
+            sink = Trajectory.empty(initPos.shape, numSaved, time.shape[:-1], dtype)
+        elif isinstance(output, str):
+            sink = TrajectoryWriter(output, initPos.shape, time.shape[:-1], dtype)
+        else:
+            sink = output
+
+        start = timer.perf_counter()
+        sink.append(time[...,0], initPos, initVel)
+        monitor.phases['output'] += timer.perf_counter() - start
+        monitor.output(0, time[...,0], initPos, initVel)
+        if diagnostics is not None:
+            diagnostics.record(time[...,0], stepper.positions, stepper.velocities)
+    except BaseException:
+        if sink is not None:
+            sink.close()
+        _closeEngine(engine, forceEngine)
+        raise
+
+    _record(stepper, engine, forceEngine, time, dt, 0, saveEvery, sink, checkpoint, run,
+            monitor, diagnostics)
+
+    if returnTrajectory:
+        return readTrajectory(output) if isinstance(output, str) else sink
+    return sink.result()
+
+def resumeTrajectories(checkpoint, timeEvol=None, forceEngine=None, output=None,
+                       returnTrajectory=False, monitor=None, diagnostics=None):
+    """
+    Continue a run of calculateTrajectories from its last checkpoint.
+
+    The run carries on bit for bit as if it had never stopped. Giving a
+    longer timeEvol than the original run extends a finished run instead of
+    recomputing it from t = 0.
+
+    Inputs
+    =========
+    checkpoint: checkpoint file written by calculateTrajectories
+    timeEvol: total amount of time to evolve the system to, counted from the
+              original t = 0, in seconds. Defaults to the original timeEvol
+    forceEngine: force engine to use. Defaults to the one the run used, if
+                 it was given by name (engine objects are not saved)
+    output: trajectory directory to continue. Defaults to the run's own
+            output directory; snapshots after the checkpoint are dropped
+            and the continuation is appended. If the run kept its snapshots
+            in memory, only the snapshots after the checkpoint are returned
+    monitor: telemetry.RunMonitor for the resumed part of the run
+    diagnostics: diagnostics.Diagnostics for the resumed part of the run
+                 (energy errors are relative to its first snapshot, the one
+                 after the checkpoint)
+
+    Return
+    ==========
+    times, positionArray, velocityArray as for calculateTrajectories (or a
+    trajectory.Trajectory with returnTrajectory=True)
+    """
+    state, masses, dt, run = loadCheckpoint(checkpoint)
+
+    if timeEvol is None:
+        timeEvol = run['timeEvol']
+    timeEvol = np.asarray(timeEvol) if np.ndim(timeEvol) else timeEvol
+    forceEngine = forceEngine or run['forceEngine']
+    assert forceEngine is not None, 'The run used a force engine object; pass forceEngine'
+    output = output or run['output']
+
+    time = timeArray(timeEvol, dt)
+    numSteps = time.shape[-1]-1
+    assert numSteps >= run['step'], 'The checkpoint is already past timeEvol'
+
+    monitor = monitor or RunMonitor()
+    monitor.start(run['step'], numSteps)
+    stepper, engine = _startRun(masses, state['positions'], state['velocities'], forceEngine,
+                                run['integrator'], run['integratorOptions'], monitor,
+                                diagnostics, run.get('nActive'))
+    stepper.setState(state)
+
+    # the checkpoint comes right after saving the snapshot at its step; when
+    # extending a run that snapshot may have only been kept for being the
+    # last one, and is dropped if it is not on the save stride
+    savedCount = run['savedCount']
+    if run['step'] % run['saveEvery'] != 0 and run['step'] != numSteps:
+        savedCount -= 1
+
+    shape = state['positions'].shape
+    try:
+        if output is None:
+            numNew = np.count_nonzero(savedSteps(numSteps, run['saveEvery']) > run['step'])
+            sink = Trajectory.empty(shape, numNew, time.shape[:-1], run['dtype'])
+        else:
+            sink = TrajectoryWriter(output, shape, time.shape[:-1], run['dtype'],
+                                    keep=savedCount)
+    except BaseException:
+        _closeEngine(engine, forceEngine)
+        raise
+
+    run = dict(run, timeEvol=np.asarray(timeEvol).tolist(), output=output)
+    _record(stepper, engine, forceEngine, time, dt, run['step'], run['saveEvery'],
+            sink, checkpoint, run, monitor, diagnostics)
+
+    if returnTrajectory:
+        return readTrajectory(output) if output is not None else sink
+    return sink.result()
+
+def _startRun(masses, initPos, initVel, forceEngine, integrator, integratorOptions,
+              monitor=None, diagnostics=None, nActive=None):
+    """
+    Check the inputs and build the force engine and the stepper. With a
+    monitor, the stepper gets the engine wrapped in the monitor's timer, and
+    with diagnostics, in a wrapper that keeps the potential. With nActive,
+    the particles after the first nActive are made massless and the engine
+    is wrapped to treat them as test particles.
+    """
+    # make sure input arrays are numpy arrays
+    masses, initPos, initVel = np.array(masses), np.array(initPos), np.array(initVel)
+
+    # make sure arrays have proper length
+    assert initPos.shape==initVel.shape, 'Position and velocity arrays must have same shape'
+    assert masses.shape[-1]==initPos.shape[-2], 'Mass array must have same length as position array'
+
+    N = initPos.shape[-2]
+    if nActive is not None:
+        assert 0 < nActive <= N, 'nActive must be between 1 and the number of particles'
+        masses = np.array(masses, dtype=float)
+        masses[..., nActive:] = 0.0
+
+    Stepper = getIntegrator(integrator)
+
+    # engines given by name are built here, and so are also shut down here
+    # (e.g. worker processes); engines passed in are left to the caller
+    engine = getForceEngine(forceEngine)
+
+    try:
+        # the stepper carries accelerations between steps, so each step costs
+        # a single force evaluation
+        stepperEngine = engine
+        if nActive is not None and nActive < N:
+            stepperEngine = TestParticleEngine(stepperEngine, N - nActive)
+        if diagnostics is not None:
+            diagnostics.start(masses)
+            stepperEngine = diagnostics.wrapEngine(stepperEngine)
+        if monitor is not None:
+            stepperEngine = monitor.timeEngine(stepperEngine)
+        stepper = Stepper(masses, initPos, initVel, stepperEngine, **(integratorOptions or {}))
+    except BaseException:
+        _closeEngine(engine, forceEngine)
+        raise
+
+    return stepper, engine
+
+def _closeEngine(engine, forceEngine):
+    if engine is not forceEngine and hasattr(engine, 'close'):
+        engine.close()
+
+def _evolve(stepper, time, dt, firstStep, saveEvery, monitor, diagnostics=None):
+    """
+    Step from firstStep to the end of time, yielding (step, time, positions,
+    velocities) for every step that is saved, and reporting every step to
+    the monitor. Diagnostics are told which steps they will record.
+    """
+    if np.ndim(dt) != 0:
+        dt = np.asarray(dt, dtype=float)
+    numSteps = time.shape[-1]-1
+    saved = set(savedSteps(numSteps, saveEvery).tolist())
+
+    # calculate positions/velocities for each time, skipping t = 0
+    for n in np.arange(firstStep, numSteps):
+        if diagnostics is not None:
+            diagnostics.expectRecord(n+1 in saved)
+        forceTime = monitor.phases['force']
+        start = timer.perf_counter()
+        pos, vel = stepper.step(dt)
+        stepTime = timer.perf_counter() - start
+
+        # hooks and (throttled) progress line
+        monitor.step(n+1, time[...,n+1], stepper, stepTime, monitor.phases['force'] - forceTime)
+
+        if n+1 in saved:
+            # steppers may update their arrays in place, so hand out copies
+            yield n+1, time[...,n+1], pos.copy(), vel.copy()
+
+def _record(stepper, engine, forceEngine, time, dt, firstStep, saveEvery, sink,
+            checkpoint, run, monitor, diagnostics=None):
+    """Run the stepper to the end, storing snapshots and checkpoints."""
+    numSteps = time.shape[-1]-1
+
+    try:
+        for n, t, pos, vel in _evolve(stepper, time, dt, firstStep, saveEvery, monitor,
+                                      diagnostics):
+            start = timer.perf_counter()
+            sink.append(t, pos, vel)
+            monitor.phases['output'] += timer.perf_counter() - start
+            monitor.output(n, t, pos, vel)
+            if diagnostics is not None:
+                diagnostics.record(t, pos, vel)
+
+            # checkpoint every checkpointEvery saved snapshots, and at the end
+            if checkpoint is not None and (sink.count % run['checkpointEvery'] == 0
+                                           or n == numSteps):
+                start = timer.perf_counter()
+                # everything the checkpoint counts as saved must be on disk
+                if hasattr(sink, 'flush'):
+                    sink.flush()
+                saveCheckpoint(checkpoint, stepper, stepper.masses, dt,
+                               dict(run, step=int(n), savedCount=sink.count))
+                monitor.phases['checkpoint'] += timer.perf_counter() - start
+    finally:
+        start = timer.perf_counter()
+        sink.close()
+        monitor.phases['output'] += timer.perf_counter() - start
+        _closeEngine(engine, forceEngine)
+
+    monitor.finish(stepper, N=int(stepper.masses.shape[-1]), integrator=run['integrator'],
+                   forceEngine=run['forceEngine'])
+
+def timeArray(timeEvol, dt):
+    """
+    Times of every step of a run, end inclusive. For a (B,)-array of
+    per-system timesteps this is a (B, numTimeSteps) array.
+    """
+    if np.ndim(dt) == 0:
+        return np.arange(0,timeEvol+dt,dt) #time array is end inclusive
+
+    # one time array per system; they must all have the same length
+    dt = np.asarray(dt, dtype=float)
+    numSteps = np.unique(np.round(timeEvol/dt).astype(int))
+    assert len(numSteps)==1, 'Every system in a batch must take the same number of steps'
+    return dt[:,np.newaxis] * np.arange(numSteps[0]+1)
+
+def savedSteps(numSteps, saveEvery):
+    """Step numbers that are kept: every saveEvery-th, plus the last one."""
+    steps = np.arange(0, numSteps+1, saveEvery)
+    if steps[-1] != numSteps:
+        steps = np.append(steps, numSteps)
+    return steps
+
+def iterateTrajectories(masses, initPos, initVel, timeEvol, dt, forceEngine='direct',
+                        integrator='leapfrog', integratorOptions=None, saveEvery=1,
+                        monitor=None, diagnostics=None, nActive=None):
+    """
+    Generator version of calculateTrajectories: takes the same inputs and
+    yields (time, positions, velocities) for t = 0 and then every
+    saveEvery-th step (and the last step), instead of storing them. Only the
+    current snapshot is ever held in memory.
+
+    Example
+    ==========
+    for t, pos, vel in iterateTrajectories(masses, initPos, initVel,
+                                           timeEvol, dt, saveEvery=100):
+        print(t, pos[1])
+    """
+    time = timeArray(timeEvol, dt)
+    monitor = monitor or RunMonitor()
+    monitor.start(0, time.shape[-1]-1)
+    stepper, engine = _startRun(masses, initPos, initVel, forceEngine,
+                                integrator, integratorOptions, monitor, diagnostics, nActive)
+
+    try:
+        monitor.output(0, time[...,0], initPos, initVel)
+        if diagnostics is not None:
+            diagnostics.record(time[...,0], stepper.positions, stepper.velocities)
+        yield time[...,0], np.array(initPos), np.array(initVel)
+
+        for n, t, pos, vel in _evolve(stepper, time, dt, 0, saveEvery, monitor, diagnostics):
+            monitor.output(n, t, pos, vel)
+            if diagnostics is not None:
+                diagnostics.record(t, pos, vel)
+            yield t, pos, vel
+    finally:
+        _closeEngine(engine, forceEngine)
+
+    # the time spent in the caller between snapshots counts as 'other'
+    monitor.finish(stepper, N=int(stepper.masses.shape[-1]), integrator=integrator,
+                   forceEngine=forceEngine if isinstance(forceEngine, str) else None)
@@ -0,0 +1,172 @@
+'''Parallel movie rendering straight into ffmpeg.
+
+FuncAnimation.save draws every frame in one process and hands it to
+matplotlib's movie writer. renderMovie instead splits the frames into
+contiguous chunks and gives each to a worker process. The worker builds its
+own figure, draws its frames with the Agg canvas and writes the raw RGBA
+buffers into an ffmpeg pipe, which encodes the chunk. The chunks are then
+joined, without re-encoding, by ffmpeg's concat demuxer.
+
+Workers are forked, so they see the parent's trajectory arrays (or
+memory-mapped trajectory files, see trajectory.readTrajectory) without
+copying or pickling them, and only read from them. The figure is made by a
+setup function called in each worker, so it may be a closure or lambda.
+
+Each frame must be drawable on its own, without the frames before it having
+been drawn, because a worker starts in the middle of the movie.
+TrajectoryAnimator frames are; an onFrame callback should depend only on the
+frame number.
+'''
+import multiprocessing as mp
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import numpy as np
+
+# the setup function of the movie being rendered, inherited by forked workers
+_setup = None
+
+def ffmpegCommand(path, width, height, fps, ffmpeg='ffmpeg', codecArgs=None):
+    """
+    ffmpeg command line that encodes raw RGBA frames read from stdin.
+
+    Parameters
+    ----------
+    path : str
+        Movie file to write.
+    width, height : int
+        Frame size in pixels.
+    fps : float
+        Frames per second.
+    ffmpeg : str
+        ffmpeg executable.
+    codecArgs : list of str, optional
+        Output options; H.264 in a yuv420p container by default.
+    """
+    if codecArgs is None:
+        # yuv420p needs even dimensions
+        codecArgs = ['-c:v', 'libx264', '-pix_fmt', 'yuv420p',
+                     '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2']
+    return [ffmpeg, '-y', '-loglevel', 'error',
+            '-f', 'rawvideo', '-pix_fmt', 'rgba', '-s', '{}x{}'.format(width, height),
+            '-r', str(fps), '-i', '-'] + list(codecArgs) + [path]
+
+def _renderChunk(job):
+    """Worker: draw frames start..stop-1 and pipe them into ffmpeg."""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    import matplotlib.pyplot as plt
+
+    start, stop, path, fps, ffmpeg, codecArgs = job
+
+    fig, animator = _setup()
+    canvas = FigureCanvasAgg(fig)
+    animator.progress = False
+    animator.init()
+    canvas.draw()
+    width, height = canvas.get_width_height()
+
+    encoder = subprocess.Popen(ffmpegCommand(path, width, height, fps, ffmpeg, codecArgs),
+                               stdin=subprocess.PIPE)
+    try:
+        for fnum in range(start, stop):
+            animator.update(fnum)
+            canvas.draw()
+            encoder.stdin.write(canvas.buffer_rgba())
+    finally:
+        encoder.stdin.close()
+        returncode = encoder.wait()
+        plt.close(fig)
+
+    assert returncode == 0, 'ffmpeg failed on frames {}-{}'.format(start, stop - 1)
+    return stop - start
+
+def _concatenate(paths, path, ffmpeg):
+    """Join movie chunks into one file without re-encoding."""
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+        for chunk in paths:
+            f.write("file '{}'\n".format(os.path.abspath(chunk).replace("'", r"'\''")))
+        listPath = f.name
+    try:
+        subprocess.run([ffmpeg, '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0',
+                        '-i', listPath, '-c', 'copy', path], check=True)
+    finally:
+        os.remove(listPath)
+
+def frameChunks(numFrames, numChunks):
+    """Split range(numFrames) into numChunks contiguous (start, stop) pairs."""
+    bounds = np.linspace(0, numFrames, min(numChunks, numFrames) + 1).round().astype(int)
+    return [(int(start), int(stop)) for start, stop in zip(bounds[:-1], bounds[1:])]
+
+def renderMovie(path, setup, numFrames, fps=20, nWorkers=None, chunksPerWorker=1,
+                ffmpeg='ffmpeg', codecArgs=None, progress=True):
+    """
+    Render an animation to a movie file with several processes.
+
+    Parameters
+    ----------
+    path : str
+        Movie file to write, e.g. 'kepler16Animation.mp4'.
+    setup : callable
+        setup() -> (fig, animator). Called once in every worker to build the
+        figure and an animator with init() and update(fnum) methods, such as
+        renderer.TrajectoryAnimator.
+    numFrames : int
+        Number of frames; frames 0 to numFrames-1 are drawn.
+    fps : float
+        Frames per second (FuncAnimation's interval in ms is 1000/fps).
+    nWorkers : int, optional
+        Number of worker processes. Defaults to the number of CPUs.
+    chunksPerWorker : int
+        Chunks per worker; more than one balances the load when some frames
+        take longer to draw than others.
+    ffmpeg : str
+        ffmpeg executable.
+    codecArgs : list of str, optional
+        ffmpeg output options, see ffmpegCommand.
+    progress : bool
+        Write a 'rendered chunk n/N' progress line.
+
+    Example
+    -------
+        def setup():
+            fig, ax = plt.subplots()
+            ax.set(xlim=(-1.3e11, 1.3e11), ylim=(-1.4e11, 1.0e11))
+            return fig, TrajectoryAnimator(ax, positionArray, coordinates=(0, 2))
+
+        renderMovie('movie.mp4', setup, positionArray.shape[-1], fps=20, nWorkers=8)
+    """
+    global _setup
+    assert shutil.which(ffmpeg), '{} not found; it is needed to encode movies'.format(ffmpeg)
+    assert numFrames > 0, 'Nothing to render'
+
+    nWorkers = nWorkers or mp.cpu_count()
+    chunks = frameChunks(numFrames, nWorkers * chunksPerWorker)
+
+    # a single chunk goes straight to the output file
+    if len(chunks) == 1:
+        _setup = setup
+        try:
+            _renderChunk((0, numFrames, path, fps, ffmpeg, codecArgs))
+        finally:
+            _setup = None
+        return
+
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(path))) as tmp:
+        extension = os.path.splitext(path)[1] or '.mp4'
+        jobs = [(start, stop, os.path.join(tmp, 'chunk{:05d}{}'.format(i, extension)),
+                 fps, ffmpeg, codecArgs) for i, (start, stop) in enumerate(chunks)]
+
+        # workers are forked after _setup is set, so it never needs pickling
+        _setup = setup
+        try:
+            with mp.get_context('fork').Pool(min(nWorkers, len(jobs))) as pool:
+                for done, _ in enumerate(pool.imap_unordered(_renderChunk, jobs), 1):
+                    if progress:
+                        sys.stdout.write('\rrendered chunk {}/{}'.format(done, len(jobs)))
+                        sys.stdout.flush()
+        finally:
+            _setup = None
+
+        _concatenate([job[2] for job in jobs], path, ffmpeg)
@@ -0,0 +1,196 @@
+'''Multi-process direct-summation force engine.
+
+Masses, positions and the resulting accelerations live in shared-memory
+blocks that every worker process maps once. On each call the parent copies
+the new positions in, tells each worker which slab of target particles to
+work on, and waits for them to finish: only the slab bounds travel between
+processes, never the arrays themselves.
+
+The workers stay alive between calls, so one engine should be kept for a
+whole run (calculateTrajectories does this for engines it builds by name) and
+closed at the end, e.g. with a ``with`` block. If a worker fails, its
+exception is raised in the parent and the pool is shut down.
+'''
+import multiprocessing as mp
+from multiprocessing import resource_tracker, shared_memory
+import numpy as np
+from .forces import calculateAccelerationsOn, checkSoftening
+
+def _attach(name, shape):
+    """Map an existing shared-memory block as a float array."""
+    block = shared_memory.SharedMemory(name=name)
+    return block, np.ndarray(shape, dtype=float, buffer=block.buf)
+
+def _worker(connection):
+    """
+    Worker loop: wait for a slab, compute its accelerations, report back
+    True, or the exception that stopped it.
+    """
+    blocks = []
+    arrays = {}
+    options = {}
+    while True:
+        message = connection.recv()
+
+        if message is None:
+            break
+
+        try:
+            if message[0] == 'attach':
+                # the old arrays must go before their blocks can be closed
+                arrays.clear()
+                for block in blocks:
+                    block.close()
+
+                _, names, N, options = message
+                blocks = []
+                for key, name, shape in zip(('masses', 'positions', 'accelerations'),
+                                            names, [(N,), (N, 3), (N, 3)]):
+                    block, arrays[key] = _attach(name, shape)
+                    blocks.append(block)
+
+            elif message[0] == 'compute':
+                _, start, stop = message
+                positions = arrays['positions']
+                arrays['accelerations'][start:stop] = calculateAccelerationsOn(
+                    positions[start:stop], arrays['masses'], positions, **options)
+                del positions
+
+        except Exception as error:
+            connection.send(error)
+        else:
+            connection.send(True)
+
+    arrays.clear()
+    for block in blocks:
+        block.close()
+
+class ProcessPoolEngine:
+    """
+    Direct-summation force engine spread over a pool of worker processes.
+
+    Parameters
+    ----------
+    nWorkers : int, optional
+        Number of worker processes. Defaults to the number of CPUs.
+    softening, kernel : float, str
+        Softening length (m) and kernel, see forces.calculateAccelerations.
+
+    Example
+    -------
+        with ProcessPoolEngine(nWorkers=8) as engine:
+            times, positionArray, velocityArray = calculateTrajectories(
+                masses, initPos, initVel, timeEvol, dt, forceEngine=engine)
+    """
+
+    def __init__(self, nWorkers=None, softening=0.0, kernel='plummer'):
+        checkSoftening(softening, kernel)
+        self.nWorkers = nWorkers or mp.cpu_count()
+        self.options = {'softening': softening, 'kernel': kernel}
+        self.N = None
+        self._blocks = []
+        self._connections = []
+        self._processes = []
+
+    def _start(self):
+        # workers must share the parent's resource tracker, otherwise each
+        # starts its own and reports the parent's blocks as leaked
+        resource_tracker.ensure_running()
+
+        for _ in range(self.nWorkers):
+            parentEnd, childEnd = mp.Pipe()
+            process = mp.Process(target=_worker, args=(childEnd,), daemon=True)
+            process.start()
+            self._connections.append(parentEnd)
+            self._processes.append(process)
+
+    def _allocate(self, N):
+        """(Re)create the shared blocks for N particles and attach the workers."""
+        self._freeBlocks()
+
+        try:
+            # kept in self._blocks as they are made, so a failure frees them
+            for size in [N, 3 * N, 3 * N]:
+                self._blocks.append(shared_memory.SharedMemory(create=True, size=8 * size))
+            self.masses = np.ndarray((N,), dtype=float, buffer=self._blocks[0].buf)
+            self.positions = np.ndarray((N, 3), dtype=float, buffer=self._blocks[1].buf)
+            self.accelerations = np.ndarray((N, 3), dtype=float, buffer=self._blocks[2].buf)
+            self.N = N
+
+            names = [block.name for block in self._blocks]
+            self._broadcast([('attach', names, N, self.options)] * self.nWorkers)
+        except BaseException:
+            self.close()
+            raise
+
+        # split the targets into one contiguous slab per worker
+        self._slabs = np.linspace(0, N, self.nWorkers + 1).astype(int)
+
+    def _broadcast(self, messages):
+        """
+        Send one message to each worker and wait for all of them to reply,
+        then raise the first exception a worker sent back.
+        """
+        for connection, message in zip(self._connections, messages):
+            connection.send(message)
+        replies = [connection.recv() for connection in self._connections]
+        for reply in replies:
+            if isinstance(reply, BaseException):
+                raise reply
+
+    def __call__(self, masses, positions):
+        positions = np.asarray(positions, dtype=float)
+        assert positions.ndim == 2 and positions.shape[1] == 3, 'ProcessPoolEngine needs (N, 3) positions'
+
+        try:
+            if not self._processes:
+                self._start()
+            if len(positions) != self.N:
+                self._allocate(len(positions))
+
+            self.masses[:] = masses
+            self.positions[:] = positions
+
+            self._broadcast([('compute', self._slabs[k], self._slabs[k + 1])
+                             for k in range(self.nWorkers)])
+        except BaseException:
+            # a failed call leaves no workers or shared memory behind
+            self.close()
+            raise
+
+        return self.accelerations.copy()
+
+    def _freeBlocks(self):
+        if self._blocks:
+            del self.masses, self.positions, self.accelerations
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+        self.N = None
+
+    def close(self):
+        """Stop the workers and free the shared memory."""
+        for connection in self._connections:
+            try:
+                connection.send(None)
+            except OSError:
+                # the worker has already gone
+                pass
+        for process in self._processes:
+            process.join()
+        self._connections = []
+        self._processes = []
+        self._freeBlocks()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
@@ -0,0 +1,148 @@
+'''Particle-mesh (PM) force engine.
+
+Masses are spread onto a regular grid with cloud-in-cell (CIC) weights, the
+potential is found by convolving that mass grid with the gravitational Green's
+function using FFTs, and the accelerations are differenced on the grid and
+interpolated back to the particles with the same CIC weights.
+
+The grid is zero-padded to twice its size before the convolution, so the
+potential is that of an isolated system rather than of a periodic lattice of
+copies of it.
+
+Cost per step is O(N + n**3 log n) for an n**3 grid, against O(N**2) for
+direct summation. Forces are smoothed on the scale of a grid cell, so this
+suits large, roughly uniform distributions rather than close binaries.
+'''
+import numpy as np
+from .forces import G
+
+class ParticleMesh:
+    """
+    Particle-mesh force engine, usable anywhere calculateAccelerations is.
+
+    Parameters
+    ----------
+    gridSize : int
+        Number of grid points per side (n). The FFTs run on a (2n)**3 grid.
+    boxSize : float, optional
+        Side length of the (cubic) grid, in m. By default the grid is fitted
+        around the particles on every call.
+    center : (3,) array, optional
+        Center of the grid when boxSize is given, in m. Defaults to the
+        origin.
+
+    Example
+    -------
+        engine = ParticleMesh(gridSize=128)
+        accelerations = engine(masses, positions)
+    """
+
+    def __init__(self, gridSize=64, boxSize=None, center=(0.0, 0.0, 0.0)):
+        assert gridSize >= 4, 'gridSize must be at least 4'
+        self.gridSize = gridSize
+        self.boxSize = boxSize
+        self.center = np.asarray(center, dtype=float)
+
+        # FFT of the Green's function for a unit cell; -G/r scales as
+        # 1/cellSize, so it serves every cell size (and a grid fitted anew
+        # on every call)
+        self._greenTransform = None
+
+    def _grid(self, positions):
+        """Lower corner and cell size of the grid for these positions."""
+        n = self.gridSize
+        if self.boxSize is not None:
+            cellSize = self.boxSize / (n - 2)
+            corner = self.center - 0.5 * self.boxSize - 0.5 * cellSize
+            return corner, cellSize
+
+        # leave half a cell free on each side, so every CIC stencil (which
+        # reaches one grid point up from the particle's cell) fits
+        low = positions.min(axis=0)
+        extent = np.max(positions.max(axis=0) - low)
+        cellSize = extent / (n - 2) if extent > 0 else 1.0
+        corner = low - 0.5 * cellSize
+        return corner, cellSize
+
+    def _green(self):
+        """
+        FFT of -G/r sampled on the padded (2n)**3 grid, with r in cells
+        (divide by the cell size for the Green's function in m).
+        """
+        if self._greenTransform is not None:
+            return self._greenTransform
+
+        n2 = 2 * self.gridSize
+        # distances wrap around, so the second half of each axis holds
+        # negative separations
+        index = np.arange(n2)
+        offset = np.minimum(index, n2 - index).astype(float)
+        r = np.sqrt(offset[:, None, None]**2 + offset[None, :, None]**2 + offset[None, None, :]**2)
+
+        # the r = 0 term only adds a constant to each particle's own
+        # potential; give it the value one cell away rather than infinity
+        r[0, 0, 0] = 1.0
+
+        self._greenTransform = np.fft.rfftn(-G / r)
+        return self._greenTransform
+
+    def _cloudInCell(self, positions, corner, cellSize):
+        """Flat grid indices and weights of the 8 points around each particle."""
+        n = self.gridSize
+        u = (positions - corner) / cellSize
+        assert np.all(u >= 0) and np.all(u < n - 1), 'Particles fall outside the PM grid'
+
+        lower = np.floor(u).astype(np.int64)
+        fraction = u - lower
+
+        indices = []
+        weights = []
+        for dx in (0, 1):
+            for dy in (0, 1):
+                for dz in (0, 1):
+                    index = ((lower[:, 0] + dx) * n + (lower[:, 1] + dy)) * n + (lower[:, 2] + dz)
+                    weight = (np.where(dx, fraction[:, 0], 1 - fraction[:, 0]) *
+                              np.where(dy, fraction[:, 1], 1 - fraction[:, 1]) *
+                              np.where(dz, fraction[:, 2], 1 - fraction[:, 2]))
+                    indices.append(index)
+                    weights.append(weight)
+
+        return np.array(indices), np.array(weights)
+
+    def potentialGrid(self, masses, positions):
+        """
+        Gravitational potential on the grid, in J/kg, along with the grid's
+        lower corner, cell size and the particles' CIC stencils.
+        """
+        masses = np.asarray(masses, dtype=float)
+        positions = np.asarray(positions, dtype=float)
+        assert positions.ndim == 2 and positions.shape[1] == 3, 'ParticleMesh needs (N, 3) positions'
+
+        n = self.gridSize
+        corner, cellSize = self._grid(positions)
+        indices, weights = self._cloudInCell(positions, corner, cellSize)
+
+        # assign mass to the grid
+        massGrid = np.bincount(indices.ravel(), weights=(weights * masses).ravel(),
+                               minlength=n**3).reshape(n, n, n)
+
+        # convolve with the Green's function on the zero-padded grid
+        padded = np.zeros((2 * n, 2 * n, 2 * n))
+        padded[:n, :n, :n] = massGrid
+        potential = np.fft.irfftn(np.fft.rfftn(padded) * self._green(), s=padded.shape,
+                                 axes=(0, 1, 2)) / cellSize
+
+        return potential[:n, :n, :n], corner, cellSize, indices, weights
+
+    def __call__(self, masses, positions):
+        potential, corner, cellSize, indices, weights = self.potentialGrid(masses, positions)
+
+        # g = -grad(phi), by central differences on the grid
+        gradient = np.gradient(potential, cellSize)
+
+        # interpolate back to the particles with the same CIC weights
+        accelerations = np.empty((len(weights[0]), 3))
+        for k in range(3):
+            accelerations[:, k] = -np.sum(gradient[k].ravel()[indices] * weights, axis=0)
+
+        return accelerations
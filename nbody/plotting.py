@@ -0,0 +1,161 @@
+'''Plotting long trajectories at screen resolution.
+
+A line with more vertices than the axes has pixels looks no different from
+one with a few per pixel, but costs far more to draw and save. The helpers
+here choose a subset of samples that draws the same picture to within a
+pixel:
+
+minMaxDecimate
+    for series against a monotonic x (e.g. time): in every pixel column keep
+    the first and last sample and the smallest and largest y, so every spike
+    survives and at most 4 samples per column are drawn, however many there
+    were.
+
+pixelDecimate
+    for paths (e.g. an orbit in the x-y plane): keep a sample only where the
+    path enters or leaves a pixel, so the vertex count follows the length of
+    the path on screen, not the number of time steps.
+
+plotTrajectory picks between the two and plots on existing axes; it works on
+any slice of the (N, M, numTimeSteps) arrays calculateTrajectories returns,
+including memory-mapped ones. Nothing here imports matplotlib.
+'''
+import numpy as np
+
+def minMaxDecimate(x, y, numColumns, xlim=None):
+    """
+    Indices of the samples to draw for a series with monotonic x.
+
+    Parameters
+    ----------
+    x, y : (T,) arrays
+        Samples; x must be non-decreasing (e.g. times).
+    numColumns : int
+        Number of pixel columns across xlim.
+    xlim : tuple, optional
+        x range the columns span; the range of x by default. Samples outside
+        it are pooled into the edge columns.
+
+    Returns
+    -------
+    indices : (K,) int array
+        Sorted indices, at most 4 per column.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    T = len(x)
+    if T <= 4 * numColumns:
+        return np.arange(T)
+
+    x0, x1 = (x[0], x[-1]) if xlim is None else xlim
+    width = (x1 - x0) or 1.0
+    columns = np.clip(((x - x0) / width * numColumns).astype(np.int64), 0, numColumns - 1)
+
+    # x is sorted, so each column is one run of consecutive samples
+    starts = np.flatnonzero(np.diff(columns, prepend=-1))
+    counts = np.diff(np.append(starts, T))
+    runs = np.repeat(np.arange(len(starts)), counts)
+
+    keep = [starts, starts + counts - 1]
+    for reduce in (np.fmin, np.fmax):
+        extreme = np.repeat(reduce.reduceat(y, starts), counts)
+        hits = np.flatnonzero(y == extreme)
+        _, first = np.unique(runs[hits], return_index=True)
+        keep.append(hits[first])
+
+    return np.unique(np.concatenate(keep))
+
+def pixelDecimate(x, y, xPixel, yPixel):
+    """
+    Indices of the samples to draw for a path.
+
+    Parameters
+    ----------
+    x, y : (T,) arrays
+        Points along the path, in order.
+    xPixel, yPixel : float
+        Size of a pixel in data units.
+
+    Returns
+    -------
+    indices : (K,) int array
+        Sorted indices: the first and last point and every point where the
+        path enters or leaves a pixel.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    T = len(x)
+    if T <= 2:
+        return np.arange(T)
+
+    cellX = np.floor((x - np.nanmin(x)) / xPixel)
+    cellY = np.floor((y - np.nanmin(y)) / yPixel)
+    moved = (cellX[1:] != cellX[:-1]) | (cellY[1:] != cellY[:-1])
+
+    keep = np.zeros(T, dtype=bool)
+    keep[[0, -1]] = True
+    keep[1:] |= moved   # entering a pixel
+    keep[:-1] |= moved  # leaving one
+    return np.flatnonzero(keep)
+
+def _span(ax, values, axis):
+    """Data range the axes will show along one axis."""
+    low, high = np.nanmin(values), np.nanmax(values)
+
+    autoscale = ax.get_autoscalex_on() if axis == 'x' else ax.get_autoscaley_on()
+    if not autoscale:
+        low, high = ax.get_xlim() if axis == 'x' else ax.get_ylim()
+    elif ax.has_data():
+        # the view will also hold what is already plotted
+        interval = ax.dataLim.intervalx if axis == 'x' else ax.dataLim.intervaly
+        low, high = min(low, interval[0]), max(high, interval[1])
+
+    return abs(high - low) or 1.0
+
+def decimatedIndices(ax, x, y, oversample=2):
+    """
+    Indices of the samples of x, y worth drawing on ax.
+
+    Uses minMaxDecimate when x is non-decreasing, pixelDecimate otherwise,
+    with the pixel size taken from the axes' size on the figure and the data
+    range it will show. oversample divides the pixel size, leaving room for
+    the view to shrink a little afterwards (e.g. tight_layout).
+    """
+    bbox = ax.get_window_extent()
+    width = max(int(bbox.width * oversample), 1)
+    height = max(int(bbox.height * oversample), 1)
+
+    if len(x) > 1 and np.all(np.diff(x) >= 0):
+        xlim = None if ax.get_autoscalex_on() else ax.get_xlim()
+        return minMaxDecimate(x, y, width, xlim)
+
+    return pixelDecimate(x, y, _span(ax, x, 'x') / width, _span(ax, y, 'y') / height)
+
+def plotTrajectory(ax, x, y, *args, oversample=2, **kwargs):
+    """
+    ax.plot(x, y, ...) with only the samples that make a visible difference.
+
+    Parameters
+    ----------
+    ax : matplotlib axes
+    x, y : (T,) arrays
+        e.g. times and positionArray[1,0,:], or positionArray[1,0,:] and
+        positionArray[1,1,:].
+    oversample : float
+        Samples kept per pixel along each axis.
+    *args, **kwargs
+        Passed on to ax.plot.
+
+    Returns
+    -------
+    lines : list of Line2D
+        What ax.plot returned.
+
+    Example
+    -------
+        fig, ax = plt.subplots()
+        plotTrajectory(ax, times, positionArray[1,0,:], label='Earth')
+        plotTrajectory(ax, positionArray[1,0,:], positionArray[1,1,:], c='blue')
+    """
+    indices = decimatedIndices(ax, x, y, oversample)
+    return ax.plot(np.asarray(x)[indices], np.asarray(y)[indices], *args, **kwargs)
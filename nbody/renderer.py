@@ -0,0 +1,203 @@
+'''Incremental trajectory animation.
+
+Clearing the axes and replotting every particle's whole history on every
+frame makes frame n cost O(n), and a whole movie O(frames**2). The animator
+here creates its artists (particle markers, one trail line per particle,
+velocity arrows and a label) once, and on each frame only hands them new
+data with set_data / set_offsets. Trails can be limited to the last few
+samples, so a frame costs the same however long the run, and on 2D axes the
+animation can be blitted, so only the artists are redrawn, not the axes.
+'''
+import sys
+import numpy as np
+
+class TrajectoryAnimator:
+    """
+    Animate particle trajectories on an existing matplotlib axes.
+
+    Parameters
+    ----------
+    ax : matplotlib axes
+        2D axes, or 3D axes (projection='3d') if three coordinates are
+        plotted. Set limits, labels etc. on it beforehand; they are kept.
+    positionArray : numpy array
+        (N, M, numTimeSteps) positions, as returned by calculateTrajectories.
+    velocityArray : numpy array, optional
+        (N, M, numTimeSteps) velocities; draws velocity arrows if given.
+    coordinates : tuple of int
+        Which coordinates to plot, e.g. (0, 2) for the x-z plane or
+        (0, 1, 2) on 3D axes.
+    colors : color or list of colors, optional
+        One color for everything, or one per particle.
+    sizes : float or array, optional
+        Marker sizes.
+    trailLength : int, optional
+        Number of past samples to draw in each trail; all of them if None.
+    label : str, optional
+        Format string for a per-frame label, filled with labelValues[fnum],
+        e.g. 'X-Z Plane: {} Days'. It replaces the axes title, or is drawn
+        inside the axes when blitting (the title is outside the blitted area).
+    labelValues : array, optional
+        Value to show in the label for each frame; the frame number if None.
+    progress : bool
+        Write a 'drawing frame n/N' progress line.
+    onFrame : callable, optional
+        Called as onFrame(fnum) on every frame, e.g. to rotate a 3D view.
+
+    Example
+    -------
+        fig, ax = plt.subplots()
+        ax.set(xlim=(-1.3e11, 1.3e11), ylim=(-1.4e11, 1.0e11))
+        animator = TrajectoryAnimator(ax, positionArray, velocityArray,
+                                      coordinates=(0, 2), trailLength=200)
+        anim = animator.animation(fig, interval=50, blit=True)
+        anim.save('movie.mp4')
+    """
+
+    def __init__(self, ax, positionArray, velocityArray=None, coordinates=(0, 1),
+                 colors=None, sizes=None, trailLength=None, label=None,
+                 labelValues=None, progress=True, onFrame=None):
+        self.ax = ax
+        self.positionArray = positionArray
+        self.velocityArray = velocityArray
+        self.coordinates = tuple(coordinates)
+        self.is3d = len(self.coordinates) == 3
+        self.trailLength = trailLength
+        self.labelFormat = label
+        self.labelValues = labelValues
+        self.progress = progress
+        self.onFrame = onFrame
+        self.numFrames = positionArray.shape[-1]
+
+        N = positionArray.shape[0]
+        if colors is None or isinstance(colors, str):
+            self.colors = [colors or 'C0'] * N
+        else:
+            self.colors = list(colors)
+        self.sizes = sizes
+
+        self._artistsCreated = False
+        self._blit = False
+
+    def _coords(self, array, fnum):
+        """Plotted coordinates of every particle at one frame."""
+        return [array[:, c, fnum] for c in self.coordinates]
+
+    def _createArtists(self):
+        ax = self.ax
+        start = self._coords(self.positionArray, 0)
+
+        # scatter3D rejects s=None, so only pass sizes that were given
+        style = {'c': self.colors}
+        if self.sizes is not None:
+            style['s'] = self.sizes
+
+        if self.is3d:
+            self.markers = ax.scatter3D(*start, depthshade=False, **style)
+            self.trails = [ax.plot3D([], [], [], color=color, lw=1)[0] for color in self.colors]
+        else:
+            self.markers = ax.scatter(*start, marker='o', **style)
+            self.trails = [ax.plot([], [], c=color)[0] for color in self.colors]
+
+        self.arrows = None
+        if self.velocityArray is not None and not self.is3d:
+            self.arrows = ax.quiver(*start, *self._coords(self.velocityArray, 0), color=self.colors)
+
+        if self.labelFormat is None:
+            self.label = None
+        elif self._blit:
+            self.label = ax.text(0.5, 0.98, '', transform=ax.transAxes, ha='center', va='top')
+        else:
+            self.label = ax.title
+
+        self._artistsCreated = True
+
+    def artists(self):
+        """Every artist the animator updates."""
+        artists = [self.markers] + self.trails
+        if self.arrows is not None:
+            artists.append(self.arrows)
+        if self.label is not None:
+            artists.append(self.label)
+        return artists
+
+    def init(self):
+        """FuncAnimation init_func: create the artists (once)."""
+        if not self._artistsCreated:
+            self._createArtists()
+        return self.artists()
+
+    def update(self, fnum):
+        """Draw frame fnum by updating the existing artists."""
+        if not self._artistsCreated:
+            self._createArtists()
+
+        if self.progress:
+            sys.stdout.write('\rdrawing frame {}/{}'.format(fnum, self.numFrames - 1))
+            sys.stdout.flush()
+
+        if self.onFrame is not None:
+            self.onFrame(fnum)
+
+        now = self._coords(self.positionArray, fnum)
+
+        # markers
+        if self.is3d:
+            self.markers._offsets3d = tuple(now)
+        else:
+            self.markers.set_offsets(np.column_stack(now))
+
+        # trails, cut to the last trailLength samples
+        first = 0 if self.trailLength is None else max(0, fnum - self.trailLength)
+        history = self.positionArray[:, self.coordinates, first:fnum + 1]
+        for trail, particle in zip(self.trails, history):
+            if self.is3d:
+                trail.set_data_3d(*particle)
+            else:
+                trail.set_data(*particle)
+
+        # velocity arrows
+        if self.velocityArray is not None:
+            velocities = self._coords(self.velocityArray, fnum)
+            if self.is3d:
+                # 3D arrows cannot be moved, so replace the one artist
+                if self.arrows is not None:
+                    self.arrows.remove()
+                self.arrows = self.ax.quiver3D(*now, *velocities)
+            else:
+                self.arrows.set_offsets(np.column_stack(now))
+                self.arrows.set_UVC(*velocities)
+
+        if self.label is not None:
+            value = fnum if self.labelValues is None else self.labelValues[fnum]
+            self.label.set_text(self.labelFormat.format(value))
+
+        return self.artists()
+
+    def animation(self, fig, frames=None, interval=50, blit=None):
+        """
+        Build the FuncAnimation.
+
+        Parameters
+        ----------
+        fig : matplotlib figure
+        frames : int or iterable, optional
+            Frames to draw; all of them by default.
+        interval : int
+            Delay between frames, in ms.
+        blit : bool, optional
+            Only redraw the artists. On by default for 2D axes; not
+            available for 3D axes (arrows are replaced and views may move).
+        """
+        from matplotlib.animation import FuncAnimation
+
+        if blit is None:
+            blit = not self.is3d
+        assert not (blit and self.is3d), 'Blitting is not supported on 3D axes'
+        self._blit = blit
+
+        if frames is None:
+            frames = self.numFrames
+
+        return FuncAnimation(fig, self.update, frames=frames, init_func=self.init,
+                             interval=interval, blit=blit)
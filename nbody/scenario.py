@@ -0,0 +1,337 @@
+'''Scenario files: a run described as data instead of as a script.
+
+A scenario is a JSON object
+
+    {
+     "name": "kepler16",
+     "initialConditions": "../Data/kepler16.txt",
+     "units": {"time": "day"},
+     "dt": 0.5,
+     "duration": 500,
+     "integrator": "leapfrog",
+     "outputs": ["trajectory", "summary"]
+    }
+
+with the keys
+
+    name                unique name; also the job's output directory
+    initialConditions   text or snapshot file (see snapshot), relative to
+                        the scenario file; always in SI units
+    particles           instead of a file: {"masses": [...], "positions":
+                        [[x, y, z], ...], "velocities": [...]} in the
+                        scenario's units
+    units               units of particles, dt and duration, by kind (mass,
+                        length, velocity, time), from UNITS; SI by default
+    dt, duration        time step and run length (duration is timeEvol)
+    integrator          name in integrators.integrators, with
+    integratorOptions   a dict of extra arguments
+    forceEngine         name in forces.forceEngines, with
+    forceOptions        a dict of extra arguments (softening, theta, ...)
+    saveEvery, dtype    as for calculateTrajectories
+    nActive             as for calculateTrajectories: only the first nActive
+                        particles are massive, the rest are test particles
+    outputs             what runScenario writes, from OUTPUTS
+    limits              per-job limits for the batch runner: memory (MB),
+                        cpuTime and wallTime (s)
+
+A scenario file holds one scenario, a list of them, or an object with
+"defaults" (merged into every scenario), "scenarios" and "sweep". A sweep
+maps keys to lists of values and turns every scenario into one scenario per
+combination, named name-key=value-..., so one file can describe a whole
+parameter study:
+
+    {
+     "defaults": {"initialConditions": "../Data/kepler16.txt",
+                  "units": {"time": "day"}, "duration": 500},
+     "scenarios": [{"name": "kepler16"}],
+     "sweep": {"dt": [0.25, 0.5, 1, 2], "integrator": ["leapfrog", "forestruth"]}
+    }
+
+Results are always in SI units, like those of calculateTrajectories.
+'''
+import copy
+import itertools
+import json
+import os
+import numpy as np
+
+from .forces import getForceEngine
+from .main import calculateTrajectories
+from .snapshot import loadInitialConditions, writeSnapshot
+from .telemetry import RunMonitor
+from .diagnostics import Diagnostics
+
+# size of each unit in SI units, by kind (1 au and 1 day as the scripts
+# have always used them)
+UNITS = {
+    'mass': {'kg': 1.0, 'msun': 1.989e30, 'mearth': 5.972e24},
+    'length': {'m': 1.0, 'km': 1e3, 'au': 1.496e11, 'pc': 3.086e16},
+    'velocity': {'m/s': 1.0, 'km/s': 1e3, 'au/day': 1.496e11 / (3600*24)},
+    'time': {'s': 1.0, 'day': 3600*24.0, 'yr': 365.25 * 3600*24},
+}
+
+# what runScenario can write into a job's directory
+OUTPUTS = {
+    'trajectory': 'trajectory',         # every saved snapshot (trajectory.TrajectoryWriter)
+    'final': 'final.snap',              # the last snapshot (snapshot.writeSnapshot)
+    'summary': 'summary.json',          # telemetry.RunMonitor summary
+    'diagnostics': 'diagnostics.npz',   # diagnostics.Diagnostics result
+}
+
+DEFAULTS = {
+    'units': {'mass': 'kg', 'length': 'm', 'velocity': 'm/s', 'time': 's'},
+    'integrator': 'leapfrog',
+    'integratorOptions': None,
+    'forceEngine': 'direct',
+    'forceOptions': {},
+    'saveEvery': 1,
+    'dtype': 'float64',
+    'nActive': None,
+    'outputs': ['trajectory', 'summary'],
+    'limits': {},
+}
+
+LIMITS = ('memory', 'cpuTime', 'wallTime')
+
+# options of calculateTrajectories that cached runs can take: a run served
+# from the cache is not integrated, so there is nothing to write, check or
+# diagnose along the way
+CACHED_OPTIONS = ('returnTrajectory', 'monitor')
+
+def _merge(base, overrides):
+    """base updated with overrides, merging nested dicts one level deep."""
+    merged = copy.deepcopy(base)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = dict(merged[key], **value)
+        else:
+            merged[key] = copy.deepcopy(value)
+    return merged
+
+def _sweepName(values):
+    return '-'.join('{}={}'.format(key, value) for key, value in values.items())
+
+def expandSweep(scenario, sweep):
+    """
+    One scenario per combination of the values in sweep.
+
+    Parameters
+    ----------
+    scenario : dict
+        Scenario to vary.
+    sweep : dict
+        Lists of values by key. Dotted keys reach into dicts, e.g.
+        "forceOptions.softening".
+
+    Returns
+    -------
+    scenarios : list of dict
+    """
+    if not sweep:
+        return [scenario]
+
+    keys = list(sweep)
+    scenarios = []
+    for combination in itertools.product(*(sweep[key] for key in keys)):
+        values = dict(zip(keys, combination))
+        variant = copy.deepcopy(scenario)
+        for key, value in values.items():
+            *parents, last = key.split('.')
+            target = variant
+            for parent in parents:
+                target = target.setdefault(parent, {})
+            target[last] = value
+        variant['name'] = '{}-{}'.format(scenario['name'], _sweepName(values))
+        scenarios.append(variant)
+    return scenarios
+
+def checkScenario(scenario):
+    """Fill in the defaults and check a scenario. Returns the full scenario."""
+    scenario = _merge(DEFAULTS, scenario)
+
+    assert 'name' in scenario, 'Every scenario needs a name'
+    name = scenario['name']
+    assert ('initialConditions' in scenario) != ('particles' in scenario), \
+        'Scenario {!r} needs either initialConditions or particles'.format(name)
+    for key in ('dt', 'duration'):
+        assert key in scenario, 'Scenario {!r} needs {}'.format(name, key)
+    for kind, unit in scenario['units'].items():
+        assert kind in UNITS, 'Unknown unit kind {!r} in scenario {!r}'.format(kind, name)
+        assert unit in UNITS[kind], 'Unknown {} unit {!r}, choose from {}'.format(
+            kind, unit, sorted(UNITS[kind]))
+    for output in scenario['outputs']:
+        assert output in OUTPUTS, 'Unknown output {!r}, choose from {}'.format(
+            output, sorted(OUTPUTS))
+    for limit in scenario['limits']:
+        assert limit in LIMITS, 'Unknown limit {!r}, choose from {}'.format(limit, LIMITS)
+    return scenario
+
+def loadScenarios(path):
+    """
+    Read the scenarios in a scenario file.
+
+    Relative initialConditions paths are made relative to the file.
+
+    Returns
+    -------
+    scenarios : list of dict
+        Complete scenarios (defaults filled in, sweeps expanded).
+    """
+    with open(path) as f:
+        content = json.load(f)
+
+    if isinstance(content, list):
+        content = {'scenarios': content}
+    elif 'scenarios' not in content:
+        content = {'scenarios': [content]}
+
+    directory = os.path.dirname(os.path.abspath(path))
+    scenarios = []
+    for scenario in content['scenarios']:
+        scenario = _merge(content.get('defaults', {}), scenario)
+        if 'initialConditions' in scenario:
+            scenario['initialConditions'] = os.path.join(directory, scenario['initialConditions'])
+        scenarios += [checkScenario(variant)
+                      for variant in expandSweep(scenario, content.get('sweep'))]
+
+    names = [scenario['name'] for scenario in scenarios]
+    assert len(set(names)) == len(names), 'Scenario names in {} are not unique'.format(path)
+    return scenarios
+
+def unitScale(scenario, kind):
+    """Size of the scenario's unit of this kind, in SI units."""
+    return UNITS[kind][scenario['units'].get(kind, DEFAULTS['units'][kind])]
+
+def initialConditions(scenario):
+    """
+    Masses (kg), positions (m) and velocities (m/s) of a scenario.
+    """
+    if 'initialConditions' in scenario:
+        return loadInitialConditions(scenario['initialConditions'])
+
+    particles = scenario['particles']
+    masses = np.array(particles['masses'], dtype=float) * unitScale(scenario, 'mass')
+    positions = np.array(particles['positions'], dtype=float) * unitScale(scenario, 'length')
+    velocities = np.array(particles['velocities'], dtype=float) * unitScale(scenario, 'velocity')
+    return masses, positions, velocities
+
+def simulate(scenario, cache=None, **options):
+    """
+    Run a scenario with calculateTrajectories.
+
+    Parameters
+    ----------
+    scenario : dict or str
+        Scenario, or a file holding exactly one.
+    cache : cache.ResultCache or str, optional
+        Cache to take the result from if this run (or a longer one) was
+        made before, or a directory to keep one in.
+    **options
+        Passed to calculateTrajectories (output, monitor, diagnostics, ...);
+        with a cache only CACHED_OPTIONS.
+
+    Returns
+    -------
+    times, positionArray, velocityArray as calculateTrajectories returns
+    them, in SI units.
+
+    Example
+    -------
+        times, positionArray, velocityArray = simulate('Scenarios/kepler16.json')
+    """
+    if isinstance(scenario, str):
+        scenarios = loadScenarios(scenario)
+        assert len(scenarios) == 1, '{} holds {} scenarios'.format(scenario, len(scenarios))
+        scenario = scenarios[0]
+    else:
+        scenario = checkScenario(scenario)
+
+    masses, initPos, initVel = initialConditions(scenario)
+    timeScale = unitScale(scenario, 'time')
+    timeEvol = scenario['duration'] * timeScale
+    dt = scenario['dt'] * timeScale
+
+    if cache is not None:
+        unsupported = sorted(set(options) - set(CACHED_OPTIONS))
+        assert not unsupported, 'Cached runs only take {}, not {}'.format(
+            ', '.join(CACHED_OPTIONS), ', '.join(unsupported))
+        from .cache import ResultCache
+        if isinstance(cache, str):
+            cache = ResultCache(cache)
+        return cache.calculateTrajectories(masses, initPos, initVel, timeEvol, dt,
+                                           scenario['forceEngine'], scenario['forceOptions'],
+                                           scenario['integrator'], scenario['integratorOptions'],
+                                           scenario['saveEvery'], np.dtype(scenario['dtype']),
+                                           nActive=scenario['nActive'], **options)
+
+    # the engine is built here so it can take options, and so closed here
+    engine = getForceEngine(scenario['forceEngine'], **scenario['forceOptions'])
+    try:
+        return calculateTrajectories(masses, initPos, initVel, timeEvol, dt, engine,
+                                     integrator=scenario['integrator'],
+                                     integratorOptions=scenario['integratorOptions'],
+                                     saveEvery=scenario['saveEvery'],
+                                     dtype=np.dtype(scenario['dtype']),
+                                     nActive=scenario['nActive'], **options)
+    finally:
+        if hasattr(engine, 'close'):
+            engine.close()
+
+class _LastSnapshot:
+    """Sink that keeps only the last snapshot, for runs without a trajectory."""
+
+    def __init__(self):
+        self.count = 0
+        self.snapshot = None
+
+    def append(self, time, positions, velocities):
+        self.snapshot = (time, positions, velocities)
+        self.count += 1
+
+    def close(self):
+        pass
+
+    def result(self):
+        time, positions, velocities = self.snapshot
+        return (np.array([time]), positions[..., np.newaxis], velocities[..., np.newaxis])
+
+def runScenario(scenario, directory):
+    """
+    Run a scenario and write its outputs into a directory.
+
+    Parameters
+    ----------
+    scenario : dict
+        Complete scenario (see checkScenario).
+    directory : str
+        Where the outputs go (created if needed), named as in OUTPUTS.
+
+    Returns
+    -------
+    summary : dict
+        The RunMonitor summary of the run.
+    """
+    os.makedirs(directory, exist_ok=True)
+    outputs = scenario['outputs']
+
+    monitor = RunMonitor(progress=False)
+    if 'summary' in outputs:
+        monitor.summaryFile = os.path.join(directory, OUTPUTS['summary'])
+    diagnostics = Diagnostics() if 'diagnostics' in outputs else None
+
+    if 'trajectory' in outputs:
+        output = os.path.join(directory, OUTPUTS['trajectory'])
+    else:
+        output = _LastSnapshot()
+
+    times, positionArray, velocityArray = simulate(scenario, output=output, monitor=monitor,
+                                                   diagnostics=diagnostics)
+
+    if 'final' in outputs:
+        writeSnapshot(os.path.join(directory, OUTPUTS['final']), initialConditions(scenario)[0],
+                      positionArray[..., -1], velocityArray[..., -1], time=float(times[-1]),
+                      scenario=scenario['name'])
+    if diagnostics is not None:
+        np.savez(os.path.join(directory, OUTPUTS['diagnostics']), **diagnostics.result())
+
+    return monitor.summary
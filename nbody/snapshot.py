@@ -0,0 +1,266 @@
+'''Initial-condition and snapshot files.
+
+The text files in Data/ have one particle per line,
+
+    mass (kg)  x (m)  y (m)  z (m)  vx (m/s)  vy (m/s)  vz (m/s)
+
+which is easy to write by hand but slow to parse for large particle sets.
+The binary snapshot format here is self-describing and memory-mappable:
+
+    8 bytes     magic, b'NBODYSNP'
+    8 bytes     length of the JSON header, little-endian uint64
+    header      JSON: number of particles, time, units, free-form metadata
+                and, for every field, its dtype, shape and byte offset
+    fields      raw little-endian arrays (masses, positions, velocities),
+                each starting on a 64-byte boundary
+
+Opening a snapshot reads only the header; the arrays are memory-mapped, so
+even million-particle files open in milliseconds and pages are only read
+when used. Fields are written a chunk of particles at a time, and text files
+are parsed a chunk of lines at a time, so converting a large text file never
+holds more than one chunk of it in memory.
+
+loadInitialConditions reads either format, telling them apart by the magic
+bytes, and works out N from the file, so scenario scripts no longer need to
+hard-code array shapes.
+'''
+import json
+import numpy as np
+
+MAGIC = b'NBODYSNP'
+ALIGNMENT = 64
+VERSION = 1
+
+# the text files and calculateTrajectories all work in SI units
+SI_UNITS = {'mass': 'kg', 'length': 'm', 'velocity': 'm/s', 'time': 's'}
+
+# particles written per chunk
+CHUNK_SIZE = 1 << 16
+
+class Snapshot:
+    """
+    Particles at one moment, as read by readSnapshot.
+
+    Attributes
+    ----------
+    masses : (N,) numpy array
+    positions, velocities : (N, 3) numpy arrays
+    time : float
+    units : dict
+        Units of mass, length, velocity and time.
+    metadata : dict
+        Anything else stored in the header.
+    """
+
+    def __init__(self, masses, positions, velocities, time=0.0, units=None, metadata=None):
+        self.masses = masses
+        self.positions = positions
+        self.velocities = velocities
+        self.time = time
+        self.units = dict(units or SI_UNITS)
+        self.metadata = dict(metadata or {})
+
+    def __len__(self):
+        return len(self.masses)
+
+def _align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+def writeSnapshot(path, masses, positions, velocities, time=0.0, units=None, **metadata):
+    """
+    Write particles to a binary snapshot file.
+
+    Parameters
+    ----------
+    path : str
+        File to write.
+    masses : (N,) array
+        Particle masses.
+    positions, velocities : (N, M) arrays
+        Particle positions and velocities.
+    time : float
+        Time of the snapshot.
+    units : dict, optional
+        Units of the arrays; SI by default.
+    **metadata
+        Extra JSON-serializable entries for the header (e.g. source='...').
+    """
+    fields = {'masses': np.asarray(masses, dtype='<f8'),
+              'positions': np.asarray(positions, dtype='<f8'),
+              'velocities': np.asarray(velocities, dtype='<f8')}
+    N = len(fields['masses'])
+    assert fields['positions'].shape[0] == N and fields['velocities'].shape == fields['positions'].shape, \
+        'masses, positions and velocities must describe the same particles'
+
+    with open(path, 'wb') as f:
+        header = _writeHeader(f, {name: array.shape for name, array in fields.items()},
+                              time, units, metadata)
+
+        for name, array in fields.items():
+            f.seek(header['fields'][name]['offset'])
+            for start in range(0, N, CHUNK_SIZE):
+                f.write(np.ascontiguousarray(array[start:start + CHUNK_SIZE]).tobytes())
+
+def _writeHeader(f, shapes, time, units, metadata):
+    """
+    Write the magic bytes and JSON header for fields of the given shapes to
+    the open file f, and return the header with the field offsets.
+    """
+    header = {'version': VERSION, 'N': shapes['masses'][0], 'time': float(time),
+              'units': dict(units or SI_UNITS), 'metadata': metadata, 'fields': {}}
+
+    # the header holds the field offsets, which depend on the header's own
+    # length; lay the fields out after a generous estimate of it
+    estimate = len(json.dumps(header)) + 200 * len(shapes)
+    offset = _align(len(MAGIC) + 8 + estimate)
+    for name, shape in shapes.items():
+        header['fields'][name] = {'dtype': '<f8', 'shape': shape, 'offset': offset}
+        offset = _align(offset + 8 * int(np.prod(shape)))
+
+    encoded = json.dumps(header).encode()
+    assert len(MAGIC) + 8 + len(encoded) <= header['fields']['masses']['offset']
+
+    f.write(MAGIC)
+    f.write(np.uint64(len(encoded)).astype('<u8').tobytes())
+    f.write(encoded)
+    return header
+
+def readSnapshot(path, mmap=True):
+    """
+    Open a binary snapshot file.
+
+    Parameters
+    ----------
+    path : str
+        File to read.
+    mmap : bool
+        Memory-map the arrays (read-only) instead of reading them into
+        memory.
+
+    Returns
+    -------
+    snapshot : Snapshot
+    """
+    with open(path, 'rb') as f:
+        assert f.read(len(MAGIC)) == MAGIC, '{} is not a snapshot file'.format(path)
+        headerLength = int(np.frombuffer(f.read(8), dtype='<u8')[0])
+        header = json.loads(f.read(headerLength))
+
+    assert header['version'] <= VERSION, 'Snapshot version {} is newer than this reader'.format(header['version'])
+
+    arrays = {}
+    for name, field in header['fields'].items():
+        shape = tuple(field['shape'])
+        if mmap and np.prod(shape) > 0:
+            arrays[name] = np.memmap(path, dtype=field['dtype'], mode='r',
+                                     offset=field['offset'], shape=shape)
+        else:
+            with open(path, 'rb') as f:
+                f.seek(field['offset'])
+                arrays[name] = np.fromfile(f, dtype=field['dtype'],
+                                           count=int(np.prod(shape))).reshape(shape)
+
+    return Snapshot(arrays['masses'], arrays['positions'], arrays['velocities'],
+                    header['time'], header['units'], header['metadata'])
+
+def _textLines(path):
+    """The particle lines of a text file, without comments or blank lines."""
+    with open(path) as f:
+        for line in f:
+            if line.split('#', 1)[0].strip():
+                yield line
+
+def _textChunks(path):
+    """Parse a text file CHUNK_SIZE lines at a time into (n, 7) tables."""
+    lines = []
+    for line in _textLines(path):
+        lines.append(line)
+        if len(lines) == CHUNK_SIZE:
+            yield _parseLines(lines, path)
+            lines = []
+    if lines:
+        yield _parseLines(lines, path)
+
+def _parseLines(lines, path):
+    table = np.loadtxt(lines, ndmin=2)
+    assert table.shape[1] == 7, '{} should have 7 columns: mass, x, y, z, vx, vy, vz'.format(path)
+    return table
+
+def readTextInitialConditions(path):
+    """
+    Read a text initial-condition file (one particle per line: mass, x, y,
+    z, vx, vy, vz; lines starting with # are comments).
+
+    Returns
+    -------
+    masses : (N,) array
+    positions, velocities : (N, 3) arrays
+    """
+    N = sum(1 for _ in _textLines(path))
+    masses, positions, velocities = np.empty(N), np.empty((N, 3)), np.empty((N, 3))
+
+    # fill the arrays a chunk at a time rather than copying them out of one
+    # big table
+    start = 0
+    for table in _textChunks(path):
+        stop = start + len(table)
+        masses[start:stop] = table[:, 0]
+        positions[start:stop] = table[:, 1:4]
+        velocities[start:stop] = table[:, 4:7]
+        start = stop
+    return masses, positions, velocities
+
+def convertText(textPath, snapshotPath, time=0.0):
+    """
+    Convert a text initial-condition file to a binary snapshot file.
+
+    The text is read twice, once to count the particles and once to parse
+    them a chunk at a time, and each chunk is written straight to its place
+    in the snapshot, so the particles are never all in memory at once.
+
+    Example
+    -------
+        convertText('Data/uniformCube.txt', 'Data/uniformCube.snap')
+    """
+    N = sum(1 for _ in _textLines(textPath))
+    shapes = {'masses': (N,), 'positions': (N, 3), 'velocities': (N, 3)}
+
+    with open(snapshotPath, 'wb') as f:
+        header = _writeHeader(f, shapes, time, None, {'source': textPath})
+        offsets = {name: field['offset'] for name, field in header['fields'].items()}
+
+        start = 0
+        for table in _textChunks(textPath):
+            for name, columns, width in (('masses', 0, 1), ('positions', slice(1, 4), 3),
+                                         ('velocities', slice(4, 7), 3)):
+                f.seek(offsets[name] + 8 * width * start)
+                f.write(np.ascontiguousarray(table[:, columns], dtype='<f8').tobytes())
+            start += len(table)
+
+def isSnapshot(path):
+    """True if path is a binary snapshot file (by its magic bytes)."""
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+def loadInitialConditions(path):
+    """
+    Load initial conditions from a text or binary snapshot file, whichever
+    it is. The number of particles comes from the file.
+
+    Returns
+    -------
+    masses : (N,) array
+        Particle masses, in kg.
+    positions, velocities : (N, 3) arrays
+        Positions (m) and velocities (m/s), ready for calculateTrajectories.
+
+    Example
+    -------
+        masses, initPos, initVel = loadInitialConditions('Data/kepler16.txt')
+    """
+    if isSnapshot(path):
+        snapshot = readSnapshot(path)
+        assert snapshot.units == SI_UNITS, '{} is not in SI units'.format(path)
+        return snapshot.masses, snapshot.positions, snapshot.velocities
+
+    return readTextInitialConditions(path)
@@ -0,0 +1,188 @@
+'''Instrumentation of a run: hooks, phase timers, progress and a summary.
+
+calculateTrajectories reports to a RunMonitor while it works:
+
+    step hooks      hook(n, t, stepper) after every step n (at time t)
+    force hooks     hook(masses, positions, accelerations) after every
+                    force evaluation
+    output hooks    hook(n, t, positions, velocities) for every snapshot
+                    that is saved
+    finish hooks    hook(summary) once the run is over
+
+and times where the run spends its time:
+
+    force           in the force engine
+    integrate       in the integrator apart from the forces (drifts, kicks,
+                    time-step levels)
+    output          handing snapshots to the output (memory or disk)
+    checkpoint      writing checkpoints
+
+The summary (wall time per phase, force evaluations, steps per second, ...)
+is a plain dict, optionally also written as JSON for a batch scheduler to
+pick up.
+
+The progress line is only rewritten every progressInterval seconds, not on
+every step, so cheap steps are not slowed down by terminal output.
+'''
+import json
+import sys
+import time
+
+PHASES = ('force', 'integrate', 'output', 'checkpoint')
+HOOKS = ('step', 'force', 'output', 'finish')
+
+class TimedEngine:
+    """
+    Force engine wrapper that times every evaluation and calls the force
+    hooks of a RunMonitor.
+
+    The wrapped engine is kept as .engine.
+    """
+
+    def __init__(self, engine, monitor):
+        self.engine = engine
+        self.monitor = monitor
+        self.calls = 0
+
+    def __call__(self, masses, positions):
+        start = time.perf_counter()
+        accelerations = self.engine(masses, positions)
+        self.monitor.phases['force'] += time.perf_counter() - start
+        self.calls += 1
+
+        for hook in self.monitor.hooks['force']:
+            hook(masses, positions, accelerations)
+        return accelerations
+
+class RunMonitor:
+    """
+    Hooks, timers and progress reporting for calculateTrajectories.
+
+    Parameters
+    ----------
+    progress : bool
+        Write a 'calculating time n/N' progress line.
+    progressInterval : float
+        Seconds between updates of the progress line.
+    stream : file, optional
+        Where the progress line goes; sys.stdout by default.
+    summaryFile : str, optional
+        Write the summary to this file as JSON at the end of the run.
+    **hooks
+        Hooks to add, by kind, e.g. step=myHook or output=[hook1, hook2].
+
+    Attributes
+    ----------
+    phases : dict
+        Seconds spent in each phase (see PHASES) so far.
+    summary : dict
+        Filled in at the end of the run (see finish).
+
+    Example
+    -------
+        def report(n, t, stepper):
+            if n % 1000 == 0:
+                print(n, stepper.positions[1])
+
+        monitor = RunMonitor(step=report, summaryFile='run1.json')
+        calculateTrajectories(masses, initPos, initVel, timeEvol, dt, monitor=monitor)
+        print(monitor.summary['phases'])
+    """
+
+    def __init__(self, progress=True, progressInterval=0.5, stream=None, summaryFile=None,
+                 **hooks):
+        self.progress = progress
+        self.progressInterval = progressInterval
+        self.stream = stream
+        self.summaryFile = summaryFile
+
+        self.hooks = {kind: [] for kind in HOOKS}
+        for kind, functions in hooks.items():
+            for function in (functions if isinstance(functions, (list, tuple)) else [functions]):
+                self.addHook(kind, function)
+
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.engine = None
+        self.summary = None
+
+    def addHook(self, kind, hook):
+        """Call hook on every event of the given kind (see HOOKS)."""
+        assert kind in self.hooks, 'Unknown hook {!r}, choose from {}'.format(kind, HOOKS)
+        self.hooks[kind].append(hook)
+
+    def timeEngine(self, engine):
+        """Wrap a force engine so its evaluations are timed and hooked."""
+        self.engine = TimedEngine(engine, self)
+        return self.engine
+
+    def start(self, firstStep, numSteps):
+        """Reset the timers at the start of a run (or of its resumed part)."""
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.firstStep = firstStep
+        self.numSteps = numSteps
+        self.lastStep = firstStep
+        self.savedCount = 0
+        self.summary = None
+        self._startTime = time.perf_counter()
+        self._lastReport = -float('inf')
+
+    def step(self, n, t, stepper, seconds, forceSeconds):
+        """
+        Record step n, which took seconds in all, forceSeconds of them in
+        the force engine.
+        """
+        self.phases['integrate'] += seconds - forceSeconds
+        self.lastStep = n
+
+        for hook in self.hooks['step']:
+            hook(n, t, stepper)
+
+        if self.progress:
+            now = time.perf_counter()
+            if now - self._lastReport >= self.progressInterval or n == self.numSteps:
+                self._lastReport = now
+                stream = self.stream or sys.stdout
+                stream.write('\rcalculating time {}/{}'.format(n, self.numSteps))
+                stream.flush()
+
+    def output(self, n, t, positions, velocities):
+        """Call the output hooks for a saved snapshot."""
+        self.savedCount += 1
+        for hook in self.hooks['output']:
+            hook(n, t, positions, velocities)
+
+    def finish(self, stepper=None, **info):
+        """
+        Build the summary, write it to summaryFile and call the finish
+        hooks.
+
+        Returns
+        -------
+        summary : dict
+            wallTime, steps, stepsPerSecond, forceEvaluations (engine
+            calls, or the integrator's own count if it computes its forces
+            itself), savedSnapshots, phases (seconds per phase, with
+            'other' for the rest of the wall time), plus info.
+        """
+        wallTime = time.perf_counter() - self._startTime
+        steps = int(self.lastStep - self.firstStep)
+
+        forceEvaluations = self.engine.calls if self.engine is not None else 0
+        if not forceEvaluations and stepper is not None:
+            forceEvaluations = getattr(stepper, 'forceEvaluations', 0)
+
+        phases = dict(self.phases)
+        phases['other'] = max(wallTime - sum(phases.values()), 0.0)
+
+        self.summary = dict(info, wallTime=wallTime, steps=steps,
+                            stepsPerSecond=steps / wallTime if wallTime > 0 else float('inf'),
+                            forceEvaluations=float(forceEvaluations),
+                            savedSnapshots=self.savedCount, phases=phases)
+
+        if self.summaryFile is not None:
+            with open(self.summaryFile, 'w') as f:
+                json.dump(self.summary, f, indent=1)
+
+        for hook in self.hooks['finish']:
+            hook(self.summary)
+        return self.summary
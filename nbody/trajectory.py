@@ -0,0 +1,238 @@
+'''Where calculateTrajectories puts its snapshots.
+
+A sink receives one snapshot at a time through ``append(time, positions,
+velocities)``; ``close()`` finishes it and ``result()`` hands back
+(times, positionArray, velocityArray) with the usual (N, M, numTimeSteps)
+layout.
+
+Trajectory keeps everything in RAM, time-major and optionally as float32.
+TrajectoryWriter streams snapshots to disk as they are produced, so a run
+only ever holds one snapshot in memory; its result is memory-mapped from the
+files rather than read into RAM.
+
+On disk a trajectory is a directory holding
+
+    meta.json       shapes and dtype
+    times.bin       raw float64 times, one entry per snapshot
+                    (the rest are float64 or float32, as meta.json says)
+    positions.bin   raw snapshots, time-major: snapshot n is contiguous
+    velocities.bin  likewise
+'''
+import json
+import os
+import numpy as np
+
+class Trajectory:
+    """
+    Snapshots of a run, stored time-major.
+
+    positions[n] and velocities[n] are the whole system at snapshot n, each
+    one contiguous block of memory, so writing a step or reading a frame
+    touches a single block instead of striding through the whole array.
+    Storage can be float32 to halve memory; times are always float64.
+
+    positionArray and velocityArray give the same data as views with time as
+    the last axis, (N, M, numTimeSteps), which is the layout
+    calculateTrajectories has always returned.
+
+    Parameters
+    ----------
+    times : numpy array
+        Shape (numTimeSteps,) + timeShape.
+    positions, velocities : numpy arrays
+        Shape (numTimeSteps,) + snapshot shape, e.g. (numTimeSteps, N, M).
+
+    Example
+    -------
+        trajectory = calculateTrajectories(masses, initPos, initVel, timeEvol,
+                                           dt, returnTrajectory=True)
+        frame = trajectory.positions[100]         # (N, M), contiguous
+        x = trajectory.positionArray[:, 0, :]     # old (N, M, T) indexing
+    """
+
+    def __init__(self, times, positions, velocities):
+        self.times = times
+        self.positions = positions
+        self.velocities = velocities
+        self.count = len(times)
+
+    @classmethod
+    def empty(cls, shape, numSnapshots, timeShape=(), dtype=np.float64):
+        """Preallocate a trajectory to be filled with append()."""
+        trajectory = cls(np.zeros((numSnapshots,) + tuple(timeShape)),
+                         np.zeros((numSnapshots,) + tuple(shape), dtype=dtype),
+                         np.zeros((numSnapshots,) + tuple(shape), dtype=dtype))
+        trajectory.count = 0
+        return trajectory
+
+    def __len__(self):
+        return len(self.times)
+
+    @property
+    def timeArray(self):
+        """Times with time as the last axis."""
+        return np.moveaxis(self.times, 0, -1)
+
+    @property
+    def positionArray(self):
+        """(N, M, numTimeSteps) view of the positions."""
+        return np.moveaxis(self.positions, 0, -1)
+
+    @property
+    def velocityArray(self):
+        """(N, M, numTimeSteps) view of the velocities."""
+        return np.moveaxis(self.velocities, 0, -1)
+
+    # sink interface, so calculateTrajectories can fill a trajectory
+    def append(self, time, positions, velocities):
+        self.times[self.count] = time
+        self.positions[self.count] = positions
+        self.velocities[self.count] = velocities
+        self.count += 1
+
+    def close(self):
+        pass
+
+    def result(self):
+        return self.timeArray, self.positionArray, self.velocityArray
+
+class TrajectoryWriter:
+    """
+    Stream snapshots to a trajectory directory on disk.
+
+    Parameters
+    ----------
+    path : str
+        Directory to write to (created if needed). Existing trajectory files
+        in it are replaced.
+    shape : tuple
+        Shape of one snapshot of positions, e.g. (N, M) or (B, N, M).
+    timeShape : tuple
+        Shape of one entry of times.
+    dtype : numpy dtype
+        Storage type of positions and velocities, float64 or float32.
+    keep : int, optional
+        Continue an existing trajectory in path instead of replacing it:
+        its first keep snapshots are kept (any after them are dropped) and
+        new ones are appended after them.
+
+    Example
+    -------
+        with TrajectoryWriter('run1', (N, 3)) as writer:
+            for time, pos, vel in iterateTrajectories(...):
+                writer.append(time, pos, vel)
+        times, positionArray, velocityArray = loadTrajectory('run1')
+    """
+
+    def __init__(self, path, shape, timeShape=(), dtype=np.float64, keep=None):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.shape = tuple(shape)
+        self.timeShape = tuple(timeShape)
+        self.count = 0
+
+        names = ('times', 'positions', 'velocities')
+        if keep is None:
+            os.makedirs(path, exist_ok=True)
+            self._writeMeta()
+            self._files = [open(os.path.join(path, name + '.bin'), 'wb') for name in names]
+            return
+
+        # continuing: the existing files must hold the same kind of snapshot
+        existing = readTrajectory(path)
+        assert existing.positions.shape[1:] == self.shape, 'Snapshot shape does not match {}'.format(path)
+        assert existing.positions.dtype == self.dtype, 'Storage dtype does not match {}'.format(path)
+        assert len(existing) >= keep, '{} holds fewer than {} snapshots'.format(path, keep)
+        del existing
+
+        self._files = []
+        for name, itemShape, itemType in zip(names, (self.timeShape, self.shape, self.shape),
+                                             (np.float64, self.dtype, self.dtype)):
+            f = open(os.path.join(path, name + '.bin'), 'r+b')
+            f.truncate(keep * int(np.prod(itemShape)) * np.dtype(itemType).itemsize)
+            f.seek(0, os.SEEK_END)
+            self._files.append(f)
+        self.count = keep
+
+    def _writeMeta(self):
+        meta = {'shape': self.shape, 'timeShape': self.timeShape,
+                'dtype': self.dtype.name, 'layout': 'time-major', 'count': self.count}
+        with open(os.path.join(self.path, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+    def append(self, time, positions, velocities):
+        for f, values, dtype in zip(self._files, (time, positions, velocities),
+                                    (np.float64, self.dtype, self.dtype)):
+            f.write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+        self.count += 1
+
+    def flush(self):
+        for f in self._files:
+            f.flush()
+
+    def close(self):
+        if self._files:
+            for f in self._files:
+                f.close()
+            self._files = []
+            self._writeMeta()
+
+    def result(self):
+        self.close()
+        return readTrajectory(self.path).result()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def readTrajectory(path):
+    """
+    Memory-map a trajectory written by TrajectoryWriter as a Trajectory.
+
+    The arrays are copy-on-write: changing them (e.g. converting units in
+    place) never touches the files.
+    """
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+    shape = tuple(meta['shape'])
+    timeShape = tuple(meta['timeShape'])
+    dtype = np.dtype(meta['dtype'])
+
+    # the number of snapshots comes from the file size, so a run that was
+    # interrupted before close() can still be read
+    snapshotSize = int(np.prod(shape)) * dtype.itemsize
+    count = os.path.getsize(os.path.join(path, 'positions.bin')) // snapshotSize
+
+    arrays = []
+    for name, itemShape, itemType in (('times', timeShape, np.float64),
+                                      ('positions', shape, dtype),
+                                      ('velocities', shape, dtype)):
+        if count == 0:
+            arrays.append(np.zeros((0,) + itemShape, dtype=itemType))
+        else:
+            arrays.append(np.memmap(os.path.join(path, name + '.bin'), dtype=itemType,
+                                    mode='c', shape=(count,) + itemShape))
+
+    return Trajectory(*arrays)
+
+def loadTrajectory(path):
+    """
+    Memory-map a trajectory written by TrajectoryWriter.
+
+    Parameters
+    ----------
+    path : str
+        Trajectory directory.
+
+    Returns
+    -------
+    times : numpy array
+        Snapshot times, shape timeShape + (numTimeSteps,).
+    positionArray, velocityArray : numpy arrays
+        Memory-mapped views with the usual layout, shape + (numTimeSteps,),
+        e.g. (N, M, numTimeSteps). They are copy-on-write: changing them
+        (e.g. converting units in place) never touches the files.
+    """
+    return readTrajectory(path).result()
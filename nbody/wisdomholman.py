@@ -0,0 +1,318 @@
+'''Wisdom-Holman mixed-variable integrator for systems with a central mass.
+
+In a planetary system almost all of the motion is each body's Kepler orbit
+around the central mass, which leap-frog has to follow with many small
+steps. A Wisdom-Holman integrator splits the Hamiltonian instead, in
+democratic heliocentric coordinates (heliocentric positions Q and
+barycentric velocities u, Duncan, Levison & Lee 1998), into
+
+    Kepler          each body's orbit around the central mass, advanced
+                    exactly by a universal-variable Kepler solver
+    interaction     the bodies' pull on each other, applied as kicks
+    jump            the central body's reflex motion, a drift of every Q
+                    by the total momentum over the central mass
+
+and composes them as interaction/2 jump/2 Kepler jump/2 interaction/2. The
+error then scales with the ratio of the other masses to the central one,
+not with the orbital frequencies, so steps of a few percent of the shortest
+orbit (days to weeks for the Solar System) are enough.
+
+The Kepler solver works on all bodies (and systems of a batch) at once. The
+interaction kicks come from the force engine, called on the non-central
+bodies only; the central mass never enters the force evaluation. Like the
+leap-frog stepper the last kick's accelerations are kept for the next step,
+so each step costs one force evaluation of N - 1 bodies.
+
+The integrator is only accurate when one body dominates the mass (e.g. the
+Sun); for comparable masses (the Kepler-16 AB binary) use leap-frog or a
+higher-order composition instead.
+'''
+import math
+import numpy as np
+from .forces import G, getForceEngine
+from .leapfrog import LeapfrogStepper, _batchTimeStep
+
+# below this |psi| the Stumpff functions come from their series, which has no
+# cancellation; 11 terms are exact to double precision up to |psi| = 1
+STUMPFF_SERIES = 1.0
+STUMPFF_TERMS = 11
+
+# series coefficients: c2 = sum (-psi)**k / (2k+2)!, c3 = sum (-psi)**k / (2k+3)!
+_C2 = [1.0 / math.factorial(2*k + 2) for k in range(STUMPFF_TERMS)]
+_C3 = [1.0 / math.factorial(2*k + 3) for k in range(STUMPFF_TERMS)]
+
+# the Kepler solver stops for a body once its update is below this fraction
+# of chi. Near the root the iteration rattles between neighbouring values a
+# few tens of ulp apart, so the tolerance must stay well above eps
+KEPLER_TOLERANCE = 1e-12
+
+# largest -psi the solver may try on a hyperbolic orbit, so an overshoot
+# cannot overflow sinh (and its square in the Laguerre step). A body only
+# gets there after moving e**50 times its semi-major axis away
+HYPERBOLIC_PSI = 50.0**2
+
+def stumpff(psi):
+    """
+    Stumpff functions c2 and c3.
+
+    Parameters
+    ----------
+    psi : numpy array
+        alpha * chi**2 of the universal-variable Kepler equation; positive
+        on elliptic, negative on hyperbolic orbits.
+
+    Returns
+    -------
+    c2, c3 : numpy arrays
+        (1 - cos(sqrt psi)) / psi and (sqrt psi - sin(sqrt psi)) / psi**1.5,
+        continued to psi <= 0.
+    """
+    psi = np.asarray(psi, dtype=float)
+    c2 = np.empty_like(psi)
+    c3 = np.empty_like(psi)
+
+    small = np.abs(psi) < STUMPFF_SERIES
+    # the usual case (steps much shorter than the orbit) needs no masking
+    x = psi if small.all() else psi[small]
+    s2 = np.zeros_like(x)
+    s3 = np.zeros_like(x)
+    for k in range(STUMPFF_TERMS - 1, -1, -1):
+        s2 = _C2[k] - x * s2
+        s3 = _C3[k] - x * s3
+    if small.all():
+        return s2, s3
+    c2[small] = s2
+    c3[small] = s3
+
+    # half-angle forms, free of the cancellation in 1 - cos
+    elliptic = psi >= STUMPFF_SERIES
+    x = psi[elliptic]
+    s = np.sqrt(x)
+    c2[elliptic] = 2 * np.sin(0.5*s)**2 / x
+    c3[elliptic] = (s - np.sin(s)) / (x * s)
+
+    hyperbolic = psi <= -STUMPFF_SERIES
+    x = -psi[hyperbolic]
+    s = np.sqrt(x)
+    c2[hyperbolic] = 2 * np.sinh(0.5*s)**2 / x
+    c3[hyperbolic] = (np.sinh(s) - s) / (x * s)
+
+    return c2, c3
+
+def keplerDrift(positions, velocities, mu, dt, maxIterations=50):
+    """
+    Advance bodies along their Kepler orbits around a fixed mass.
+
+    Solves the universal-variable Kepler equation with Laguerre-Conway
+    iterations, which are robust for elliptic and hyperbolic orbits alike,
+    and moves every body with the f and g functions. Each body stops
+    iterating once its update is below KEPLER_TOLERANCE of its solution.
+
+    Parameters
+    ----------
+    positions, velocities : numpy arrays
+        Shape (..., n, 3): positions (m) and velocities (m/s) relative to
+        the central mass.
+    mu : float or numpy array
+        G times the central mass, in m3/s2; broadcasts against (..., n).
+    dt : float or numpy array
+        Time to advance, in s; broadcasts against (..., n).
+    maxIterations : int
+        Give up (RuntimeError) if some body has not converged by then.
+
+    Returns
+    -------
+    positions, velocities : numpy arrays
+        The bodies dt later, same shape as given.
+    """
+    r0 = np.sqrt(np.sum(positions**2, axis=-1))
+    v2 = np.sum(velocities**2, axis=-1)
+    mu = np.broadcast_to(mu, r0.shape)
+    dt = np.broadcast_to(dt, r0.shape)
+    sqrtMu = np.sqrt(mu)
+    sigma0 = np.sum(positions * velocities, axis=-1) / sqrtMu
+    alpha = 2.0 / r0 - v2 / mu
+    beta = 1.0 - alpha * r0
+    target = sqrtMu * dt
+
+    # a first guess from the current distance is good for steps much
+    # shorter than the orbit, which is what the integrator takes
+    chi = target / r0
+    order = 5
+
+    # on a hyperbolic orbit chi (the first guess or an overshoot) must not
+    # get so large that sinh overflows
+    chiLimit = np.full(chi.shape, np.inf)
+    hyperbolic = alpha < 0
+    chiLimit[hyperbolic] = np.sqrt(HYPERBOLIC_PSI / -alpha[hyperbolic])
+    chi = np.clip(chi, -chiLimit, chiLimit)
+
+    # bodies are iterated on (flat indices into chi) until they converge
+    active = np.arange(chi.size)
+    flat = [a.ravel() for a in (alpha, beta, sigma0, r0, target, chiLimit)]
+    chiFlat = chi.ravel()
+    for _ in range(maxIterations):
+        a, b, s, r, t, limit = (x[active] for x in flat)
+        x = chiFlat[active]
+        psi = a * x**2
+        c2, c3 = stumpff(psi)
+        F = b * x**3 * c3 + s * x**2 * c2 + r * x - t
+        dF = x**2 * c2 + s * x * (1 - psi * c3) + r * (1 - psi * c2)
+        ddF = s * (1 - psi * c2) + b * x * (1 - psi * c3)
+
+        root = np.sqrt(np.abs((order - 1)**2 * dF**2 - order * (order - 1) * F * ddF))
+        delta = order * F / (dF + np.copysign(root, dF))
+        x = np.clip(x - delta, -limit, limit)
+
+        chiFlat[active] = x
+        active = active[np.abs(delta) > KEPLER_TOLERANCE * np.abs(x)]
+        if active.size == 0:
+            break
+    else:
+        raise RuntimeError('Kepler solver did not converge for {} bodies in {} iterations'.format(
+            active.size, maxIterations))
+
+    chi = chiFlat.reshape(r0.shape)
+    psi = alpha * chi**2
+    c2, c3 = stumpff(psi)
+
+    f = 1 - chi**2 * c2 / r0
+    g = dt - chi**3 * c3 / sqrtMu
+    newPositions = f[..., np.newaxis] * positions + g[..., np.newaxis] * velocities
+
+    r = np.sqrt(np.sum(newPositions**2, axis=-1))
+    fDot = sqrtMu * chi * (psi * c3 - 1) / (r * r0)
+    gDot = 1 - chi**2 * c2 / r
+    newVelocities = fDot[..., np.newaxis] * positions + gDot[..., np.newaxis] * velocities
+
+    return newPositions, newVelocities
+
+class WisdomHolmanStepper(LeapfrogStepper):
+    """
+    Wisdom-Holman integrator in democratic heliocentric coordinates.
+
+    Parameters
+    ----------
+    masses : np.ndarray
+        Particle masses, in kg; (N,) or (B, N) for a batch.
+    positions, velocities : np.ndarray
+        (N, 3) or (B, N, 3) starting positions (m) and velocities (m/s),
+        in any inertial frame; the stepper returns them in the same frame.
+    forceEngine : str or callable
+        Force engine for the interaction kicks; it only sees the N - 1
+        non-central bodies.
+    central : int, optional
+        Index of the central body; the most massive one by default (it must
+        be the same for every system of a batch).
+
+    Attributes
+    ----------
+    heliocentric : np.ndarray
+        Positions of the non-central bodies relative to the central one.
+    barycentricVelocities : np.ndarray
+        Their velocities relative to the centre of mass.
+    centerOfMass, centerOfMassVelocity : np.ndarray
+        The centre of mass, which moves in a straight line.
+
+    Example
+    -------
+        stepper = WisdomHolmanStepper(masses, initPos, initVel)
+        for n in range(numSteps):
+            pos, vel = stepper.step(dt)
+
+    or calculateTrajectories(..., integrator='wh').
+    """
+
+    stateAttributes = ('positions', 'velocities', 'heliocentric', 'barycentricVelocities',
+                       'centerOfMass', 'centerOfMassVelocity', 'accelerations',
+                       'forceEvaluations')
+
+    def __init__(self, masses, positions, velocities, forceEngine='direct', central=None):
+        self.masses = np.array(masses, dtype=float)
+        self.positions = np.array(positions, dtype=float)
+        self.velocities = np.array(velocities, dtype=float)
+
+        # make sure the three input arrays have consistent shapes
+        assert self.velocities.shape == self.positions.shape
+        assert self.masses.shape[-1] == self.positions.shape[-2]
+
+        N = self.positions.shape[-2]
+        if central is None:
+            central = np.unique(np.argmax(self.masses, axis=-1))
+            assert len(central) == 1, 'The central body must be the same in every system of a batch'
+            central = int(central[0])
+        self.central = central
+        self.others = np.delete(np.arange(N), central)
+
+        self.forceEngine = getForceEngine(forceEngine)
+
+        # masses broadcast against the positions, for batches with (N,) masses
+        masses = np.broadcast_to(self.masses, self.positions.shape[:-1])
+        self.centralMass = masses[..., central]
+        self.otherMasses = masses[..., self.others]
+        self.totalMass = np.sum(masses, axis=-1)
+        self.mu = G * self.centralMass[..., np.newaxis]
+
+        weights = masses[..., np.newaxis] / self.totalMass[..., np.newaxis, np.newaxis]
+        self.centerOfMass = np.sum(weights * self.positions, axis=-2)
+        self.centerOfMassVelocity = np.sum(weights * self.velocities, axis=-2)
+        self.heliocentric = (self.positions[..., self.others, :]
+                             - self.positions[..., [central], :])
+        self.barycentricVelocities = (self.velocities[..., self.others, :]
+                                      - self.centerOfMassVelocity[..., np.newaxis, :])
+
+        self.accelerations = self._interaction()
+        self.forceEvaluations = 1
+
+    def _interaction(self):
+        """Accelerations of the non-central bodies due to each other."""
+        if len(self.others) < 2:
+            return np.zeros_like(self.heliocentric)
+        # separations are the same in heliocentric coordinates
+        return self.forceEngine(self.otherMasses, self.heliocentric)
+
+    def _jump(self, dt):
+        """Drift every heliocentric position by the central body's reflex motion."""
+        momentum = np.sum(self.otherMasses[..., np.newaxis] * self.barycentricVelocities, axis=-2)
+        self.heliocentric += (momentum / self.centralMass[..., np.newaxis])[..., np.newaxis, :] * dt
+
+    def _inertial(self):
+        """Positions and velocities in the frame the stepper was given."""
+        weights = self.otherMasses[..., np.newaxis] / self.totalMass[..., np.newaxis, np.newaxis]
+        centralPosition = self.centerOfMass - np.sum(weights * self.heliocentric, axis=-2)
+        centralVelocity = self.centerOfMassVelocity - np.sum(
+            self.otherMasses[..., np.newaxis] * self.barycentricVelocities, axis=-2
+        ) / self.centralMass[..., np.newaxis]
+
+        positions = np.empty_like(self.positions)
+        velocities = np.empty_like(self.velocities)
+        positions[..., self.central, :] = centralPosition
+        velocities[..., self.central, :] = centralVelocity
+        positions[..., self.others, :] = centralPosition[..., np.newaxis, :] + self.heliocentric
+        velocities[..., self.others, :] = (self.centerOfMassVelocity[..., np.newaxis, :]
+                                           + self.barycentricVelocities)
+        return positions, velocities
+
+    def step(self, dt):
+        """
+        Advance the particles by dt seconds and return the new positions and
+        velocities (the stepper keeps its own copies). For a batch, dt may be
+        a (B,) array of per-system time steps.
+        """
+        dt = _batchTimeStep(dt)
+        # the Kepler solver works per body, without the coordinate axis
+        keplerDt = dt if np.ndim(dt) == 0 else dt[..., 0]
+
+        self.barycentricVelocities += 0.5 * dt * self.accelerations
+        self._jump(0.5 * dt)
+        self.heliocentric, self.barycentricVelocities = keplerDrift(
+            self.heliocentric, self.barycentricVelocities, self.mu, keplerDt)
+        self._jump(0.5 * dt)
+        self.accelerations = self._interaction()
+        self.forceEvaluations += 1
+        self.barycentricVelocities += 0.5 * dt * self.accelerations
+
+        self.centerOfMass = self.centerOfMass + self.centerOfMassVelocity * (
+            dt if np.ndim(dt) == 0 else dt[..., 0])
+        self.positions, self.velocities = self._inertial()
+        return self.positions, self.velocities
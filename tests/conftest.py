@@ -0,0 +1,27 @@
+'''Shared settings and fixtures for the tests: run them from the repository with
+
+    python -m pytest tests
+
+'''
+import os
+import sys
+
+import pytest
+
+# nothing is installed, so the tests import from the checkout
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DATA = os.path.join(ROOT, 'Data')
+
+from nbody.snapshot import loadInitialConditions
+
+@pytest.fixture
+def dataDir():
+    """The directory of the initial-condition files."""
+    return DATA
+
+@pytest.fixture
+def kepler16():
+    """Masses, positions and velocities of Kepler-16 (Data/kepler16.txt)."""
+    return loadInitialConditions(os.path.join(DATA, 'kepler16.txt'))
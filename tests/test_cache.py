@@ -0,0 +1,97 @@
+import os
+
+import numpy as np
+import pytest
+
+from nbody.cache import ResultCache, cacheKey
+from nbody.main import calculateTrajectories
+
+DAY = 86400.0
+
+def _same(got, want):
+    return all(np.array_equal(g, w) for g, w in zip(got, want))
+
+def test_miss_hit_and_extend_are_bit_identical(kepler16, tmp_path):
+    masses, positions, velocities = kepler16
+    cache = ResultCache(str(tmp_path))
+
+    def run(days, saveEvery=2):
+        return cache.calculateTrajectories(masses, positions, velocities, days * DAY, 0.5 * DAY,
+                                           saveEvery=saveEvery)
+
+    def plain(days, saveEvery=2):
+        return calculateTrajectories(masses, positions, velocities, days * DAY, 0.5 * DAY,
+                                     saveEvery=saveEvery)
+
+    assert _same(run(20), plain(20))
+    assert cache.stats == {'hit': 0, 'extended': 0, 'miss': 1}
+    # the same run, and a shorter one ending on a saved step
+    assert _same(run(20), plain(20))
+    assert _same(run(10), plain(10))
+    assert cache.stats == {'hit': 2, 'extended': 0, 'miss': 1}
+    # a longer one carries on from the cached run
+    assert _same(run(40), plain(40))
+    assert cache.stats == {'hit': 2, 'extended': 1, 'miss': 1}
+    # a shorter one ending between saved steps is computed, not stored
+    assert _same(run(10.5), plain(10.5))
+    assert cache.stats['miss'] == 2
+    assert sum(os.path.isdir(os.path.join(str(tmp_path), name)) for name in os.listdir(str(tmp_path))) == 1
+
+def test_calculate_trajectories_delegates_to_the_cache(kepler16, tmp_path):
+    masses, positions, velocities = kepler16
+    expected = calculateTrajectories(masses, positions, velocities, 10 * DAY, DAY)
+    for _ in range(2):
+        got = calculateTrajectories(masses, positions, velocities, 10 * DAY, DAY,
+                                    cache=str(tmp_path))
+        assert _same(got, expected)
+    with pytest.raises(AssertionError, match='Cached runs cannot take'):
+        calculateTrajectories(masses, positions, velocities, 10 * DAY, DAY, cache=str(tmp_path),
+                              output=str(tmp_path / 'out'))
+
+def test_key_covers_everything_but_the_run_length(kepler16):
+    masses, positions, velocities = kepler16
+    key = cacheKey(masses, positions, velocities, DAY)
+    assert key == cacheKey(masses.copy(), positions.copy(), velocities.copy(), DAY)
+
+    changed = positions.copy()
+    changed[0, 0] *= 1 + 1e-15
+    for other in (cacheKey(masses, changed, velocities, DAY),
+                  cacheKey(masses, positions, velocities, 2 * DAY),
+                  cacheKey(masses, positions, velocities, DAY, integrator='yoshida6'),
+                  cacheKey(masses, positions, velocities, DAY, forceOptions={'softening': 1e6}),
+                  cacheKey(masses, positions, velocities, DAY, saveEvery=2),
+                  cacheKey(masses, positions, velocities, DAY, dtype=np.float32),
+                  cacheKey(masses, positions, velocities, DAY, nActive=2)):
+        assert other != key
+
+def test_least_recently_used_entries_are_evicted(kepler16, tmp_path):
+    masses, positions, velocities = kepler16
+    cache = ResultCache(str(tmp_path))
+
+    def run(entry):
+        # entries of the same size, under different keys
+        return cache.calculateTrajectories(masses, positions, velocities * (1 + 1e-9 * entry),
+                                           20 * DAY, DAY)
+
+    run(0)
+    # room for two entries
+    cache.budget = 2.5 * cache.size()
+    run(1)
+    run(0)   # now entry 1 is the least recently used
+    run(2)
+    assert cache.size() <= cache.budget
+    assert cache.stats == {'hit': 1, 'extended': 0, 'miss': 3}
+
+    run(0)
+    run(2)
+    assert cache.stats['hit'] == 3
+    run(1)
+    assert cache.stats['miss'] == 4
+
+def test_clear(kepler16, tmp_path):
+    masses, positions, velocities = kepler16
+    cache = ResultCache(str(tmp_path))
+    cache.calculateTrajectories(masses, positions, velocities, 5 * DAY, DAY)
+    assert cache.size() > 0
+    cache.clear()
+    assert cache.size() == 0
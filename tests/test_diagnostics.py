@@ -0,0 +1,119 @@
+import numpy as np
+import pytest
+
+from nbody import diagnostics as diagnosticsModule
+from nbody.diagnostics import Diagnostics, EnergyDriftError, conservedQuantities
+from nbody.forces import G, calculateAccelerations
+from nbody.main import calculateTrajectories
+
+DAY = 86400.0
+MSUN = 1.989e30
+AU = 1.496e11
+
+def _parabolic():
+    """Two equal stars on a parabolic encounter, in the centre-of-mass frame: E0 = 0."""
+    masses = np.array([MSUN, MSUN])
+    r = 10 * AU
+    v = np.sqrt(2 * G * masses.sum() / r)
+    positions = np.array([[-r / 2, 0, 0], [r / 2, 0, 0]])
+    velocities = np.array([[v / 4, -v / 4 * np.sqrt(3), 0], [-v / 4, v / 4 * np.sqrt(3), 0]])
+    return masses, positions, velocities
+
+def test_conserved_quantities_by_hand():
+    rng = np.random.default_rng(0)
+    masses = rng.uniform(1e24, 1e26, 10)
+    positions = rng.uniform(-1e11, 1e11, (10, 3))
+    velocities = rng.uniform(-1e3, 1e3, (10, 3))
+    quantities = conservedQuantities(masses, positions, velocities)
+
+    potential = 0.0
+    for i in range(10):
+        for j in range(i):
+            potential -= G * masses[i] * masses[j] / np.linalg.norm(positions[i] - positions[j])
+    kinetic = 0.5 * np.sum(masses * np.sum(velocities**2, axis=1))
+    assert quantities['potential'] == pytest.approx(potential, rel=1e-12)
+    assert quantities['kinetic'] == pytest.approx(kinetic, rel=1e-12)
+    assert quantities['virialRatio'] == pytest.approx(2 * kinetic / -potential, rel=1e-12)
+    assert np.allclose(quantities['momentum'], masses @ velocities, rtol=1e-12)
+    assert np.allclose(quantities['angularMomentum'],
+                       np.sum(np.cross(positions, masses[:, np.newaxis] * velocities), axis=0),
+                       rtol=1e-12)
+
+def test_massless_particles_add_no_potential_energy():
+    rng = np.random.default_rng(1)
+    masses = rng.uniform(1e24, 1e26, 12)
+    masses[8:] = 0.0
+    positions = rng.uniform(-1e11, 1e11, (12, 3))
+    velocities = rng.uniform(-1e3, 1e3, (12, 3))
+    quantities = conservedQuantities(masses, positions, velocities)
+    massive = conservedQuantities(masses[:8], positions[:8], velocities[:8])
+    for name in ('kinetic', 'potential', 'energy'):
+        assert quantities[name] == pytest.approx(massive[name], rel=1e-12)
+
+def test_recorded_quantities_match_a_pass_afterwards(kepler16):
+    masses, positions, velocities = kepler16
+    diagnostics = Diagnostics()
+    _, positionArray, velocityArray = calculateTrajectories(
+        masses, positions, velocities, 20 * DAY, 0.5 * DAY, saveEvery=5, diagnostics=diagnostics)
+    result = diagnostics.result()
+    assert len(result['times']) == positionArray.shape[-1]
+    for n in range(positionArray.shape[-1]):
+        expected = conservedQuantities(masses, positionArray[..., n], velocityArray[..., n])
+        assert result['energy'][n] == pytest.approx(expected['energy'], rel=1e-12)
+    assert result['energyError'][0] == 0
+    # leapfrog's energy error oscillates over the binary's orbit; it does not drift
+    assert np.all(result['energyError'] < 1e-3)
+
+def test_other_engines_fall_back_to_a_direct_pass(kepler16):
+    masses, positions, velocities = kepler16
+    direct, other = Diagnostics(), Diagnostics()
+    calculateTrajectories(masses, positions, velocities, 10 * DAY, 0.5 * DAY,
+                          diagnostics=direct)
+    # the same forces from an engine that cannot give the potential
+    engine = lambda masses, positions: calculateAccelerations(masses, positions)
+    calculateTrajectories(masses, positions, velocities, 10 * DAY, 0.5 * DAY, engine,
+                          diagnostics=other)
+    assert not other.engine.withPotential
+    assert np.allclose(other.result()['energy'], direct.result()['energy'], rtol=1e-12, atol=0)
+
+@pytest.mark.parametrize('integrator', ['leapfrog', 'wh'])
+def test_potential_only_on_recorded_full_passes(kepler16, monkeypatch, integrator):
+    masses, positions, velocities = kepler16
+    potentialPasses = []
+
+    def direct(masses, positions, **options):
+        if options.get('potential'):
+            potentialPasses.append(positions.shape)
+        return calculateAccelerations(masses, positions, **options)
+
+    # the wrapper recognizes the direct engine by identity
+    monkeypatch.setattr(diagnosticsModule, 'calculateAccelerations', direct)
+    diagnostics = Diagnostics()
+    calculateTrajectories(masses, positions, velocities, 20 * DAY, DAY, direct,
+                          integrator=integrator, saveEvery=5, diagnostics=diagnostics)
+    # one pass for t = 0 and each of the four saved steps. The Wisdom-Holman
+    # kicks only see N - 1 bodies, so its snapshots fall back to a direct pass
+    assert len(diagnostics.times) == 5
+    assert potentialPasses == [positions.shape] * 5
+
+def test_zero_energy_gives_a_finite_error():
+    masses, positions, velocities = _parabolic()
+    quantities = conservedQuantities(masses, positions, velocities)
+    assert abs(quantities['energy']) < 1e-12 * quantities['kinetic']
+
+    errors = []
+    for dt in (2 * DAY, DAY):
+        diagnostics = Diagnostics()
+        calculateTrajectories(masses, positions, velocities, 200 * DAY, dt,
+                              saveEvery=10, diagnostics=diagnostics)
+        errors.append(diagnostics.energyError()[-1])
+    assert np.all(np.isfinite(errors))
+    # still a second-order error, relative to the energy scale of the system
+    assert np.log2(errors[0] / errors[1]) == pytest.approx(2, abs=0.3)
+
+def test_energy_drift_stops_the_run(kepler16):
+    masses, positions, velocities = kepler16
+    with pytest.raises(EnergyDriftError, match='exceeds'):
+        # a step far too long for the binary
+        calculateTrajectories(masses, positions, velocities, 200 * DAY, 5 * DAY,
+                              diagnostics=Diagnostics(energyTolerance=1e-6))
@@ -0,0 +1,182 @@
+import numpy as np
+import pytest
+
+from nbody import forces
+from nbody.forces import G, calculateAccelerations, calculateAccelerationsOn, calculateForceVectors, \
+    forceEngines, getForceEngine
+from nbody.encounters import findPairs
+
+def _cube(N, seed=0):
+    rng = np.random.default_rng(seed)
+    masses = rng.uniform(1e24, 1e26, N)
+    positions = rng.uniform(-1e12, 1e12, (N, 3))
+    return masses, positions
+
+def _reference(masses, positions, softening=0.0):
+    """Pair by pair, the way the original loop over particles did it."""
+    accelerations = np.zeros(positions.shape)
+    for i in range(len(masses)):
+        for j in range(len(masses)):
+            if i != j:
+                d = positions[j] - positions[i]
+                accelerations[i] += G * masses[j] * d / (d @ d + softening**2)**1.5
+    return accelerations
+
+def _relativeErrors(accelerations, expected):
+    return np.linalg.norm(accelerations - expected, axis=-1) / np.linalg.norm(expected, axis=-1)
+
+@pytest.mark.parametrize('tileSize', [1, 7, 1024])
+def test_direct_matches_pairwise_sum(tileSize):
+    masses, positions = _cube(50)
+    accelerations = calculateAccelerations(masses, positions, tileSize=tileSize)
+    assert np.allclose(accelerations, _reference(masses, positions), rtol=1e-12, atol=0)
+
+def test_force_vectors_are_mass_times_acceleration():
+    masses, positions = _cube(20)
+    forceVectors = calculateForceVectors(masses, positions)
+    assert np.allclose(forceVectors, masses[:, np.newaxis] * _reference(masses, positions),
+                       rtol=1e-12, atol=0)
+    # Newton's third law: no net force
+    assert np.allclose(forceVectors.sum(axis=0), 0, atol=1e-12 * np.abs(forceVectors).max())
+
+def test_batch_matches_separate_systems():
+    systems = [_cube(30, seed) for seed in range(4)]
+    masses = np.stack([m for m, _ in systems])
+    positions = np.stack([p for _, p in systems])
+    batch = calculateAccelerations(masses, positions)
+    for k, (m, p) in enumerate(systems):
+        assert np.array_equal(batch[k], calculateAccelerations(m, p))
+
+def test_plummer_softening():
+    masses, positions = _cube(30)
+    softening = 1e11
+    accelerations = calculateAccelerations(masses, positions, softening=softening)
+    assert np.allclose(accelerations, _reference(masses, positions, softening),
+                       rtol=1e-12, atol=0)
+
+def test_spline_softening_is_newtonian_beyond_the_kernel():
+    masses = np.array([1e30, 1e24])
+    positions = np.array([[0.0, 0.0, 0.0], [1e11, 0.0, 0.0]])
+    spline = calculateAccelerations(masses, positions, softening=1e9, kernel='spline')
+    assert np.allclose(spline, calculateAccelerations(masses, positions), rtol=1e-12, atol=0)
+
+def test_potential_sums_every_pair():
+    masses, positions = _cube(25)
+    _, potentials = calculateAccelerations(masses, positions, potential=True)
+    separations = np.linalg.norm(positions[:, np.newaxis] - positions[np.newaxis], axis=-1)
+    np.fill_diagonal(separations, np.inf)
+    assert np.allclose(potentials, -G * np.sum(masses / separations, axis=1), rtol=1e-12, atol=0)
+
+def test_accelerations_on_other_targets():
+    masses, positions = _cube(40)
+    # the sources themselves as targets: the same as the all-pairs kernel
+    assert np.allclose(calculateAccelerationsOn(positions, masses, positions, tileSize=16),
+                       calculateAccelerations(masses, positions), rtol=1e-12, atol=0)
+
+@pytest.mark.parametrize('name, options, tolerance', [
+    ('direct', {}, 1e-12),
+    ('barneshut', {'theta': 0.3}, 1e-2),
+    ('barneshut', {'theta': 0.5, 'quadrupole': True}, 1e-2),
+    ('pm', {'gridSize': 64}, 0.05),
+    ('processes', {'nWorkers': 2}, 1e-12),
+    ('numba', {}, 1e-12),
+])
+def test_engines_match_direct_summation(name, options, tolerance):
+    if name == 'numba':
+        pytest.importorskip('numba')
+    assert name in forceEngines
+    masses, positions = _cube(500)
+    engine = getForceEngine(name, **options)
+    try:
+        accelerations = engine(masses, positions)
+    finally:
+        if hasattr(engine, 'close'):
+            engine.close()
+    errors = _relativeErrors(accelerations, calculateAccelerations(masses, positions))
+    assert np.median(errors) < tolerance
+
+def test_process_pool_checks_its_softening():
+    with pytest.raises(AssertionError, match='Unknown softening kernel'):
+        getForceEngine('processes', nWorkers=2, softening=1e9, kernel='gaussian')
+    with pytest.raises(AssertionError, match='must not be negative'):
+        getForceEngine('processes', nWorkers=2, softening=-1.0)
+
+def test_process_pool_raises_worker_errors_and_shuts_down():
+    from multiprocessing import shared_memory
+    masses, positions = _cube(50)
+    engine = getForceEngine('processes', nWorkers=2, softening=1e9)
+    engine(masses, positions)
+    # an option the workers only trip over once they compute
+    engine.options['kernel'] = 'gaussian'
+    engine._allocate(engine.N)
+    names = [block.name for block in engine._blocks]
+    with pytest.raises(AssertionError, match='Unknown softening kernel'):
+        engine(masses, positions)
+    assert not engine._processes and not engine._blocks
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
+
+def test_barneshut_converges_to_direct():
+    masses, positions = _cube(300)
+    expected = calculateAccelerations(masses, positions)
+    errors = [np.median(_relativeErrors(getForceEngine('barneshut', theta=theta)(masses, positions),
+                                        expected))
+              for theta in (1.0, 0.5, 0.25)]
+    assert errors[0] > errors[1] > errors[2]
+
+def test_particle_mesh_with_moving_grid():
+    # the grid is refitted on every call; scaling all positions scales
+    # every acceleration by the inverse square
+    masses, positions = _cube(300)
+    engine = getForceEngine('pm', gridSize=32)
+    accelerations = engine(masses, positions)
+    assert np.allclose(engine(masses, 2 * positions), accelerations / 4, rtol=1e-9, atol=0)
+
+def test_particle_mesh_transforms_its_green_function_once(monkeypatch):
+    masses, positions = _cube(300)
+    engine = getForceEngine('pm', gridSize=32)
+    transforms = []
+    rfftn = np.fft.rfftn
+
+    def countingRfftn(array, *args, **kwargs):
+        transforms.append(array.shape)
+        return rfftn(array, *args, **kwargs)
+
+    monkeypatch.setattr(np.fft, 'rfftn', countingRfftn)
+    # a grid refitted to a different box on every call
+    for scale in (1.0, 2.0, 3.0):
+        engine(masses, scale * positions)
+    # the density on each call, the Green's function only on the first
+    assert len(transforms) == 4
+
+def test_get_force_engine():
+    engine = lambda masses, positions: np.zeros(positions.shape)
+    assert getForceEngine(engine) is engine
+    with pytest.raises(AssertionError, match='Unknown force engine'):
+        getForceEngine('nope')
+    with pytest.raises(AssertionError):
+        getForceEngine(engine, theta=0.5)
+
+def test_test_particles_feel_but_do_not_pull():
+    masses, positions = _cube(60)
+    nTest = 45
+    massless = masses.copy()
+    massless[-nTest:] = 0.0
+
+    engine = forces.TestParticleEngine(calculateAccelerations, nTest)
+    accelerations = engine(masses, positions)
+    # the masses given for the test particles do not matter
+    assert np.allclose(accelerations, calculateAccelerations(massless, positions),
+                       rtol=1e-12, atol=0)
+
+def test_find_pairs_matches_brute_force():
+    rng = np.random.default_rng(1)
+    positions = rng.uniform(0, 100, (400, 3))
+    radius = 5.0
+    pairs, distances = findPairs(positions, radius)
+
+    separations = np.linalg.norm(positions[:, np.newaxis] - positions[np.newaxis], axis=-1)
+    i, j = np.nonzero(np.triu(separations < radius, k=1))
+    assert sorted(map(tuple, pairs)) == sorted(zip(i, j))
+    assert np.allclose(distances, separations[pairs[:, 0], pairs[:, 1]])
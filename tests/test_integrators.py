@@ -0,0 +1,121 @@
+import numpy as np
+import pytest
+
+from nbody.blocksteps import BlockStepper
+from nbody.forces import G
+from nbody.integrators import getIntegrator, integrators, registerIntegrator
+from nbody.leapfrog import LeapfrogStepper, updateParticles
+from nbody.main import calculateTrajectories
+
+MSUN = 1.989e30
+AU = 1.496e11
+DAY = 86400.0
+
+def _eccentricOrbit(planetMass=6e24, eccentricity=0.5):
+    """A planet at aphelion of a 1 AU orbit, in the centre-of-mass frame."""
+    masses = np.array([MSUN, planetMass])
+    mu = G * masses.sum()
+    r = AU * (1 + eccentricity)
+    v = np.sqrt(mu * (1 - eccentricity) / r)
+    relativePosition = np.array([r, 0.0, 0.0])
+    relativeVelocity = np.array([0.0, v, 0.0])
+    weights = masses / masses.sum()
+    positions = np.array([-weights[1] * relativePosition, weights[0] * relativePosition])
+    velocities = np.array([-weights[1] * relativeVelocity, weights[0] * relativeVelocity])
+    return masses, positions, velocities
+
+def _energy(masses, positions, velocities):
+    kinetic = 0.5 * np.sum(masses * np.sum(velocities**2, axis=-1))
+    i, j = np.triu_indices(len(masses), k=1)
+    potential = -G * np.sum(masses[i] * masses[j] / np.linalg.norm(positions[i] - positions[j], axis=-1))
+    return kinetic + potential
+
+def _separation(integrator, dt, timeEvol=100 * DAY):
+    """The planet relative to the star after timeEvol in steps of dt."""
+    masses, positions, velocities = _eccentricOrbit()
+    stepper = getIntegrator(integrator)(masses, positions, velocities)
+    for _ in range(int(round(timeEvol / dt))):
+        newPositions, _ = stepper.step(dt)
+    return newPositions[1] - newPositions[0]
+
+@pytest.mark.parametrize('integrator, order, dt', [
+    ('leapfrog', 2, 1.0),
+    ('forestruth', 4, 2.0),
+    ('yoshida6', 6, 5.0),
+])
+def test_order_of_convergence(integrator, order, dt):
+    # halving the step shrinks the difference between successive results
+    # by 2**order
+    coarse, fine, finest = (_separation(integrator, dt * DAY / 2**k) for k in range(3))
+    ratio = np.linalg.norm(coarse - fine) / np.linalg.norm(fine - finest)
+    assert np.log2(ratio) == pytest.approx(order, abs=0.3)
+
+def test_stepper_matches_update_particles():
+    masses, positions, velocities = _eccentricOrbit()
+    stepper = LeapfrogStepper(masses, positions, velocities)
+    expected = positions, velocities
+    for _ in range(20):
+        got = stepper.step(DAY)
+        expected = updateParticles(masses, *expected, DAY)
+    assert np.allclose(got[0], expected[0], rtol=1e-12, atol=0)
+    assert np.allclose(got[1], expected[1], rtol=1e-12, atol=0)
+
+@pytest.mark.parametrize('integrator', ['leapfrog', 'forestruth', 'yoshida6', 'wh'])
+def test_batch_matches_separate_runs(integrator):
+    systems = [_eccentricOrbit(eccentricity=e) for e in (0.0, 0.3, 0.6)]
+    masses = np.stack([m for m, _, _ in systems])
+    positions = np.stack([p for _, p, _ in systems])
+    velocities = np.stack([v for _, _, v in systems])
+    dt = np.array([1.0, 0.5, 0.25]) * DAY
+
+    _, batch, _ = calculateTrajectories(masses, positions, velocities, 20 * dt, dt,
+                                        integrator=integrator)
+    for k, (m, p, v) in enumerate(systems):
+        _, single, _ = calculateTrajectories(m, p, v, 20 * dt[k], dt[k], integrator=integrator)
+        assert np.allclose(batch[k], single, rtol=1e-12, atol=0)
+
+def test_block_steps_conserve_energy():
+    # a tight binary with a distant third body: the binary takes the small steps
+    masses = np.array([MSUN, MSUN, 1e27])
+    a = 0.05 * AU
+    v = np.sqrt(G * MSUN / (4 * a))
+    positions = np.array([[-a, 0, 0], [a, 0, 0], [10 * AU, 0, 0]])
+    velocities = np.array([[0, -v, 0], [0, v, 0], [0, np.sqrt(G * 2 * MSUN / (10 * AU)), 0]])
+
+    stepper = BlockStepper(masses, positions, velocities, eta=0.01, maxLevel=12)
+    for _ in range(10):
+        newPositions, newVelocities = stepper.step(20 * DAY)
+
+    energy = _energy(masses, positions, velocities)
+    assert abs(_energy(masses, newPositions, newVelocities) / energy - 1) < 1e-4
+    # the binary steps deeper than the outer body
+    assert stepper.level[0] > stepper.level[2]
+    # so there are fewer force evaluations than with everyone at the
+    # binary's step (two of the three bodies still take it)
+    assert stepper.forceEvaluations < 0.75 * 10 * 2**stepper.level[0]
+
+def test_block_at_level_zero_is_leapfrog():
+    masses, positions, velocities = _eccentricOrbit()
+    block = BlockStepper(masses, positions, velocities, maxLevel=0)
+    leapfrog = LeapfrogStepper(masses, positions, velocities)
+    for _ in range(20):
+        got = block.step(DAY)
+        expected = leapfrog.step(DAY)
+    assert np.allclose(got[0], expected[0], rtol=1e-12, atol=0)
+
+def test_register_integrator():
+    class Frozen(LeapfrogStepper):
+        def step(self, dt):
+            return self.positions, self.velocities
+
+    registerIntegrator('frozen', Frozen)
+    try:
+        masses, positions, velocities = _eccentricOrbit()
+        _, positionArray, _ = calculateTrajectories(masses, positions, velocities, 5 * DAY, DAY,
+                                                    integrator='frozen')
+        assert np.all(positionArray == positions[..., np.newaxis])
+    finally:
+        del integrators['frozen']
+
+    with pytest.raises(AssertionError, match='Unknown integrator'):
+        getIntegrator('frozen')
@@ -0,0 +1,41 @@
+import numpy as np
+
+from nbody.plotting import minMaxDecimate, pixelDecimate
+
+def test_min_max_decimate_keeps_every_extreme():
+    x = np.linspace(0, 1, 100000)
+    y = np.sin(50 * x)
+    y[12345] = 10.0   # a one-sample spike
+    indices = minMaxDecimate(x, y, 200)
+    assert len(indices) <= 4 * 200
+    assert np.all(np.diff(indices) > 0)
+    assert indices[0] == 0 and indices[-1] == len(x) - 1
+    assert 12345 in indices
+
+    # every column keeps its smallest and largest sample
+    columns = np.minimum((x * 200).astype(int), 199)
+    for column in (0, 57, 199):
+        inColumn = columns == column
+        assert y[indices][columns[indices] == column].max() == y[inColumn].max()
+        assert y[indices][columns[indices] == column].min() == y[inColumn].min()
+
+def test_min_max_decimate_leaves_short_series_alone():
+    assert np.array_equal(minMaxDecimate(np.arange(10.0), np.zeros(10), 5), np.arange(10))
+
+def test_pixel_decimate_follows_the_path_not_the_samples():
+    # ten times round the same circle: every pixel is crossed ten times, so
+    # more samples per turn add no vertices
+    t = np.linspace(0, 20 * np.pi, 200000)
+    coarse = pixelDecimate(np.cos(t), np.sin(t), 0.01, 0.01)
+    fine = pixelDecimate(np.cos(t[::4]), np.sin(t[::4]), 0.01, 0.01)
+    assert len(coarse) < 0.1 * len(t)
+    assert abs(len(coarse) - len(fine)) < 0.05 * len(fine)
+    assert coarse[0] == 0 and coarse[-1] == len(t) - 1
+
+    # no kept step moves more than a pixel without a vertex in between
+    x, y = np.cos(t), np.sin(t)
+    kept = np.zeros(len(t), dtype=bool)
+    kept[coarse] = True
+    cells = np.floor((x - x.min()) / 0.01) * 1000 + np.floor((y - y.min()) / 0.01)
+    changes = np.flatnonzero(np.diff(cells))
+    assert kept[changes].all() and kept[changes + 1].all()
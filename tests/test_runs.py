@@ -0,0 +1,95 @@
+import os
+
+import numpy as np
+import pytest
+
+from nbody.main import calculateTrajectories, iterateTrajectories, resumeTrajectories, savedSteps
+from nbody.trajectory import loadTrajectory
+
+DAY = 86400.0
+
+def _run(system, **options):
+    masses, positions, velocities = system
+    return calculateTrajectories(masses, positions, velocities, 40 * DAY, 0.5 * DAY, **options)
+
+def test_saved_steps():
+    assert list(savedSteps(10, 3)) == [0, 3, 6, 9, 10]
+    assert list(savedSteps(9, 3)) == [0, 3, 6, 9]
+
+def test_save_every_keeps_a_stride_of_the_full_run(kepler16):
+    times, positions, velocities = _run(kepler16)
+    strided = _run(kepler16, saveEvery=7)
+    steps = savedSteps(len(times) - 1, 7)
+    assert np.array_equal(strided[0], times[steps])
+    assert np.array_equal(strided[1], positions[..., steps])
+    assert np.array_equal(strided[2], velocities[..., steps])
+
+def test_streamed_output_matches_memory(kepler16, tmp_path):
+    expected = _run(kepler16, saveEvery=3)
+    streamed = _run(kepler16, saveEvery=3, output=str(tmp_path / 'run'))
+    for got, want in zip(streamed, expected):
+        assert np.array_equal(got, want)
+    for got, want in zip(loadTrajectory(str(tmp_path / 'run')), expected):
+        assert np.array_equal(got, want)
+
+def test_iterate_matches_calculate(kepler16):
+    expected = _run(kepler16, saveEvery=4)
+    masses, positions, velocities = kepler16
+    snapshots = list(iterateTrajectories(masses, positions, velocities, 40 * DAY, 0.5 * DAY,
+                                         saveEvery=4))
+    assert len(snapshots) == len(expected[0])
+    for n, (time, pos, vel) in enumerate(snapshots):
+        assert time == expected[0][n]
+        assert np.array_equal(pos, expected[1][..., n])
+
+def test_float32_storage(kepler16):
+    trajectory = _run(kepler16, dtype=np.float32, returnTrajectory=True)
+    assert trajectory.positions.dtype == np.float32
+    assert trajectory.positions.flags['C_CONTIGUOUS']
+    # time-major storage, with (N, M, T) views for the old layout
+    assert trajectory.positionArray.shape == trajectory.positions.shape[1:] + (trajectory.count,)
+    _, positions, _ = _run(kepler16)
+    assert np.allclose(trajectory.positionArray, positions, rtol=1e-6, atol=0)
+
+@pytest.mark.parametrize('integrator', ['leapfrog', 'yoshida6', 'block', 'wh'])
+def test_resume_is_bit_identical(kepler16, tmp_path, integrator):
+    masses, positions, velocities = kepler16
+    expected = _run(kepler16, integrator=integrator, saveEvery=2)
+
+    # a run cut short after its last checkpoint, then carried on
+    checkpoint = str(tmp_path / 'run.npz')
+    output = str(tmp_path / 'run')
+    calculateTrajectories(masses, positions, velocities, 20 * DAY, 0.5 * DAY,
+                          integrator=integrator, saveEvery=2, output=output,
+                          checkpoint=checkpoint, checkpointEvery=5)
+    resumed = resumeTrajectories(checkpoint, 40 * DAY)
+    for got, want in zip(resumed, expected):
+        assert np.array_equal(got, want)
+
+def test_resume_in_memory_returns_the_rest(kepler16, tmp_path):
+    masses, positions, velocities = kepler16
+    times, expected, _ = _run(kepler16)
+    checkpoint = str(tmp_path / 'run.npz')
+    calculateTrajectories(masses, positions, velocities, 10 * DAY, 0.5 * DAY,
+                          checkpoint=checkpoint)
+    resumedTimes, resumed, _ = resumeTrajectories(checkpoint, 40 * DAY)
+    assert np.array_equal(resumedTimes, times[21:])
+    assert np.array_equal(resumed, expected[..., 21:])
+
+def test_failed_start_leaves_no_output(kepler16, tmp_path):
+    output = str(tmp_path / 'run')
+    with pytest.raises(AssertionError, match='Unknown integrator'):
+        _run(kepler16, integrator='nope', output=output)
+    assert not os.path.exists(output)
+
+def test_failed_first_snapshot_closes_the_sink(kepler16):
+    class Sink:
+        closed = False
+        def append(self, time, positions, velocities):
+            raise OSError('disk full')
+        def close(self):
+            Sink.closed = True
+
+    with pytest.raises(OSError):
+        _run(kepler16, output=Sink())
+    assert Sink.closed
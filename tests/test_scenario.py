@@ -0,0 +1,128 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from nbody.batch import runBatch
+from nbody.main import calculateTrajectories
+from nbody.scenario import checkScenario, expandSweep, initialConditions, loadScenarios, \
+    runScenario, simulate, unitScale
+from nbody.snapshot import readSnapshot
+
+SCENARIOS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Scenarios')
+DAY = 86400.0
+AU = 1.496e11
+
+def _binary(**keys):
+    scenario = {'name': 'binary',
+                'particles': {'masses': [1.0, 1e-3],
+                              'positions': [[0, 0, 0], [1, 0, 0]],
+                              'velocities': [[0, 0, 0], [0, 29.8, 0]]},
+                'units': {'mass': 'msun', 'length': 'au', 'velocity': 'km/s', 'time': 'day'},
+                'dt': 1, 'duration': 10}
+    scenario.update(keys)
+    return scenario
+
+def _write(tmp_path, content, name='scenarios.json'):
+    path = tmp_path / name
+    path.write_text(json.dumps(content))
+    return str(path)
+
+def test_every_shipped_scenario_loads():
+    for name in sorted(os.listdir(SCENARIOS)):
+        for scenario in loadScenarios(os.path.join(SCENARIOS, name)):
+            assert scenario['integrator'] and scenario['outputs']
+            if 'initialConditions' in scenario:
+                assert os.path.exists(scenario['initialConditions'])
+
+def test_defaults_and_sweeps(tmp_path):
+    path = _write(tmp_path, {
+        'defaults': {'initialConditions': 'ic.txt', 'units': {'time': 'day'}, 'duration': 10},
+        'scenarios': [{'name': 'a'}, {'name': 'b', 'duration': 20}],
+        'sweep': {'dt': [0.5, 1], 'forceOptions.softening': [0, 1e6]},
+    })
+    scenarios = loadScenarios(path)
+    assert len(scenarios) == 8
+    first = scenarios[0]
+    assert first['name'] == 'a-dt=0.5-forceOptions.softening=0'
+    assert first['initialConditions'] == str(tmp_path / 'ic.txt')
+    # nested defaults are merged, not replaced
+    assert first['units'] == {'mass': 'kg', 'length': 'm', 'velocity': 'm/s', 'time': 'day'}
+    assert first['forceOptions'] == {'softening': 0}
+    assert [s['duration'] for s in scenarios] == [10] * 4 + [20] * 4
+
+def test_a_single_scenario_or_a_list(tmp_path):
+    assert len(loadScenarios(_write(tmp_path, _binary()))) == 1
+    assert len(loadScenarios(_write(tmp_path, [_binary(), _binary(name='other')]))) == 2
+
+def test_names_must_be_unique(tmp_path):
+    with pytest.raises(AssertionError, match='not unique'):
+        loadScenarios(_write(tmp_path, [_binary(), _binary()]))
+
+def test_expand_sweep_without_a_sweep():
+    scenario = _binary()
+    assert expandSweep(scenario, None) == [scenario]
+
+@pytest.mark.parametrize('change, message', [
+    ({'units': {'length': 'furlong'}}, 'Unknown length unit'),
+    ({'units': {'charge': 'C'}}, 'Unknown unit kind'),
+    ({'outputs': ['everything']}, 'Unknown output'),
+    ({'limits': {'disk': 10}}, 'Unknown limit'),
+    ({'initialConditions': 'ic.txt'}, 'either initialConditions or particles'),
+])
+def test_check_scenario_rejects(change, message):
+    with pytest.raises(AssertionError, match=message):
+        checkScenario(_binary(**change))
+
+def test_check_scenario_needs_a_time_step():
+    scenario = _binary()
+    del scenario['dt']
+    with pytest.raises(AssertionError, match='needs dt'):
+        checkScenario(scenario)
+
+def test_units():
+    scenario = checkScenario(_binary())
+    assert unitScale(scenario, 'time') == DAY
+    masses, positions, velocities = initialConditions(scenario)
+    assert masses[0] == 1.989e30
+    assert positions[1, 0] == AU
+    assert velocities[1, 1] == 29.8e3
+
+def test_simulate_matches_calculate_trajectories(kepler16):
+    masses, positions, velocities = kepler16
+    expected = calculateTrajectories(masses, positions, velocities, 20 * DAY, 0.5 * DAY)
+    scenario = loadScenarios(os.path.join(SCENARIOS, 'kepler16.json'))[0]
+    scenario['duration'] = 20
+    for got, want in zip(simulate(scenario), expected):
+        assert np.array_equal(got, want)
+
+def test_simulate_with_a_cache(tmp_path):
+    scenario = _binary()
+    expected = simulate(scenario)
+    for _ in range(2):
+        for got, want in zip(simulate(scenario, cache=str(tmp_path)), expected):
+            assert np.array_equal(got, want)
+    with pytest.raises(AssertionError, match='Cached runs only take'):
+        simulate(scenario, cache=str(tmp_path), diagnostics=None)
+
+def test_run_scenario_writes_its_outputs(tmp_path):
+    scenario = checkScenario(_binary(outputs=['trajectory', 'final', 'summary', 'diagnostics']))
+    summary = runScenario(scenario, str(tmp_path))
+    assert summary['steps'] == 10
+    for name in ('trajectory', 'final.snap', 'summary.json', 'diagnostics.npz'):
+        assert os.path.exists(str(tmp_path / name))
+
+    _, positions, _ = simulate(scenario)
+    snapshot = readSnapshot(str(tmp_path / 'final.snap'))
+    assert np.array_equal(snapshot.positions, positions[..., -1])
+    assert snapshot.time == 10 * DAY
+
+def test_batch_reports_every_job(tmp_path):
+    scenarios = [checkScenario(_binary(outputs=['final'])),
+                 checkScenario(_binary(name='broken', integrator='nope'))]
+    reports = runBatch(scenarios, str(tmp_path), nWorkers=2, progress=False)
+    assert [report['status'] for report in reports] == ['ok', 'failed']
+    assert 'Unknown integrator' in reports[1]['error']
+    assert os.path.exists(str(tmp_path / 'binary' / 'final.snap'))
+    assert os.path.exists(str(tmp_path / 'batch.json'))
@@ -0,0 +1,83 @@
+import os
+
+import numpy as np
+import pytest
+
+from nbody import snapshot
+from nbody.snapshot import convertText, isSnapshot, loadInitialConditions, readSnapshot, writeSnapshot
+
+def _particles(N, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(1, 2, N), rng.normal(size=(N, 3)), rng.normal(size=(N, 3))
+
+@pytest.mark.parametrize('mmap', [True, False])
+def test_round_trip(tmp_path, monkeypatch, mmap):
+    # more particles than a chunk, so the fields are written in pieces
+    monkeypatch.setattr(snapshot, 'CHUNK_SIZE', 7)
+    masses, positions, velocities = _particles(50)
+    path = str(tmp_path / 'particles.snap')
+    writeSnapshot(path, masses, positions, velocities, time=3.5, source='test')
+
+    read = readSnapshot(path, mmap=mmap)
+    assert len(read) == 50
+    assert np.array_equal(read.masses, masses)
+    assert np.array_equal(read.positions, positions)
+    assert np.array_equal(read.velocities, velocities)
+    assert read.time == 3.5
+    assert read.units == snapshot.SI_UNITS
+    assert read.metadata == {'source': 'test'}
+
+def test_fields_are_aligned(tmp_path):
+    path = str(tmp_path / 'particles.snap')
+    writeSnapshot(path, *_particles(5))
+    read = readSnapshot(path)
+    for field in (read.masses, read.positions, read.velocities):
+        assert field.offset % snapshot.ALIGNMENT == 0
+
+def test_empty_snapshot(tmp_path):
+    path = str(tmp_path / 'empty.snap')
+    writeSnapshot(path, np.zeros(0), np.zeros((0, 3)), np.zeros((0, 3)))
+    assert len(readSnapshot(path)) == 0
+
+def test_mismatched_fields_are_rejected(tmp_path):
+    masses, positions, velocities = _particles(5)
+    with pytest.raises(AssertionError, match='same particles'):
+        writeSnapshot(str(tmp_path / 'bad.snap'), masses, positions, velocities[:4])
+
+def test_not_a_snapshot(dataDir):
+    path = os.path.join(dataDir, 'kepler16.txt')
+    assert not isSnapshot(path)
+    with pytest.raises(AssertionError, match='not a snapshot file'):
+        readSnapshot(path)
+
+def test_load_initial_conditions_reads_both_formats(dataDir, tmp_path):
+    text = os.path.join(dataDir, 'uniformCube.txt')
+    binary = str(tmp_path / 'uniformCube.snap')
+    convertText(text, binary)
+    assert isSnapshot(binary)
+    for got, want in zip(loadInitialConditions(binary), loadInitialConditions(text)):
+        assert np.array_equal(got, want)
+
+def test_text_is_converted_a_chunk_at_a_time(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot, 'CHUNK_SIZE', 7)
+    masses, positions, velocities = _particles(50)
+    table = np.column_stack([masses, positions, velocities])
+    lines = ['# mass x y z vx vy vz'] + [' '.join(repr(float(value)) for value in row)
+                                         for row in table]
+    # comments and blank lines between the chunks
+    lines[20:20] = ['', '# halfway']
+    text = tmp_path / 'particles.txt'
+    text.write_text('\n'.join(lines) + '\n')
+
+    binary = str(tmp_path / 'particles.snap')
+    convertText(str(text), binary)
+    for loaded in (loadInitialConditions(binary), loadInitialConditions(str(text))):
+        for got, want in zip(loaded, (masses, positions, velocities)):
+            assert np.array_equal(got, want)
+    assert readSnapshot(binary).metadata == {'source': str(text)}
+
+def test_load_initial_conditions_needs_si_units(tmp_path):
+    path = str(tmp_path / 'au.snap')
+    writeSnapshot(path, *_particles(3), units=dict(snapshot.SI_UNITS, length='au'))
+    with pytest.raises(AssertionError, match='not in SI units'):
+        loadInitialConditions(path)
@@ -0,0 +1,43 @@
+import io
+import json
+
+import numpy as np
+
+from nbody.main import calculateTrajectories
+from nbody.telemetry import RunMonitor
+
+DAY = 86400.0
+
+def test_hooks_and_summary(kepler16, tmp_path):
+    masses, positions, velocities = kepler16
+    calls = {'step': 0, 'force': 0, 'output': 0, 'finish': 0}
+
+    def counter(kind):
+        def hook(*args):
+            calls[kind] += 1
+        return hook
+
+    summaryFile = str(tmp_path / 'summary.json')
+    monitor = RunMonitor(progress=False, summaryFile=summaryFile,
+                         **{kind: counter(kind) for kind in calls})
+    calculateTrajectories(masses, positions, velocities, 10 * DAY, 0.5 * DAY, saveEvery=4,
+                          monitor=monitor)
+
+    # one force evaluation to start the leap-frog, then one per step
+    assert calls == {'step': 20, 'force': 21, 'output': 6, 'finish': 1}
+    summary = monitor.summary
+    assert summary['steps'] == 20
+    assert summary['forceEvaluations'] == 21
+    assert summary['savedSnapshots'] == 6
+    assert set(summary['phases']) == {'force', 'integrate', 'output', 'checkpoint', 'other'}
+    assert sum(summary['phases'].values()) >= 0.99 * summary['wallTime']
+    with open(summaryFile) as f:
+        assert json.load(f)['steps'] == 20
+
+def test_progress_is_throttled(kepler16):
+    masses, positions, velocities = kepler16
+    stream = io.StringIO()
+    monitor = RunMonitor(progressInterval=1e9, stream=stream)
+    calculateTrajectories(masses, positions, velocities, 50 * DAY, 0.5 * DAY, monitor=monitor)
+    # the first step and the last, nothing in between
+    assert stream.getvalue() == '\rcalculating time 1/100\rcalculating time 100/100'
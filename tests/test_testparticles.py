@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from nbody import forces
+from nbody.blocksteps import BlockStepper
+from nbody.forces import calculateAccelerations
+from nbody.main import calculateTrajectories, resumeTrajectories
+from nbody.scenario import simulate
+
+DAY = 86400.0
+
+@pytest.fixture
+def tracers(kepler16):
+    """Kepler-16 with 20 tracers on the planet's orbit."""
+    masses, positions, velocities = kepler16
+    rng = np.random.default_rng(0)
+    scale = 1 + rng.uniform(-0.2, 0.2, (20, 1))
+    masses = np.concatenate([masses, rng.uniform(1e20, 1e22, 20)])
+    positions = np.concatenate([positions, positions[2] * scale])
+    velocities = np.concatenate([velocities, velocities[2] / np.sqrt(scale)])
+    return masses, positions, velocities
+
+def _run(system, timeEvol=40 * DAY, **options):
+    masses, positions, velocities = system
+    return calculateTrajectories(masses, positions, velocities, timeEvol, 0.5 * DAY, **options)
+
+@pytest.mark.parametrize('integrator', ['leapfrog', 'yoshida6', 'wh', 'block'])
+def test_test_particles_are_massless_particles(tracers, integrator):
+    masses, positions, velocities = tracers
+    massless = masses.copy()
+    massless[3:] = 0.0
+    # the tracers are skipped as sources, which is what a zero mass does too
+    expected = _run((massless, positions, velocities), integrator=integrator)
+    got = _run(tracers, integrator=integrator, nActive=3)
+    for g, e in zip(got, expected):
+        assert np.array_equal(g, e)
+
+def test_block_steps_keep_the_test_particle_split(tracers):
+    # the tracers keep their masses here: only the engine says they pull
+    # on nothing, and the block integrator, which computes its own forces,
+    # has to take that from it
+    masses, positions, velocities = tracers
+    massless = masses.copy()
+    massless[3:] = 0.0
+    engine = forces.TestParticleEngine(calculateAccelerations, len(masses) - 3)
+    got = BlockStepper(masses, positions, velocities, engine)
+    expected = BlockStepper(massless, positions, velocities)
+    for _ in range(5):
+        gotPositions, _ = got.step(DAY)
+        expectedPositions, _ = expected.step(DAY)
+    assert np.allclose(gotPositions, expectedPositions, rtol=1e-12, atol=0)
+
+def test_test_particles_do_not_move_the_massive_ones(tracers):
+    masses, positions, velocities = tracers
+    _, expected, _ = calculateTrajectories(masses[:3], positions[:3], velocities[:3],
+                                           40 * DAY, 0.5 * DAY)
+    _, got, _ = _run(tracers, nActive=3)
+    assert np.allclose(got[:3], expected, rtol=1e-12, atol=0)
+
+def test_resume_keeps_the_test_particles(tracers, tmp_path):
+    expected = _run(tracers, nActive=3)
+    checkpoint = str(tmp_path / 'run.npz')
+    _run(tracers, 20 * DAY, nActive=3, output=str(tmp_path / 'run'), checkpoint=checkpoint)
+    for got, want in zip(resumeTrajectories(checkpoint, 40 * DAY), expected):
+        assert np.array_equal(got, want)
+
+def test_n_active_must_be_in_range(tracers):
+    with pytest.raises(AssertionError, match='nActive'):
+        _run(tracers, nActive=0)
+
+def test_scenario_n_active(tracers):
+    masses, positions, velocities = tracers
+    scenario = {'name': 'tracers', 'nActive': 3, 'dt': 0.5, 'duration': 40,
+                'units': {'time': 'day'},
+                'particles': {'masses': masses.tolist(), 'positions': positions.tolist(),
+                              'velocities': velocities.tolist()}}
+    expected = _run(tracers, nActive=3)
+    for got, want in zip(simulate(scenario), expected):
+        assert np.array_equal(got, want)
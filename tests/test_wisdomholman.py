@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from nbody.forces import G
+from nbody.main import calculateTrajectories
+from nbody.wisdomholman import keplerDrift, stumpff
+
+MSUN = 1.989e30
+AU = 1.496e11
+DAY = 86400.0
+MU = G * MSUN
+
+def _energy(positions, velocities):
+    return 0.5 * np.sum(velocities**2, axis=-1) - MU / np.linalg.norm(positions, axis=-1)
+
+def test_stumpff_matches_closed_forms():
+    psi = np.array([-30.0, -2.0, -0.5, 0.5, 2.0, 30.0])
+    c2, c3 = stumpff(psi)
+    for value, a, b in zip(psi, c2, c3):
+        s = np.sqrt(abs(value))
+        if value > 0:
+            assert a == pytest.approx((1 - np.cos(s)) / value, rel=1e-13)
+            assert b == pytest.approx((s - np.sin(s)) / s**3, rel=1e-13)
+        else:
+            assert a == pytest.approx((np.cosh(s) - 1) / -value, rel=1e-13)
+            assert b == pytest.approx((np.sinh(s) - s) / s**3, rel=1e-13)
+
+def _keplerSeparations(masses, initPos, initVel, times):
+    """The second body relative to the first at times, from the two-body solution."""
+    relativePosition = np.repeat(initPos[1:] - initPos[:1], len(times), axis=0)
+    relativeVelocity = np.repeat(initVel[1:] - initVel[:1], len(times), axis=0)
+    separations, _ = keplerDrift(relativePosition, relativeVelocity, G * sum(masses), times)
+    return separations.T
+
+def test_wh_is_far_more_accurate_than_leapfrog_at_the_same_step():
+    # a planet at aphelion of an e = 0.5 orbit: WH follows the Kepler orbit
+    # exactly up to a splitting error of order planetMass / MSUN
+    masses = [MSUN, 6e24]
+    r = 1.5 * AU
+    initPos = np.array([[0.0, 0.0, 0.0], [r, 0.0, 0.0]])
+    initVel = np.array([[0.0, 0.0, 0.0], [0.0, np.sqrt(G * sum(masses) * 0.5 / r), 0.0]])
+
+    errors = {}
+    for integrator in ('wh', 'leapfrog'):
+        times, positions, _ = calculateTrajectories(masses, initPos, initVel, 100 * DAY, 5 * DAY,
+                                                    integrator=integrator)
+        expected = _keplerSeparations(masses, initPos, initVel, times)
+        errors[integrator] = np.max(np.abs(positions[1] - positions[0] - expected))
+    assert errors['wh'] < 1e-3 * errors['leapfrog']
+
+def test_kepler_drift_eccentric_orbit_converges():
+    # a 0.43 AU eccentric orbit on which the solver used to rattle around
+    # the root and never meet its stopping test
+    positions = np.array([[-4.3e10, -4.2e10, -2.3e10]])
+    velocities = np.array([[25843.0, 25281.0, 19270.0]])
+
+    newPositions, newVelocities = keplerDrift(positions, velocities, MU, 10 * DAY)
+
+    # many short drifts land in the same place
+    small = positions, velocities
+    for _ in range(1000):
+        small = keplerDrift(*small, MU, 0.01 * DAY)
+    assert np.allclose(newPositions, small[0], rtol=1e-11, atol=0)
+    assert _energy(newPositions, newVelocities) == pytest.approx(_energy(positions, velocities), rel=1e-11)
+
+    # and it runs backwards too
+    back = keplerDrift(newPositions, newVelocities, MU, -10 * DAY)
+    assert np.allclose(back[0], positions, rtol=1e-11, atol=0)
+
+def test_kepler_drift_hyperbolic_long_step():
+    positions = np.array([[1.5e11, 0.0, 0.0]])
+    velocities = np.array([[0.0, 1e5, 0.0]])
+    newPositions, newVelocities = keplerDrift(positions, velocities, MU, 1e4 * DAY)
+    assert np.all(np.isfinite(newPositions))
+    assert _energy(newPositions, newVelocities) == pytest.approx(_energy(positions, velocities), rel=1e-11)
+
+def test_kepler_drift_batch_of_random_orbits():
+    rng = np.random.default_rng(0)
+    positions = rng.normal(size=(500, 3)) * 1.5e11
+    velocities = rng.normal(size=(500, 3)) * 3e4
+    dt = rng.uniform(-100, 100, 500) * DAY
+    newPositions, newVelocities = keplerDrift(positions, velocities, MU, dt)
+    assert np.allclose(_energy(newPositions, newVelocities), _energy(positions, velocities),
+                       rtol=1e-10, atol=0)
+
+@pytest.mark.parametrize('planetMass, tolerance', [(0.0, 1e-9), (1e20, 1e-4)])
+def test_wh_eccentric_orbit_through_calculate_trajectories(planetMass, tolerance):
+    # the orbit of test_kepler_drift_eccentric_orbit_converges, which dips
+    # to 0.01 AU from the Sun, at the 10-day step of the WH scenario. A
+    # massless planet follows the Kepler orbit exactly; a light one only up
+    # to the splitting error, which is large at such a close pericentre
+    masses = [MSUN, planetMass]
+    initPos = np.array([[0.0, 0.0, 0.0], [-4.3e10, -4.2e10, -2.3e10]])
+    initVel = np.array([[0.0, 0.0, 0.0], [25843.0, 25281.0, 19270.0]])
+    times, positions, velocities = calculateTrajectories(masses, initPos, initVel, 100 * DAY,
+                                                         10 * DAY, integrator='wh')
+
+    expected = _keplerSeparations(masses, initPos, initVel, times)
+    error = np.max(np.abs(positions[1] - positions[0] - expected))
+    assert error < tolerance * np.linalg.norm(initPos[1])